@@ -0,0 +1,127 @@
+"""Batch evaluation: plagiarism equivalence and grading throughput.
+
+Usage: python benchmarks/bench_batch.py [--peers 300] [--batch 64] [--latency 0.2]
+
+1. Checks that detect_plagiarism_batch returns, for every answer, exactly what
+   detect_plagiarism_with_peers returns against the past peers plus the rest
+   of the batch.
+2. Grades the batch through check_assignment_batch with a simulated Gemini
+   client (fixed latency per call) at several concurrency limits, against
+   one check_assignment call per student.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from common import (fit_plagiarism_models, load_grading_module, make_corpus, random_sentence,
+                    timed)
+
+GRADING_REPLY = 'Well argued.\n```json\n{"total_score": 7, "max_score": 10}\n```'
+
+
+class SimulatedChat:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def send_message(self, prompt, generation_config=None):
+        time.sleep(self.latency)
+        return type("Response", (), {"text": GRADING_REPLY})()
+
+
+class SimulatedModel:
+    """Stands in for the Gemini client: every grading call takes `latency` seconds"""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def start_chat(self, history=None):
+        return SimulatedChat(self.latency)
+
+
+def make_batch(rng, peers, size, sentences):
+    """Answers that copy a few sentences from past peers and from each other"""
+    batch = []
+    for _ in range(size):
+        own = [random_sentence(rng, rng.randint(8, 16)) for _ in range(sentences)]
+        sources = peers + batch
+        for slot in rng.sample(range(sentences), 3):
+            source = rng.choice(sources).split(". ")
+            own[slot] = source[rng.randrange(len(source) - 1)].rstrip(".") + "."
+        batch.append(" ".join(own))
+    return batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--peers", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=64)
+    parser.add_argument("--sentences", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated seconds per grading call")
+    args = parser.parse_args()
+
+    grading = load_grading_module()
+    rng = random.Random(11)
+    _, peer_answers = make_corpus(args.peers, args.sentences)
+    batch = make_batch(rng, peer_answers, args.batch, args.sentences)
+    grading.plagiarism_models.set(fit_plagiarism_models(
+        [grading.preprocess_text(text) for text in peer_answers[:200] + batch[:50]]))
+
+    scratch = tempfile.mkdtemp(prefix="bench_batch_")
+    grading.PEER_ANSWERS_DIR = scratch
+    grading.peer_index_store = grading.PeerIndexStore(os.path.join(scratch, "index"))
+    os.makedirs(grading.peer_index_store.directory)
+
+    def entries(texts, keys):
+        for key, text in zip(keys, texts):
+            answer = grading.analyze_answer(text)
+            yield key, answer.doc, answer.fingerprints, answer.signature
+
+    def build(assignment_id, texts, keys):
+        index = grading.PeerIndex(grading.peer_index_fingerprint(), len(grading.plagiarism_models.get()[1].vocabulary_),
+                                  grading.LSH_NUM_PERM)
+        index.add_many(entries(texts, keys))
+        grading.peer_index_store.get(assignment_id, grading.peer_index_fingerprint(), lambda: index)
+
+    past_keys = [f"past_{i}" for i in range(args.peers)]
+    batch_keys = [f"batch_{i}" for i in range(args.batch)]
+    build("past", peer_answers, past_keys)
+    build("full", peer_answers + batch, past_keys + batch_keys)
+
+    batch_time, batch_results = timed(grading.detect_plagiarism_batch, batch, "past", batch_keys, repeat=1)
+    start = time.perf_counter()
+    single_results = [grading.detect_plagiarism_with_peers(text, "full", key) for text, key in zip(batch, batch_keys)]
+    single_time = time.perf_counter() - start
+    mismatches = sum(a != b for a, b in zip(batch_results, single_results))
+    flagged = sum(result["is_plagiarized"] for result in batch_results)
+    print(f"peers={args.peers} batch={args.batch} sentences={args.sentences}")
+    print(f"plagiarism: batch {batch_time:.3f}s vs one call per answer {single_time:.3f}s, "
+          f"{flagged}/{args.batch} flagged, {mismatches} mismatches")
+
+    # Grading throughput with a simulated model (peer saving goes to the scratch directory)
+    grading.model = SimulatedModel(args.latency)
+    question, model_answer, rubric = "Explain the design.", "Reference answer.", "Rubric."
+    submissions = list(zip(batch_keys, batch))
+
+    start = time.perf_counter()
+    for student_id, answer in submissions:
+        grading.check_assignment("seq", question, answer, student_id, model_answer, rubric, 10)
+    sequential = time.perf_counter() - start
+    print(f"sequential check_assignment: {sequential:.2f}s ({args.batch / sequential:.1f} answers/s)")
+    for workers in (1, 4, 16):
+        start = time.perf_counter()
+        results = grading.check_assignment_batch(f"batch_w{workers}", question, submissions, model_answer,
+                                                 rubric, 10, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        graded = sum(result["score_data"] is not None for result in results)
+        print(f"check_assignment_batch workers={workers:<2}: {elapsed:.2f}s "
+              f"({args.batch / elapsed:.1f} answers/s, {graded}/{args.batch} graded)")
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
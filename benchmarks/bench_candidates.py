@@ -0,0 +1,119 @@
+"""Deduplication rules and upsert throughput of the candidate repository.
+
+Usage: python benchmarks/bench_candidates.py [--candidates 5000]
+
+Saves candidates through chatbot.candidate_repository.CandidateRepository and
+checks the upsert rules: a repeated save of a session or a returning email
+updates one row, a session saved before its email was known is merged into
+the candidate that owns the email, and a save whose email and session belong
+to two different candidates is rejected without touching either (nor the
+candidate log, when saved through the engine). Exits non-zero on any
+violation, then times upserts into a growing database.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from common import ROOT_DIR  # noqa: F401  (puts the repo root on sys.path)
+from chatbot.candidate_repository import CandidateConflict, CandidateRepository
+from chatbot.candidate_store import get_store
+from chatbot.engine import ConversationEngine
+from config import CONVERSATION_STATES, DEFAULT_CANDIDATE
+
+
+def candidate(session_id, email, name="Jane Doe", tech_stack=("Python",)):
+    return {"session_id": session_id, "email": email, "name": name, "tech_stack": list(tech_stack)}
+
+
+def check_rules(repository):
+    """Problems with the upsert rules (empty if they all hold)"""
+    problems = []
+
+    first = repository.upsert(candidate("s1", "jane@example.com"))
+    if repository.upsert(candidate("s1", "Jane@Example.com ", name="Jane Q. Doe")) != first:
+        problems.append("a repeated save of a session created a second row")
+    if repository.upsert(candidate("s2", "jane@example.com", tech_stack=("Go",))) != first:
+        problems.append("a returning email created a second row")
+    jane = repository.get_by_email("jane@example.com")
+    if jane["session_id"] != "s2" or jane["tech_stack"] != ["Go"]:
+        problems.append(f"the returning email did not update the row: {jane}")
+
+    # Saved before the email was known, then saved with the email of an existing candidate
+    repository.upsert(candidate("s3", "", name="Jane"))
+    if repository.upsert(candidate("s3", "jane@example.com")) != first:
+        problems.append("a session without an email was not merged into the email's candidate")
+    if repository.count() != 1 or repository.get_by_session("s3")["email"] != "jane@example.com":
+        problems.append("the merged session still has its own row")
+
+    # The email belongs to one candidate and the session to another: neither may be lost
+    repository.upsert(candidate("s4", "john@example.com", name="John Roe"))
+    try:
+        repository.upsert(candidate("s4", "jane@example.com"))
+        problems.append("a save joining two candidates was accepted")
+    except CandidateConflict:
+        pass
+    john, jane = repository.get_by_session("s4"), repository.get_by_email("jane@example.com")
+    if john is None or john["email"] != "john@example.com" or jane["session_id"] != "s3":
+        problems.append(f"a rejected save changed the stored candidates: {john} {jane}")
+    if repository.count() != 2:
+        problems.append(f"expected 2 candidates after the rejected save, found {repository.count()}")
+    return problems
+
+
+def check_rejected_save(directory):
+    """Problems with saving through the engine (empty if a rejected save logs nothing)"""
+    log_file = os.path.join(directory, "candidates.jsonl")
+    engine = ConversationEngine(None, CONVERSATION_STATES, DEFAULT_CANDIDATE, {}, candidate_log_file=log_file,
+                                candidate_db_file=os.path.join(directory, "engine.db"))
+    session = engine.new_session()
+    saved = []
+    for session_id, email in (("e1", "jane@example.com"), ("e2", "john@example.com"), ("e2", "jane@example.com")):
+        session.candidate_data = candidate(session_id, email)
+        try:
+            engine.save(session)
+            saved.append(session_id)
+        except CandidateConflict:
+            pass
+    store = get_store(log_file)
+    store.flush()
+    logged = [record["session_id"] for record in store.iter_records()]
+    if saved != ["e1", "e2"] or logged != saved:
+        return [f"expected the log to hold only the accepted saves {saved}, found {logged}"]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        repository = CandidateRepository(os.path.join(directory, "rules.db"))
+        problems = check_rules(repository) + check_rejected_save(directory)
+        repository.close()
+        for problem in problems:
+            print(f"  {problem}")
+        print(f"upsert rules: {'ok' if not problems else f'{len(problems)} problems'}")
+
+        repository = CandidateRepository(os.path.join(directory, "timing.db"))
+        start = time.perf_counter()
+        for n in range(args.candidates):
+            repository.upsert(candidate(f"session-{n}", f"candidate{n}@example.com", tech_stack=("Python", "AWS")))
+        inserted = time.perf_counter() - start
+        start = time.perf_counter()
+        for n in range(0, args.candidates, 2):
+            repository.upsert(candidate(f"session-{n}-again", f"candidate{n}@example.com"))
+        updated = time.perf_counter() - start
+        print(f"{args.candidates} inserts: {1e3 * inserted / args.candidates:.3f} ms each; "
+              f"{args.candidates // 2} returning emails: {2e3 * updated / args.candidates:.3f} ms each")
+        if repository.count() != args.candidates:
+            problems.append(f"expected {args.candidates} candidates, found {repository.count()}")
+        repository.close()
+    if problems:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
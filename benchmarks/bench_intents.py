@@ -0,0 +1,144 @@
+"""Labeled corpus and microbenchmark for the consent/refusal/exit classifier.
+
+Usage: python benchmarks/bench_intents.py [--iterations 2000]
+
+Runs the labeled corpus through the compiled classifier (exiting non-zero on
+any mismatch), then compares its accuracy and speed with the original
+keyword substring checks from app.py. A second corpus of answers to profile
+and technical questions checks that an answer using an exit word does not
+end the screening while a bare "I'm done" still does.
+"""
+
+import argparse
+import time
+
+from common import ROOT_DIR  # noqa: F401  (puts the repo root on sys.path)
+from chatbot.intents import EXIT, NEGATIVE, NONE, POSITIVE, get_intent_classifier
+from config import EXIT_KEYWORDS
+
+CORPUS = [
+    ("yes", POSITIVE),
+    ("Y", POSITIVE),
+    ("Sure, let's go!", POSITIVE),
+    ("Okay I'm ready", POSITIVE),
+    ("go ahead", POSITIVE),
+    ("No problem, happy to continue", POSITIVE),
+    ("I don't mind at all", POSITIVE),
+    ("Sounds good to me", POSITIVE),
+    ("Let’s do this", POSITIVE),
+    ("no", NEGATIVE),
+    ("N", NEGATIVE),
+    ("Nope, not now", NEGATIVE),
+    ("I'm not ready yet", NEGATIVE),
+    ("No thanks", NEGATIVE),
+    ("maybe later", NEGATIVE),
+    ("I don't want to do this", NEGATIVE),
+    ("Please cancel", NEGATIVE),
+    ("not sure", NEGATIVE),
+    ("I don't know", NEGATIVE),
+    ("exit", EXIT),
+    ("bye!", EXIT),
+    ("I'm done", EXIT),
+    ("Goodbye, thanks", EXIT),
+    ("quit", EXIT),
+    ("stop", EXIT),
+    ("John Smith", NONE),
+    ("john@example.com", NONE),
+    ("+1 555 123 4567", NONE),
+    ("I know Python", NONE),
+    ("Anna Kendall", NONE),
+    ("I would recommend a backend role", NONE),
+    ("London, UK", NONE),
+    ("Senior frontend engineer", NONE),
+    ("I send events to a queue and the consumer appends them to the end of a log once processing is done", NONE),
+    ("Yesterday I was in Tokyo", NONE),
+    ("Notting Hill", NONE),
+    ("5 years", NONE),
+]
+
+# Messages sent while a profile field or technical question is being answered (classified with
+# answering=True), labeled with whether they end the screening
+ANSWER_CORPUS = [
+    ("Front end developer", False),
+    ("Back end engineer", False),
+    ("West End, London", False),
+    ("finish line inc", False),
+    ("I would stop the consumer, drain the queue and then restart it", False),
+    ("Stop the world pauses", False),
+    ("Call close() at the end", False),
+    ("Mark the job as done", False),
+    ("We quit using cron", False),
+    ("I'd exit early on invalid input", False),
+    ("I'm done", True),
+    ("bye!", True),
+    ("Goodbye, thanks", True),
+    ("quit", True),
+    ("stop please", True),
+    ("ok I'm done for today", True),
+]
+
+
+def legacy_classify(user_input):
+    """The original checks from app.py, in the order handle_user_input applied them"""
+    if any(keyword in user_input.lower() for keyword in EXIT_KEYWORDS):
+        return EXIT
+    user_input_lower = user_input.lower().strip()
+    positive = [
+        'yes', 'y', 'yeah', 'yep', 'sure', 'ok', 'okay', 'proceed', 'continue',
+        'go ahead', 'start', 'begin', 'ready', 'let\'s go', 'lets go', 'fine',
+        'alright', 'agree', 'accept', 'let\'s do this', 'lets do this'
+    ]
+    if any(keyword in user_input_lower for keyword in positive):
+        return POSITIVE
+    negative = [
+        'no', 'n', 'nope', 'not now', 'maybe later', 'stop', 'cancel',
+        'don\'t want', 'dont want', 'refuse', 'decline', 'not interested'
+    ]
+    if any(keyword in user_input_lower for keyword in negative):
+        return NEGATIVE
+    return NONE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    classifier = get_intent_classifier()
+    failures = 0
+    legacy_correct = 0
+    for text, expected in CORPUS:
+        intent = classifier.classify(text)
+        if intent != expected:
+            failures += 1
+            print(f"FAIL: {text!r}: expected {expected}, got {intent}")
+        legacy_correct += legacy_classify(text) == expected
+    print(f"classifier: {len(CORPUS) - failures}/{len(CORPUS)} correct")
+    print(f"legacy:     {legacy_correct}/{len(CORPUS)} correct")
+    answer_failures = 0
+    for text, ends in ANSWER_CORPUS:
+        intent = classifier.classify(text, answering=True)
+        if (intent == EXIT) != ends:
+            answer_failures += 1
+            print(f"FAIL (answering): {text!r}: expected {'exit' if ends else 'an answer'}, got {intent}")
+    print(f"answers:    {len(ANSWER_CORPUS) - answer_failures}/{len(ANSWER_CORPUS)} correct")
+    failures += answer_failures
+
+    texts = [text for text, _ in CORPUS]
+    timings = {}
+    for name, classify in (("classifier", classifier.classify), ("legacy", legacy_classify)):
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            for text in texts:
+                classify(text)
+        timings[name] = time.perf_counter() - start
+
+    calls = args.iterations * len(texts)
+    for name, elapsed in timings.items():
+        print(f"{name + ':':<11} {1e6 * elapsed / calls:.2f} us/call")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Evaluation job queue: submit latency, drain throughput and crash recovery.
+
+Usage: python benchmarks/bench_jobs.py [--jobs 64] [--latency 0.1]
+
+Submits jobs whose handler sleeps for `latency` seconds (a stand-in for the
+Gemini calls), drains them with 1, 4 and 8 workers, then simulates a worker
+dying mid-job and checks that the job is picked up again once its lease
+expires, by a queue opened on the same file (as after a restart). Finally
+checks that a job running for several lease periods keeps its lease, and that
+a worker whose lease was taken over cannot record its outcome.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from common import ROOT_DIR  # noqa: F401  (puts the repo root on sys.path)
+from grading.jobs import DONE, JobQueue, JobWorkerPool
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.1, help="Simulated seconds per job")
+    args = parser.parse_args()
+
+    def handler(payload):
+        time.sleep(args.latency)
+        return {"echo": payload["n"]}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in (1, 4, 8):
+            queue = JobQueue(os.path.join(directory, f"jobs_{workers}.db"))
+            start = time.perf_counter()
+            job_ids = [queue.submit("evaluate", {"n": n}) for n in range(args.jobs)]
+            submit_time = time.perf_counter() - start
+
+            pool = JobWorkerPool(queue, {"evaluate": handler}, workers, poll_interval=0.01)
+            start = time.perf_counter()
+            pool.start()
+            while queue.counts()[DONE] < args.jobs:
+                time.sleep(0.01)
+            drain_time = time.perf_counter() - start
+            pool.stop()
+            assert all(queue.get(job_id)["result"] == {"echo": n} for n, job_id in enumerate(job_ids))
+            print(f"workers={workers}: submit {1e3 * submit_time / args.jobs:.2f} ms/job, "
+                  f"drained {args.jobs} jobs in {drain_time:.2f}s ({args.jobs / drain_time:.1f} jobs/s)")
+            queue.close()
+
+        # A worker claims a job and dies before completing it
+        path = os.path.join(directory, "crash.db")
+        queue = JobQueue(path, lease_seconds=0.5)
+        job_id = queue.submit("evaluate", {"n": 7})
+        assert queue.claim()["id"] == job_id
+        queue.close()
+
+        restarted = JobQueue(path, lease_seconds=0.5)
+        assert restarted.claim() is None, "job reclaimed before its lease expired"
+        time.sleep(0.6)
+        pool = JobWorkerPool(restarted, {"evaluate": handler}, 1, poll_interval=0.01)
+        pool.run_one()
+        job = restarted.get(job_id)
+        print(f"after restart: status={job['status']} attempts={job['attempts']} result={job['result']}")
+        restarted.close()
+        failures = job["status"] != DONE or job["attempts"] != 2
+
+        # A job outlives its lease several times over while the worker renews it
+        queue = JobQueue(os.path.join(directory, "long.db"), lease_seconds=0.3)
+        job_id = queue.submit("evaluate", {"n": 1})
+        pool = JobWorkerPool(queue, {"evaluate": lambda payload: time.sleep(1.2) or "slow"}, 1, poll_interval=0.01)
+        pool.start()
+        time.sleep(0.6)
+        stolen = queue.claim()
+        while queue.get(job_id)["status"] != DONE:
+            time.sleep(0.01)
+        pool.stop()
+        job = queue.get(job_id)
+        print(f"long job: reclaimed mid-run={stolen is not None} attempts={job['attempts']} result={job['result']}")
+        failures = failures or stolen is not None or job["attempts"] != 1
+
+        # A stalled worker's lease expires and another attempt takes the job over
+        job_id = queue.submit("evaluate", {"n": 2})
+        stale = queue.claim()
+        time.sleep(0.4)
+        current = queue.claim()
+        stale_recorded = queue.complete(job_id, "stale", stale["attempts"])
+        stale_renewed = queue.renew(job_id, stale["attempts"])
+        current_recorded = queue.complete(job_id, "current", current["attempts"])
+        job = queue.get(job_id)
+        print(f"stale worker: recorded={stale_recorded} renewed={stale_renewed} result={job['result']}")
+        queue.close()
+        failures = failures or stale_recorded or stale_renewed or not current_recorded or job["result"] != "current"
+        if failures:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
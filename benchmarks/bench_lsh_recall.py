@@ -0,0 +1,121 @@
+"""Recall and speed of LSH candidate lookup versus exact peer scoring.
+
+Usage: python benchmarks/bench_lsh_recall.py [--peers 5000] [--bands 64] [--rows 2] [--min-recall 0.95]
+
+Plants near-duplicates of each query (copying 20%-100% of its sentences) in a
+corpus of unrelated answers, then reports:
+- candidate recall: share of peers whose exact document similarity is at or
+  above --bound that LSH returns as candidates
+- agreement of detect_plagiarism_with_peers with and without LSH
+- time per check for both methods
+Fails if candidate recall is below --min-recall, or if the LSH path misses
+any plagiarized part or most similar peer that exact scoring reports.
+Bands and rows default to the grading service's LSH_BANDS and LSH_ROWS.
+"""
+
+import argparse
+import random
+import tempfile
+
+import numpy as np
+
+from common import (fit_plagiarism_models, load_grading_module, make_vocabulary, random_answer,
+                    random_sentence, timed)
+from grading.lsh import estimate_threshold
+
+
+def plant_near_duplicates(rng, query, copies, words):
+    """Return answers copying decreasing shares of the query's sentences"""
+    sentences = query.split(". ")
+    planted = []
+    for k in range(copies):
+        share = 1.0 - 0.8 * k / max(1, copies - 1)
+        own = [s if rng.random() < share else random_sentence(rng, 12, words).rstrip(".") for s in sentences]
+        planted.append(". ".join(own))
+    return planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--peers", type=int, default=5000)
+    parser.add_argument("--sentences", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=10)
+    parser.add_argument("--copies", type=int, default=5, help="Near-duplicates planted per query")
+    parser.add_argument("--bands", type=int, default=None)
+    parser.add_argument("--rows", type=int, default=None)
+    parser.add_argument("--bound", type=float, default=0.5, help="Exact similarity a candidate must reach")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Candidate recall required to pass")
+    args = parser.parse_args()
+
+    grading = load_grading_module()
+    args.bands = args.bands or grading.LSH_BANDS
+    args.rows = args.rows or grading.LSH_ROWS
+    grading.LSH_BANDS, grading.LSH_ROWS = args.bands, args.rows
+    if args.bands * args.rows > grading.LSH_NUM_PERM:
+        grading.LSH_NUM_PERM = args.bands * args.rows
+        grading.minhasher = grading.MinHasher(grading.LSH_NUM_PERM)
+
+    rng = random.Random(11)
+    words = make_vocabulary(5000)
+    queries = [random_answer(rng, args.sentences, words) for _ in range(args.queries)]
+    peers = [random_answer(rng, args.sentences, words) for _ in range(args.peers)]
+    for query in queries:
+        for planted in plant_near_duplicates(rng, query, args.copies, words):
+            peers.insert(rng.randrange(len(peers) + 1), planted)
+
+    grading.plagiarism_models.set(fit_plagiarism_models(
+        [grading.preprocess_text(text) for text in peers[:500] + queries]))
+    grading.peer_index_store = grading.PeerIndexStore(tempfile.mkdtemp(prefix="peer_index_"))
+    index = grading.PeerIndex(grading.peer_index_fingerprint(), len(grading.plagiarism_models.get()[1].vocabulary_),
+                              grading.LSH_NUM_PERM)
+    entries = []
+    for position, text in enumerate(peers):
+        answer = grading.analyze_answer(text)
+        entries.append((f"student_{position}", answer.doc, answer.fingerprints, answer.signature))
+    index.add_many(entries)
+    index.save(grading.peer_index_store.path_for("bench"))
+
+    relevant_total = found_total = candidate_total = 0
+    same_peer = parts_exact = parts_found = 0
+    exact_time = lsh_time = 0.0
+    for query in queries:
+        answer = grading.analyze_answer(query)
+        similarities = (index.doc_vectors @ answer.doc.T).toarray().ravel()
+        relevant = set(np.flatnonzero(similarities >= args.bound).tolist())
+        candidates = set(index.candidate_positions(answer.signature, args.bands, args.rows).tolist())
+        relevant_total += len(relevant)
+        found_total += len(relevant & candidates)
+        candidate_total += len(candidates)
+
+        grading.LSH_MIN_PEERS = len(peers) + 1
+        elapsed, exact = timed(grading.detect_plagiarism_with_peers, query, "bench")
+        exact_time += elapsed
+        grading.LSH_MIN_PEERS = 0
+        elapsed, approx = timed(grading.detect_plagiarism_with_peers, query, "bench")
+        lsh_time += elapsed
+
+        same_peer += exact["most_similar_peer"] == approx["most_similar_peer"]
+        exact_parts = {(p["start"], p["source"]) for p in exact["plagiarized_parts"]}
+        approx_parts = {(p["start"], p["source"]) for p in approx["plagiarized_parts"]}
+        parts_exact += len(exact_parts)
+        parts_found += len(exact_parts & approx_parts)
+
+    threshold = estimate_threshold(args.bands, args.rows)
+    print(f"peers={len(peers)} bands={args.bands} rows={args.rows} (Jaccard threshold ~{threshold:.2f})")
+    print(f"candidate recall @ similarity>={args.bound}: {found_total}/{relevant_total} "
+          f"({100.0 * found_total / max(1, relevant_total):.1f}%)")
+    print(f"candidates per query: {candidate_total / len(queries):.1f} "
+          f"({100.0 * candidate_total / len(queries) / len(peers):.2f}% of peers)")
+    print(f"most_similar_peer agreement: {same_peer}/{len(queries)}")
+    print(f"plagiarized_parts recall: {parts_found}/{parts_exact}")
+    print(f"exact: {1000 * exact_time / len(queries):.1f} ms/check, "
+          f"lsh: {1000 * lsh_time / len(queries):.1f} ms/check")
+
+    recall = found_total / max(1, relevant_total)
+    if recall < args.min_recall or parts_found < parts_exact or same_peer < len(queries):
+        raise SystemExit(f"LSH lookup misses plagiarism (candidate recall {recall:.1%}, "
+                         f"minimum {args.min_recall:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Per-stage metrics for /api/evaluate as assignments grow.
+
+Usage: python benchmarks/bench_metrics.py [--sizes 100 1000 5000] [--requests 5]
+
+Posts answers to /api/evaluate through Flask's test client, with a
+simulated Gemini client, for assignments with a growing number of past
+peers. Scrapes /metrics after each size and prints the mean time per stage
+so a regressing stage stands out. Also reports the cost of one stage
+timing and fails if any expected stage is missing from /metrics.
+"""
+
+import argparse
+import random
+import re
+import tempfile
+import time
+from collections import defaultdict
+
+from bench_batch import SimulatedModel
+from common import (SimulatedGenerator, fit_plagiarism_models, isolate_grading_data, load_grading_module,
+                    random_answer)
+
+STAGES = ["model_answer_load", "model_answer_generate", "rubric_load", "rubric_generate", "prompt_build",
+          "gemini_call", "score_extract", "peer_load", "plagiarism_score", "peer_save"]
+
+SAMPLE = re.compile(r'^grading_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$', re.M)
+
+
+def stage_totals(text):
+    """{stage: [sum, count]} from a /metrics scrape"""
+    totals = defaultdict(lambda: [0.0, 0])
+    for kind, stage, value in SAMPLE.findall(text):
+        totals[stage][0 if kind == "sum" else 1] = float(value)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--sentences", type=int, default=20)
+    args = parser.parse_args()
+
+    grading = load_grading_module()
+    isolate_grading_data(grading, tempfile.mkdtemp(prefix="bench_metrics_"))
+    grading.model = SimulatedModel(0.0)
+    grading.cached_model = SimulatedGenerator()
+
+    rng = random.Random(5)
+    answers = [random_answer(rng, args.sentences) for _ in range(max(args.sizes) + args.requests)]
+    grading.plagiarism_models.set(fit_plagiarism_models([grading.preprocess_text(a) for a in answers[:300]]))
+    client = grading.app.test_client()
+
+    previous = stage_totals(client.get("/metrics").get_data(as_text=True))
+    print(f"{'peers':>6} " + " ".join(f"{stage[:14]:>14}" for stage in STAGES) + "   (mean ms per request)")
+    for size in args.sizes:
+        assignment_id = f"size_{size}"
+        grading.add_many_to_peer_index(assignment_id, [(f"peer_{i}", answers[i]) for i in range(size)])
+        for n in range(args.requests):
+            response = client.post("/api/evaluate", json={
+                "assignmentId": assignment_id,
+                "assignmentQuestion": "Discuss the results.",
+                "studentAnswer": answers[size + n],
+                "studentId": f"student_{n}"
+            })
+            assert response.status_code == 200, response.get_data(as_text=True)
+        text = client.get("/metrics").get_data(as_text=True)
+        totals = stage_totals(text)
+        means = [(totals[stage][0] - previous[stage][0]) * 1000 / args.requests for stage in STAGES]
+        print(f"{size:>6} " + " ".join(f"{mean:>14.2f}" for mean in means))
+        previous = totals
+
+    missing = [stage for stage in STAGES if stage not in totals]
+    print(f"requests counted: {grading.http_requests.value('/api/evaluate', 'POST', '200')}")
+
+    timer = grading.StageTimer(grading.Registry(), "bench")
+    start = time.perf_counter()
+    for _ in range(100000):
+        with timer.stage("noop"):
+            pass
+    print(f"stage timing overhead: {(time.perf_counter() - start) * 10:.2f} us")
+    if missing:
+        print(f"missing stages: {missing}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Benchmark detect_plagiarism_with_peers against the original per-pair loop.
+
+Usage: python benchmarks/bench_plagiarism.py [--peers 1000] [--sentences 50] [--legacy-peers 20]
+
+Builds a peer index for a synthetic assignment, checks that the indexed,
+vectorized implementation returns the same scores as the original
+triple-nested loop and that every sentence the loop flagged lies inside a
+copied passage reported from the same peer, then reports the speedup. The
+loop takes seconds per peer, so above `legacy-peers` peers it runs on the
+first `legacy-peers` of them (with an answer copied from those) and its time
+for every peer is extrapolated linearly.
+"""
+
+import argparse
+import tempfile
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+from common import fit_plagiarism_models, load_grading_module, make_corpus, timed
+
+
+def legacy_detect(grading, input_text, peer_answers, student_id=None):
+    """The original implementation, kept here as the reference result"""
+    preprocess_text = grading.preprocess_text
+    plagiarism_model, tfidf_vectorizer = grading.plagiarism_models.get()
+
+    processed_text = preprocess_text(input_text)
+    vectorized_text = tfidf_vectorizer.transform([processed_text])
+    model_probability = plagiarism_model.predict_proba(vectorized_text)
+    model_plagiarism_score = round(model_probability[0][1] * 100, 2)
+
+    plagiarized_parts = []
+    max_similarity = 0
+    most_similar_peer = None
+    sent_tokenize = grading.sentence_tokenizer.get()
+    sentences = sent_tokenize(input_text)
+    input_sentences_processed = [preprocess_text(s) for s in sentences]
+
+    for peer_idx, peer_answer in enumerate(peer_answers):
+        peer_id = f"peer_{peer_idx+1}"
+        if peer_id == student_id:
+            continue
+        peer_sentences = sent_tokenize(peer_answer)
+        peer_sentences_processed = [preprocess_text(s) for s in peer_sentences]
+        input_vec = tfidf_vectorizer.transform([processed_text])
+        peer_vec = tfidf_vectorizer.transform([preprocess_text(peer_answer)])
+        similarity = cosine_similarity(input_vec, peer_vec)[0][0]
+        if similarity > max_similarity:
+            max_similarity = similarity
+            most_similar_peer = peer_id
+        for i, input_sent in enumerate(input_sentences_processed):
+            if len(input_sent.split()) < 5:
+                continue
+            for j, peer_sent in enumerate(peer_sentences_processed):
+                if len(peer_sent.split()) < 5:
+                    continue
+                sent_vec1 = tfidf_vectorizer.transform([input_sent])
+                sent_vec2 = tfidf_vectorizer.transform([peer_sent])
+                sent_similarity = cosine_similarity(sent_vec1, sent_vec2)[0][0]
+                if sent_similarity > 0.8:
+                    plagiarized_parts.append({
+                        "text": sentences[i],
+                        "index": i,
+                        "similarity": float(sent_similarity),
+                        "source": f"peer_{peer_idx+1}"
+                    })
+
+    peer_plagiarism_score = max_similarity * 100 if max_similarity > 0 else 0
+    final_plagiarism_score = max(model_plagiarism_score, peer_plagiarism_score)
+    is_plagiarized = final_plagiarism_score > 30 or len(plagiarized_parts) > 0
+    return {
+        "is_plagiarized": is_plagiarized,
+        "plagiarism_score": round(final_plagiarism_score, 2),
+        "plagiarized_parts": plagiarized_parts,
+        "most_similar_peer": most_similar_peer,
+        "model_plagiarism_score": model_plagiarism_score,
+        "peer_plagiarism_score": round(peer_plagiarism_score, 2),
+        "message": "Plagiarism Detected" if is_plagiarized else "No Plagiarism Detected"
+    }
+
+
+def compare(current, legacy):
+    """Differences between the current result and the legacy one (empty if they agree)"""
+    problems = [f"{key}: {current[key]!r} != {legacy[key]!r}"
+                for key in legacy if key != "plagiarized_parts" and current[key] != legacy[key]]
+    # Legacy parts are whole sentences; passages may run across sentence boundaries
+    for part in legacy["plagiarized_parts"]:
+        sentence = part["text"].strip(".")
+        if not any(sentence in found["text"] and found["source"] == part["source"]
+                   for found in current["plagiarized_parts"]):
+            problems.append(f"sentence {part['index']} from {part['source']} not in any reported passage")
+    return problems
+
+
+def build_index(grading, peer_answers):
+    """Build a peer index holding `peer_answers` in order"""
+    index = grading.PeerIndex(grading.peer_index_fingerprint(), len(grading.plagiarism_models.get()[1].vocabulary_),
+                              grading.LSH_NUM_PERM)
+    entries = []
+    for position, text in enumerate(peer_answers):
+        answer = grading.analyze_answer(text)
+        entries.append((f"student_{position}", answer.doc, answer.fingerprints, answer.signature))
+    index.add_many(entries)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--peers", type=int, default=1000)
+    parser.add_argument("--sentences", type=int, default=50)
+    parser.add_argument("--legacy-peers", type=int, default=20,
+                        help="Run the original loop on at most this many peers (default: %(default)s)")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the current implementation")
+    args = parser.parse_args()
+
+    grading = load_grading_module()
+    input_text, peer_answers = make_corpus(args.peers, args.sentences)
+    grading.plagiarism_models.set(fit_plagiarism_models(
+        [grading.preprocess_text(text) for text in peer_answers[:200] + [input_text]]))
+
+    # Build the peer index for the synthetic assignment in a scratch directory
+    grading.peer_index_store = grading.PeerIndexStore(tempfile.mkdtemp(prefix="peer_index_"))
+    grading.peer_index_store.get("bench", grading.peer_index_fingerprint(),
+                                 lambda: build_index(grading, peer_answers))
+
+    current_time, current = timed(grading.detect_plagiarism_with_peers, input_text, "bench", "peer_3")
+    print(f"peers={args.peers} sentences={args.sentences}")
+    print(f"vectorized: {current_time:.3f}s ({len(current['plagiarized_parts'])} plagiarized parts)")
+
+    if not args.skip_legacy:
+        if args.peers > args.legacy_peers:
+            # Same seed: the peers are the first legacy_peers of the full set, and the answer copies from them
+            sample_text, sample_peers = make_corpus(args.legacy_peers, args.sentences)
+            grading.peer_index_store.get("bench-sample", grading.peer_index_fingerprint(),
+                                         lambda: build_index(grading, sample_peers))
+            sample_time, current = timed(grading.detect_plagiarism_with_peers, sample_text, "bench-sample", "peer_3")
+            print(f"legacy subsample: {args.legacy_peers} peers (vectorized {sample_time:.3f}s)")
+        else:
+            sample_text, sample_peers, sample_time = input_text, peer_answers, current_time
+        legacy_time, legacy = timed(legacy_detect, grading, sample_text, sample_peers, "peer_3", repeat=1)
+        print(f"legacy:     {legacy_time:.3f}s")
+        if len(sample_peers) < args.peers:
+            legacy_time *= args.peers / len(sample_peers)
+            print(f"legacy:     {legacy_time:.3f}s estimated for {args.peers} peers")
+        print(f"speedup:    {legacy_time / current_time:.1f}x")
+        problems = compare(current, legacy)
+        if problems:
+            raise SystemExit("MISMATCH with the legacy implementation:\n" + "\n".join(problems))
+        print(f"results agree ({len(legacy['plagiarized_parts'])} flagged sentences covered)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Memoized preprocessing against the original per-call preprocess_text.
+
+Usage: python benchmarks/bench_preprocessing.py [--peers 200] [--sentences 50]
+
+1. Checks that TextPreprocessor.normalize_many returns exactly what the
+   original preprocess_text returns for every peer answer and sentence.
+2. Times preprocessing every sentence of every peer the original way
+   (stop-word set and punctuation table rebuilt per call), in one cold batch
+   and again once the results are memoized.
+3. Checks one submission and appends it to the peer index, counting how
+   often the sentence tokenizer runs: once per distinct answer.
+"""
+
+import argparse
+import string
+import tempfile
+
+from common import fit_plagiarism_models, load_grading_module, make_corpus, timed
+
+
+def legacy_preprocess_text(text, stop_word_list):
+    """The original implementation, kept here as the reference result"""
+    if not text:
+        return ""
+    text = text.translate(str.maketrans("", "", string.punctuation))
+    text = text.lower()
+    english_stop_words = set(stop_word_list)
+    text = " ".join(word for word in text.split() if word not in english_stop_words)
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--peers", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=50)
+    args = parser.parse_args()
+
+    grading = load_grading_module()
+    from grading.preprocessing import TextPreprocessor
+
+    input_text, peer_answers = make_corpus(args.peers, args.sentences)
+    tokenize = grading.sentence_tokenizer.get()
+    stop_word_list = sorted(grading.stop_words.get())
+    texts = [sentence for answer in peer_answers for sentence in tokenize(answer)] + peer_answers
+
+    def legacy():
+        return [legacy_preprocess_text(text, stop_word_list) for text in texts]
+
+    def batch():
+        return TextPreprocessor(stop_word_list, tokenize).normalize_many(texts)
+
+    warm = TextPreprocessor(stop_word_list, tokenize)
+    warm.normalize_many(texts)
+
+    legacy_time, expected = timed(legacy)
+    cold_time, cold = timed(batch)
+    warm_time, memoized = timed(warm.normalize_many, texts)
+    mismatches = sum(a != b for a, b in zip(expected, cold)) + sum(a != b for a, b in zip(expected, memoized))
+    print(f"{len(texts)} texts ({args.peers} answers and their sentences)")
+    print(f"legacy per call: {legacy_time * 1000:.1f} ms")
+    print(f"batch cold:      {cold_time * 1000:.1f} ms ({legacy_time / cold_time:.1f}x)")
+    print(f"batch memoized:  {warm_time * 1000:.1f} ms ({legacy_time / warm_time:.1f}x)")
+    print(f"mismatches: {mismatches}")
+
+    grading.plagiarism_models.set(fit_plagiarism_models(
+        [grading.preprocess_text(text) for text in peer_answers + [input_text]]))
+    grading.peer_index_store = grading.PeerIndexStore(tempfile.mkdtemp(prefix="peer_index_"))
+    grading.add_many_to_peer_index("bench", [(f"past_{i}", text) for i, text in enumerate(peer_answers)])
+
+    calls = []
+    preprocessor = grading.text_preprocessor.get()
+    preprocessor.sentence_tokenizer = lambda text: calls.append(text) or tokenize(text)
+    grading.detect_plagiarism_with_peers(input_text, "bench", "student")
+    grading.add_to_peer_index("bench", "student", input_text)
+    print(f"sentence tokenizer calls for check + index append: {len(calls)}")
+
+    if mismatches or len(calls) != 1:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
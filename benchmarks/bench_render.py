@@ -0,0 +1,82 @@
+"""Streamlit rerun time as the screening conversation grows.
+
+Usage: python benchmarks/bench_render.py [--sizes 10 100 1000 5000] [--reruns 5]
+
+Runs app.py headless (streamlit.testing AppTest, simulated model) with a
+session holding N multi-paragraph messages and times a rerun, once with the
+default window of CHAT_WINDOW messages and once with the window opened to
+the whole history (what every rerun rendered before). Fails if the windowed
+rerun at the largest size takes more than twice as long as at the smallest.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from common import ROOT_DIR, random_sentence
+
+os.environ.update({"LLM_BACKEND": "simulated", "LLM_SIM_LATENCY": "fixed:0", "APP_METRICS_PORT": "0"})
+
+
+def fill_history(session, size, rng):
+    """Give `session` `size` alternating candidate and assistant messages"""
+    for n in range(size):
+        if n % 2:
+            content = "\n\n".join(" ".join(random_sentence(rng) for _ in range(3)) for _ in range(3))
+            session.chat_history.append({"role": "assistant", "content": content})
+        else:
+            session.chat_history.append({"role": "user", "content": random_sentence(rng)})
+
+
+def rerun_seconds(session, window, reruns):
+    """Median seconds of one rerun of app.py with `session` and the given history window"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT_DIR, "app.py"), default_timeout=120)
+    at.session_state["session_id"] = session.id
+    at.session_state["history_window"] = window
+    at.run()
+    assert not at.exception, at.exception
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), len(at.markdown)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bench_render_"))  # Spilled history and caches stay out of the repo
+    from chatbot.sessions import get_session_store
+    from config import CHAT_WINDOW
+
+    sessions = get_session_store()
+    engine = sessions.engine
+    rng = random.Random(11)
+    windowed = {}
+    print(f"{'messages':>8} {'windowed ms':>12} {'elements':>9} {'full ms':>10} {'elements':>9}")
+    for size in args.sizes:
+        session = sessions.create()
+        fill_history(session, size, rng)
+        session.conversation_state = engine.states["TECHNICAL_QUESTIONS"]
+        windowed[size], shown = rerun_seconds(session, CHAT_WINDOW, args.reruns)
+        full, all_shown = rerun_seconds(session, size, args.reruns)
+        print(f"{size:>8} {windowed[size] * 1000:>12.1f} {shown:>9} {full * 1000:>10.1f} {all_shown:>9}")
+        sessions.delete(session.id)
+
+    smallest, largest = min(args.sizes), max(args.sizes)
+    if windowed[largest] > 2 * windowed[smallest]:
+        print(f"windowed rerun grew from {windowed[smallest] * 1000:.1f} ms to {windowed[largest] * 1000:.1f} ms")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
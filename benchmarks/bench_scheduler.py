@@ -0,0 +1,124 @@
+"""Gemini call scheduler under a simulated quota.
+
+Usage: python benchmarks/bench_scheduler.py [--batch 120] [--interactive 20] [--quota 10]
+
+A simulated model allows `quota` requests per rolling second and raises a 429
+beyond that. Batch callers fire as fast as they can on 8 threads while
+interactive callers arrive every 0.25 s. The scheduler runs at 90% of the
+quota (time is scaled: one simulated minute is one second), first without
+the scheduler and then through it. Partway through the quota drops by half
+to exercise the adaptive backoff.
+"""
+
+import argparse
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from common import ROOT_DIR  # noqa: F401  (puts the repo root on sys.path)
+from llm.scheduler import BATCH, INTERACTIVE, Scheduler
+
+
+class QuotaExceeded(Exception):
+    code = 429
+
+
+class SimulatedQuotaModel:
+    """Answers after `latency` seconds, or raises a 429 above `quota` calls per second"""
+
+    def __init__(self, quota, latency=0.05):
+        self.quota = quota
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self.rejected = 0
+
+    def call(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if len(self._recent) >= self.quota:
+                self.rejected += 1
+                raise QuotaExceeded("429 Resource has been exhausted")
+            self._recent.append(now)
+        time.sleep(self.latency)
+        return "ok"
+
+
+def run(args, scheduler):
+    backend = SimulatedQuotaModel(args.quota)
+    waits = {INTERACTIVE: [], BATCH: []}
+    failures = {INTERACTIVE: 0, BATCH: 0}
+    lock = threading.Lock()
+
+    def call(priority):
+        start = time.monotonic()
+        try:
+            if scheduler is None:
+                backend.call()
+            else:
+                scheduler.run(backend.call, priority=priority)
+        except Exception:
+            with lock:
+                failures[priority] += 1
+            return
+        with lock:
+            waits[priority].append(time.monotonic() - start)
+
+    def lower_quota():
+        time.sleep(args.drop_after)
+        backend.quota = max(1, args.quota // 2)
+
+    start = time.monotonic()
+    threading.Thread(target=lower_quota, daemon=True).start()
+    with ThreadPoolExecutor(max_workers=8) as batch_pool, ThreadPoolExecutor(max_workers=4) as chat_pool:
+        batch = [batch_pool.submit(call, BATCH) for _ in range(args.batch)]
+        chats = []
+        for _ in range(args.interactive):
+            time.sleep(0.25)
+            chats.append(chat_pool.submit(call, INTERACTIVE))
+        for future in batch + chats:
+            future.result()
+    elapsed = time.monotonic() - start
+
+    def summary(priority):
+        done = sorted(waits[priority])
+        if not done:
+            return "none succeeded"
+        return f"latency p50 {done[len(done) // 2]:.2f}s max {done[-1]:.2f}s"
+
+    print(f"  succeeded: batch {len(waits[BATCH])}/{args.batch}, interactive "
+          f"{len(waits[INTERACTIVE])}/{args.interactive}; 429s from backend: {backend.rejected}; {elapsed:.1f}s")
+    print(f"  interactive {summary(INTERACTIVE)}; batch {summary(BATCH)}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch", type=int, default=120)
+    parser.add_argument("--interactive", type=int, default=20)
+    parser.add_argument("--quota", type=int, default=10, help="Backend requests per second")
+    parser.add_argument("--drop-after", type=float, default=4.0, help="Seconds before the quota halves")
+    args = parser.parse_args()
+
+    print("direct calls:")
+    run(args, None)
+
+    # rpm is per simulated minute, i.e. per second here; small burst, short backoff
+    scheduler = Scheduler(rpm=int(args.quota * 0.9), burst=2, max_concurrency=8, max_retries=6,
+                          queue_timeout=None, base_delay=0.05, max_delay=1.0)
+    for bucket in (scheduler.requests, scheduler.tokens):
+        bucket.limit *= 60
+        bucket.rate *= 60
+    print("through the scheduler:")
+    failures = run(args, scheduler)
+    stats = scheduler.stats()
+    print(f"  throttled {stats['throttled']}, retries {stats['retries']}, failures {stats['failures']}")
+    if failures[INTERACTIVE]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Correctness and scaling of score extraction from grading responses.
+
+Usage: python benchmarks/bench_scoring.py [--sizes 1000 10000 100000] [--repeat 3]
+
+Runs a set of grading responses (structured envelopes, fenced and bare
+trailing score objects, braces in the feedback prose, no score at all)
+through grading.scoring.parse_score, exiting non-zero on any wrong result,
+and through the original regex extraction from gemini-ass.py for
+comparison. Then times both on responses of growing size, including
+feedback full of '{' with no score object (quadratic for the greedy regex),
+an object holding many nested score objects and one with many keys as long
+as "total_score"; each response is also fed to a ScoreParser in
+16-character chunks, as when streamed. Fails if the time per character
+(whole or streamed) at the largest size is more than three times that at
+the smallest.
+"""
+
+import argparse
+import json
+import re
+import time
+
+from common import ROOT_DIR  # noqa: F401  (puts the repo root on sys.path)
+from grading.scoring import EMBEDDED, FAILED, STRUCTURED, ScoreParser, parse_score
+
+SCORE = {"total_score": 7, "max_score": 10, "percentage": 70, "criteria_scores": {"Content": 4, "Clarity": 3}}
+ENVELOPE = {"feedback": "## Overall Assessment\nGood work.", "total_score": 7, "max_score": 10, "percentage": 70,
+            "criteria_scores": [{"criterion": "Content", "score": 4}, {"criterion": "Clarity", "score": 3}]}
+FEEDBACK = "## Overall Assessment\nGood work.\n\n"
+
+# (name, response, expected method, expected feedback (None: not checked))
+CASES = [
+    ("structured envelope", json.dumps(ENVELOPE), STRUCTURED, ENVELOPE["feedback"]),
+    ("fenced score", FEEDBACK + "```json\n" + json.dumps(SCORE) + "\n```", EMBEDDED, FEEDBACK),
+    ("bare trailing score", FEEDBACK + json.dumps(SCORE, indent=2), EMBEDDED, FEEDBACK),
+    ("fenced envelope", "```json\n" + json.dumps(ENVELOPE) + "\n```", EMBEDDED, ENVELOPE["feedback"]),
+    ("braces in prose", "Use a dict like {key: value} here.\n\n" + json.dumps(SCORE), EMBEDDED,
+     "Use a dict like {key: value} here.\n\n"),
+    ("code block before score", FEEDBACK + "```python\nd = {'a': 1}\n```\n\n```json\n" + json.dumps(SCORE) + "\n```",
+     EMBEDDED, FEEDBACK + "```python\nd = {'a': 1}\n```\n\n"),
+    ("braces inside strings", FEEDBACK + json.dumps(dict(SCORE, note="uses { and } and \"quotes\"")), EMBEDDED, None),
+    ("unbalanced brace in prose", "An open { brace.\n" + json.dumps(SCORE), EMBEDDED, None),
+    ("last score wins", json.dumps(dict(SCORE, total_score=1)) + "\n" + json.dumps(SCORE), EMBEDDED, None),
+    ("no score", FEEDBACK + "No JSON here {at all}.", FAILED, None),
+    ("broken score", FEEDBACK + '{"total_score": 7, "max_score":', FAILED, None),
+]
+
+
+def legacy_extract(feedback_text):
+    """The original extract_score_data from gemini-ass.py"""
+    json_match = re.search(r'```json\s*(.*?)\s*```', feedback_text, re.DOTALL)
+    if not json_match:
+        json_match = re.search(r'{[\s\S]*"total_score"[\s\S]*}', feedback_text)
+
+    score_data = None
+    if json_match:
+        try:
+            json_str = json_match.group(1) if '```json' in feedback_text else json_match.group(0)
+            score_data = json.loads(json_str)
+            feedback_text = re.sub(r'```json\s*(.*?)\s*```', '', feedback_text, flags=re.DOTALL)
+            feedback_text = re.sub(r'{[\s\S]*"total_score"[\s\S]*}', '', feedback_text)
+        except json.JSONDecodeError:
+            score_data = None
+
+    return feedback_text, score_data
+
+
+def check_cases():
+    """Run CASES through parse_score (and chunked through ScoreParser); returns the number of failures"""
+    failures = 0
+    print(f"{'case':<28} {'parse_score':<12} {'legacy':<8}")
+    for name, text, method, feedback in CASES:
+        got_feedback, score_data, got_method = parse_score(text)
+        ok = got_method == method and (feedback is None or got_feedback.strip() == feedback.strip())
+        if method != FAILED:
+            ok = ok and score_data["total_score"] == 7
+            ok = ok and score_data["criteria_scores"] == SCORE["criteria_scores"]
+        if method == EMBEDDED:
+            parser = ScoreParser()
+            for n in range(0, len(text), 3):
+                parser.feed(text[n:n + 3])
+            ok = ok and parser.result() == (got_feedback, score_data)
+        legacy = legacy_extract(text)[1]
+        legacy_ok = (legacy is None) if method == FAILED else (legacy is not None and legacy.get("total_score") == 7)
+        print(f"{name:<28} {'ok' if ok else 'WRONG':<12} {'ok' if legacy_ok else 'wrong':<8}")
+        failures += not ok
+    return failures
+
+
+KINDS = ("structured", "fenced", "no score", "nested", "keys")
+
+
+def make_response(size, kind):
+    """Grading response of about `size` characters"""
+    paragraph = "The answer explains {the idea} well but misses an edge case. "
+    prose = (paragraph * (size // len(paragraph) + 1))[:size]
+    if kind == "fenced":
+        return prose + "\n\n```json\n" + json.dumps(SCORE) + "\n```"
+    if kind == "no score":
+        return prose.replace("}", " ")  # Only opening braces: worst case for the greedy regex
+    if kind == "nested":
+        # Every inner object holds the score key, so each one is decoded as it closes
+        inner = [f'"c{n}": {{"total_score": {n % 10}}}' for n in range(size // 25 + 1)]
+        return "{" + ", ".join(inner) + "}"
+    if kind == "keys":
+        # Every key is as long as "total_score", so each one is compared with it
+        keys = [f'"k{n:010d}": 1' for n in range(size // 18 + 1)]
+        return "{" + ", ".join(keys) + ', "total_score": 7}'
+    return json.dumps(dict(ENVELOPE, feedback=prose))
+
+
+def parse_streamed(text, chunk=16):
+    """Feed `text` to a ScoreParser in small chunks, as a streamed response arrives"""
+    parser = ScoreParser()
+    for n in range(0, len(text), chunk):
+        parser.feed(text[n:n + chunk])
+    return parser.result()
+
+
+def best_seconds(function, text, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    failures = check_cases()
+    print()
+    print(f"{'response':<10} {'chars':>8} {'parse_score ms':>15} {'streamed ms':>12} {'legacy ms':>10}")
+    per_char = {}
+    for kind in KINDS:
+        for size in args.sizes:
+            text = make_response(size, kind)
+            seconds = best_seconds(parse_score, text, args.repeat)
+            streamed = best_seconds(parse_streamed, text, args.repeat)
+            legacy = best_seconds(legacy_extract, text, args.repeat)
+            per_char[kind, size] = max(seconds, streamed) / len(text)
+            print(f"{kind:<10} {len(text):>8} {seconds * 1000:>15.2f} {streamed * 1000:>12.2f} {legacy * 1000:>10.2f}")
+
+    smallest, largest = min(args.sizes), max(args.sizes)
+    for kind in KINDS:
+        if per_char[kind, largest] > 3 * per_char[kind, smallest]:
+            print(f"parse_score grows faster than linearly on '{kind}' responses")
+            failures += 1
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Session memory over a simulated day of screening traffic.
+
+Usage: python benchmarks/bench_sessions.py [--hours 24] [--per-hour 2000] [--ttl 1800]
+
+Runs `per-hour` whole conversations (stub model) for every simulated hour,
+each session going idle when it ends, and sweeps the session store on a
+simulated clock. Prints live sessions, their encoded size and the process
+RSS per hour, once with idle eviction to disk and once without (each in its
+own interpreter, so RSS is comparable). Fails if, with eviction, the live
+session count or RSS in the last hour exceeds the fourth hour by more than
+25%.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from run import CONVERSATION, load_engine
+
+CHECK_FROM_HOUR = 4
+ALLOWED_GROWTH = 0.25
+
+
+def simulate(args, evict):
+    """Per-hour samples of (live sessions, live bytes, suspended sessions, RSS bytes)"""
+    from chatbot.sessions import SessionStore
+    from grading.metrics import resident_memory_bytes
+
+    tmp = tempfile.mkdtemp(prefix="bench_sessions_")
+    engine = load_engine(tmp)
+    engine.history_dir = os.path.join(tmp, "chat_history")
+    engine.history_in_memory = 40
+    store = SessionStore(engine, args.ttl if evict else None, os.path.join(tmp, "sessions"))
+    samples = []
+    for hour in range(args.hours):
+        for n in range(args.per_hour):
+            now = hour * 3600 + n * 3600 / args.per_hour
+            session = store.create()
+            engine.start(session)
+            for message in CONVERSATION:
+                engine.handle(session, message)
+            session.last_active = now
+            if n % 100 == 0:
+                store.evict_idle(now)
+        samples.append((len(store), store.live_bytes(), store.suspended_count(), resident_memory_bytes()))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--per-hour", type=int, default=2000)
+    parser.add_argument("--ttl", type=int, default=1800)
+    parser.add_argument("--mode", choices=["evict", "keep"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(simulate(args, args.mode == "evict")))
+        return
+
+    results = {}
+    for mode in ("evict", "keep"):
+        command = [sys.executable, __file__, "--mode", mode, "--hours", str(args.hours),
+                   "--per-hour", str(args.per_hour), "--ttl", str(args.ttl)]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        results[mode] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'hour':>4} | {'live':>6} {'live KiB':>9} {'suspended':>9} {'RSS MiB':>8} | "
+          f"{'live':>6} {'live KiB':>9} {'RSS MiB':>8}   (with eviction | without)")
+    for hour, (evicted, kept) in enumerate(zip(results["evict"], results["keep"])):
+        print(f"{hour + 1:>4} | {evicted[0]:>6} {evicted[1] / 1024:>9.0f} {evicted[2]:>9} {evicted[3] / 2**20:>8.1f} | "
+              f"{kept[0]:>6} {kept[1] / 1024:>9.0f} {kept[3] / 2**20:>8.1f}")
+
+    samples = results["evict"]
+    if len(samples) > CHECK_FROM_HOUR:
+        reference, last = samples[CHECK_FROM_HOUR - 1], samples[-1]
+        if last[0] > reference[0] * (1 + ALLOWED_GROWTH) or last[3] > reference[3] * (1 + ALLOWED_GROWTH):
+            print(f"memory kept growing: {reference[0]} -> {last[0]} live sessions, "
+                  f"{reference[3] / 2**20:.1f} -> {last[3] / 2**20:.1f} MiB RSS")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
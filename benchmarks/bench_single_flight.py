@@ -0,0 +1,92 @@
+"""Burst of first submissions against single-flight model answer generation.
+
+Usage: python benchmarks/bench_single_flight.py [--processes 4] [--threads 8] [--latency 0.5]
+
+Every thread in every process asks for the same missing model answer at the
+same moment. Without coalescing each one would call the (simulated) model;
+with grading.single_flight exactly one call should happen across all
+processes, and every caller should get the same text.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from common import ROOT_DIR  # noqa: F401  (puts the repo root on sys.path)
+from grading.single_flight import SingleFlight
+
+
+def worker(directory, threads, latency, start_at, results):
+    flight = SingleFlight(os.path.join(directory, "locks"))
+    path = os.path.join(directory, "a1_model_answer.json")
+    calls_path = os.path.join(directory, "calls.log")
+
+    def load():
+        try:
+            with open(path) as f:
+                return json.load(f)["content"]
+        except FileNotFoundError:
+            return None
+
+    def generate():
+        with open(calls_path, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(latency)
+        return f"model answer from pid {os.getpid()}"
+
+    def save(text):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"content": text}, f)
+        os.replace(tmp_path, path)
+
+    values = []
+
+    def request():
+        values.append(flight.do("a1_model_answer", load, generate, save))
+
+    time.sleep(max(0.0, start_at - time.time()))
+    pool = [threading.Thread(target=request) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated model latency in seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = multiprocessing.Queue()
+        start_at = time.time() + 1.0
+        processes = [
+            multiprocessing.Process(target=worker, args=(directory, args.threads, args.latency, start_at, results))
+            for _ in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        values = [value for _ in processes for value in results.get()]
+        for process in processes:
+            process.join()
+        elapsed = time.time() - start_at
+        with open(os.path.join(directory, "calls.log")) as f:
+            calls = len(f.read().split())
+
+    requests = args.processes * args.threads
+    print(f"requests: {requests}, model calls: {calls}, distinct answers: {len(set(values))}")
+    print(f"wall time: {elapsed:.2f}s (uncoalesced: {requests} calls)")
+    if calls != 1 or len(set(values)) != 1:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Cold-start time of the grading service.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--max-import 1.0]
+
+Imports gemini-ass.py in a fresh interpreter (offline, so nothing touches the
+network) and reports how long the import took, then prewarms the heavy
+resources and reports each one's load time. Fails if the median import takes
+longer than `max_import` seconds.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from common import ROOT_DIR
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {bench!r})
+start = time.perf_counter()
+from common import load_grading_module
+grading = load_grading_module()
+imported = time.perf_counter() - start
+loads = {{}}
+if {prewarm!r}:
+    from grading.resources import prewarm
+    start = time.perf_counter()
+    prewarm(grading.PREWARM_RESOURCES).join()
+    loads = {{r.name: r.load_seconds for r in grading.PREWARM_RESOURCES}}
+    loads["total"] = time.perf_counter() - start
+print(json.dumps({{"import": imported, "loads": loads}}))
+"""
+
+
+def run_child(prewarm):
+    code = CHILD.format(root=ROOT_DIR, bench=os.path.dirname(os.path.abspath(__file__)), prewarm=prewarm)
+    env = dict(os.environ, GRADING_OFFLINE="1")
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import", type=float, default=1.0, help="Fail above this median import time")
+    args = parser.parse_args()
+
+    imports = sorted(run_child(False)["import"] for _ in range(args.runs))
+    median = imports[len(imports) // 2]
+    print(f"import gemini-ass.py: median {median * 1000:.0f} ms, max {imports[-1] * 1000:.0f} ms ({args.runs} runs)")
+
+    loads = run_child(True)["loads"]
+    for name, seconds in loads.items():
+        print(f"  prewarm {name}: {seconds * 1000:.0f} ms" if seconds is not None else f"  prewarm {name}: failed")
+    if median > args.max_import:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Correctness corpus and microbenchmark for the tech-stack matcher.
+
+Usage: python benchmarks/bench_tech_matcher.py [--iterations 2000]
+
+Runs the labeled corpus through the compiled matcher (exiting non-zero on any
+mismatch), then compares its accuracy and speed with the original per-technology
+substring search.
+"""
+
+import argparse
+import time
+
+from common import ROOT_DIR  # noqa: F401  (puts the repo root on sys.path)
+from chatbot.tech_matcher import get_tech_matcher
+from config import get_all_technologies
+
+# (candidate answer, technologies expected in order of first mention)
+CORPUS = [
+    ("I work with Python, React, MySQL, and AWS", ["Python", "React", "MySQL", "AWS"]),
+    ("Mostly JavaScript and TypeScript on the frontend", ["JavaScript", "TypeScript"]),
+    ("I have good experience with Java", ["Java"]),
+    ("I write Go and some Python", ["Go", "Python"]),
+    ("We go live with Django every week", ["Django"]),
+    ("golang microservices on k8s", ["Go", "Kubernetes"]),
+    ("Postgres and Mongo for storage, Redis for caching", ["PostgreSQL", "MongoDB", "Redis"]),
+    ("JS, Node and Express", ["JavaScript", "Node.js", "Express.js"]),
+    ("Deployed on GCP with Docker", ["Google Cloud", "Docker"]),
+    ("C++ for games and C# for tooling", ["C++", "C#"]),
+    ("cpp, csharp", ["C++", "C#"]),
+    ("HTML/CSS with Tailwind", ["HTML/CSS", "Tailwind CSS"]),
+    ("HTML and CSS, plus Bootstrap", ["HTML/CSS", "Bootstrap"]),
+    ("Vue.js and Angular", ["Vue.js", "Angular"]),
+    ("Spring Boot services behind Nginx on Linux", ["Spring Boot", "Nginx", "Linux"]),
+    ("RESTful services and GraphQL", ["REST APIs", "GraphQL"]),
+    ("Amazon Web Services and Microsoft Azure", ["AWS", "Azure"]),
+    ("I would recommend ending with JSON over HTTP", []),
+    ("Good at reacting quickly to feedback", []),
+    ("Flask, FastAPI, SQLite", ["Flask", "FastAPI", "SQLite"]),
+    ("Git and Jenkins for CI, Heroku and Firebase for hosting", ["Git", "Jenkins", "Heroku", "Firebase"]),
+    ("PHP and Ruby", ["PHP", "Ruby"]),
+    ("I use GitHub daily", []),
+    ("python3 scripts and ES6 modules", ["Python", "JavaScript"]),
+    ("google cloud platform", ["Google Cloud"]),
+]
+
+
+def legacy_parse(user_input, all_technologies):
+    """The original substring search (alphabetical order, no boundaries, no aliases)"""
+    user_input_lower = user_input.lower()
+    return [tech for tech in all_technologies if tech.lower() in user_input_lower]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    matcher = get_tech_matcher()
+    failures = 0
+    legacy_correct = 0
+    for text, expected in CORPUS:
+        found = matcher.find_all(text)
+        if found != expected:
+            failures += 1
+            print(f"FAIL: {text!r}: expected {expected}, got {found}")
+        legacy_correct += sorted(legacy_parse(text, sorted(get_all_technologies()))) == sorted(expected)
+    print(f"matcher: {len(CORPUS) - failures}/{len(CORPUS)} correct")
+    print(f"legacy:  {legacy_correct}/{len(CORPUS)} correct (ignoring order)")
+
+    texts = [text for text, _ in CORPUS]
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for text in texts:
+            matcher.find_all(text)
+    matcher_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        for text in texts:
+            # The original rebuilt the sorted technology list on every call
+            legacy_parse(text, get_all_technologies())
+    legacy_time = time.perf_counter() - start
+
+    calls = args.iterations * len(texts)
+    print(f"matcher: {1e6 * matcher_time / calls:.2f} us/call")
+    print(f"legacy:  {1e6 * legacy_time / calls:.2f} us/call")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
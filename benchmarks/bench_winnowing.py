@@ -0,0 +1,119 @@
+"""Copied-passage localization with winnowing fingerprints.
+
+Usage: python benchmarks/bench_winnowing.py [--sizes 200 2000 20000] [--peers 200] [--passages 5]
+
+Plants passages copied from random peers (15-60 words, starting and ending
+mid-sentence) into answers of growing length, then checks that every one is
+reported from the right peer with character spans that cover it and whose
+text matches the peer's text at the reported source span. Times
+fingerprinting and matching per answer; fails on a missed or wrong passage,
+or if the time per word at the largest size is more than three times that
+at the smallest.
+"""
+
+import argparse
+import random
+import time
+
+from common import load_grading_module, make_vocabulary, random_answer
+from grading.winnowing import FingerprintIndex, fingerprint_document
+
+
+def plant_passages(rng, words, peers, size, passages):
+    """An answer of about `size` words with copied passages: (text, [(peer, start, end)])"""
+    own = random_answer(rng, max(1, size // 12), words).split(" ")
+    planted = []
+    slots = sorted(rng.sample(range(len(own)), passages))
+    parts = []
+    previous = 0
+    for slot in slots:
+        parts.extend(own[previous:slot])
+        peer = rng.randrange(len(peers))
+        source = peers[peer].split(" ")
+        length = rng.randint(15, 60)
+        first = rng.randrange(1, len(source) - length)
+        parts.append((peer, source[first:first + length]))
+        previous = slot
+    parts.extend(own[previous:])
+
+    text = ""
+    for part in parts:
+        if text:
+            text += " "
+        if isinstance(part, tuple):
+            peer, copied = part
+            start = len(text)
+            text += " ".join(copied)
+            planted.append((peer, start, len(text)))
+        else:
+            text += part
+    return text, planted
+
+
+def check(grading, text, planted, peers, matches):
+    """Problems with the reported matches for the planted passages"""
+    normalize = grading.preprocess_text
+    problems = []
+    for match in matches:
+        source = peers[match.owner][match.source_start:match.source_end]
+        if normalize(text[match.start:match.end]) != normalize(source):
+            problems.append(f"passage at {match.start}-{match.end} differs from peer_{match.owner + 1}")
+    for peer, start, end in planted:
+        content = [token for token in grading.text_preprocessor.get().tokens(text) if start <= token[1] < end]
+        if not any(match.owner == peer and match.start <= content[0][1] and match.end >= content[-1][2]
+                   for match in matches):
+            problems.append(f"passage at {start}-{end} from peer_{peer + 1} not found")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 2000, 20000])
+    parser.add_argument("--peers", type=int, default=200)
+    parser.add_argument("--peer-sentences", type=int, default=40)
+    parser.add_argument("--passages", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    grading = load_grading_module()
+    preprocessor = grading.text_preprocessor.get()
+    k, window = grading.WINNOW_K, grading.WINNOW_WINDOW
+    rng = random.Random(5)
+    words = make_vocabulary(5000)
+    peers = [random_answer(rng, args.peer_sentences, words) for _ in range(args.peers)]
+    index = FingerprintIndex()
+    index.add_many(fingerprint_document(preprocessor.tokens(peer), k, window) for peer in peers)
+    print(f"peers={args.peers} k={k} window={window} (passages of {k + window - 1}+ words always found)")
+
+    failures = 0
+    per_word = {}
+    print(f"{'words':>7} {'planted':>8} {'found':>6} {'fingerprint ms':>15} {'match ms':>9}")
+    for size in args.sizes:
+        text, planted = plant_passages(rng, words, peers, size, args.passages)
+        fingerprint_times, match_times = [], []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            query = fingerprint_document(preprocessor.tokens(text), k, window)
+            middle = time.perf_counter()
+            matches = index.match(query, min_tokens=k)
+            match_times.append(time.perf_counter() - middle)
+            fingerprint_times.append(middle - start)
+        problems = check(grading, text, planted, peers, matches)
+        for problem in problems:
+            print(f"  {problem}")
+        failures += len(problems)
+        total = min(fingerprint_times) + min(match_times)
+        per_word[size] = total / len(text.split())
+        print(f"{len(text.split()):>7} {len(planted):>8} {len(matches):>6} "
+              f"{min(fingerprint_times) * 1000:>15.2f} {min(match_times) * 1000:>9.2f}")
+
+    smallest, largest = min(args.sizes), max(args.sizes)
+    if per_word[largest] > 3 * per_word[smallest]:
+        print(f"time per word grew from {per_word[smallest] * 1e6:.2f} us to {per_word[largest] * 1e6:.2f} us")
+        failures += 1
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
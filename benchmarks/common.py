@@ -0,0 +1,106 @@
+"""Shared helpers for the benchmark scripts."""
+
+import importlib.util
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+WORDS = (
+    "algorithm analysis argument assignment balance budget carbon cell climate code "
+    "compile concept current data debate demand design economy energy equation evidence "
+    "evolution experiment factor function gene graph growth history hypothesis impact "
+    "industry input law market matrix memory method model molecule network output policy "
+    "population pressure process protein quantum reaction research result sample signal "
+    "society source species structure supply system temperature theory trade value variable "
+    "velocity voltage water wave"
+).split()
+
+
+def load_grading_module():
+    """Import gemini-ass.py (its file name is not a valid module name) without its job workers and prewarming"""
+    module = sys.modules.get("gemini_ass")
+    if module is None:
+        spec = importlib.util.spec_from_file_location("gemini_ass", os.path.join(ROOT_DIR, "gemini-ass.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["gemini_ass"] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+SYLLABLES = "ba be bi bo bu da de di do du ka ke ki ko ku la le li lo lu ma me mi mo mu na ne ni no nu ra re ri ro ru sa se si so su ta te ti to tu".split()
+
+
+def make_vocabulary(size, seed=3):
+    """Build a vocabulary of `size` distinct pseudo-words"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def random_sentence(rng, length=12, words=WORDS):
+    """Build a synthetic sentence from the benchmark vocabulary"""
+    return " ".join(rng.choice(words) for _ in range(length)).capitalize() + "."
+
+
+def random_answer(rng, sentences=50, words=WORDS):
+    """Build a synthetic multi-sentence answer"""
+    return " ".join(random_sentence(rng, rng.randint(8, 16), words) for _ in range(sentences))
+
+
+def make_corpus(n_peers, sentences=50, seed=7):
+    """Return (input_text, peer_answers) with some sentences copied from peers"""
+    rng = random.Random(seed)
+    peers = [random_answer(rng, sentences) for _ in range(n_peers)]
+    own = [random_sentence(rng, rng.randint(8, 16)) for _ in range(sentences)]
+    # Copy a handful of sentences from random peers so there is plagiarism to find
+    for slot in rng.sample(range(sentences), min(5, sentences)):
+        source = rng.choice(peers).split(". ")
+        own[slot] = source[rng.randrange(len(source) - 1)] + "."
+    return " ".join(own), peers
+
+
+def fit_plagiarism_models(texts):
+    """Fit a TF-IDF vectorizer and classifier standing in for model.pkl/tfidf_vectorizer.pkl"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    vectorizer = TfidfVectorizer()
+    matrix = vectorizer.fit_transform(texts)
+    labels = [i % 2 for i in range(len(texts))]
+    classifier = LogisticRegression(max_iter=200).fit(matrix, labels)
+    return classifier, vectorizer
+
+
+def timed(fn, *args, repeat=3, **kwargs):
+    """Return (best wall time in seconds, last result) over `repeat` runs"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def isolate_grading_data(grading, root):
+    """Point the grading service's data directories at `root` so benchmarks never touch data/"""
+    grading.PEER_ANSWERS_DIR = os.path.join(root, "peer_answers")
+    grading.MODEL_ANSWERS_DIR = os.path.join(root, "model_answers")
+    grading.RUBRICS_DIR = os.path.join(root, "rubrics")
+    grading.generation_flight.lock_dir = os.path.join(root, "locks")
+    grading.peer_index_store = grading.PeerIndexStore(os.path.join(root, "peer_index"))
+
+
+class SimulatedGenerator:
+    """Stands in for the cached Gemini client that writes model answers and rubrics"""
+
+    def generate_content(self, prompt, generation_config=None, cache=False):
+        return type("Response", (), {"text": "Reference text."})()
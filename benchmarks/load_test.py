@@ -0,0 +1,287 @@
+"""Offline load test of screening and grading against the simulated Gemini backend.
+
+Usage:
+    python benchmarks/load_test.py screening [--clients 20] [--requests 100]
+    python benchmarks/load_test.py server [--clients 1000] [--requests 1000]
+    python benchmarks/load_test.py grading [--clients 8] [--requests 64]
+        [--latency lognormal:0.8,0.4] [--tokens-per-second 80] [--error-rate 0.05]
+        [--rpm 600] [--record FILE | --replay FILE]
+
+The engine and the grading app are built with LLM_BACKEND=simulated, so
+every model call goes through the real scheduler (and, for grading, the
+Flask endpoint) but never touches the network. `screening` runs candidates'
+technical rounds: the first question streams at interactive priority while
+the other two are generated in the background; it reports time to first
+token. `server` starts the screening API in-process and holds `clients`
+WebSocket sessions open at once, each running a whole screening
+conversation; it reports reply latency and time to first token of the
+streamed question. `grading` posts answers to /api/evaluate from concurrent
+clients. Injected 429/503 errors must be absorbed by the scheduler's
+retries: the run fails if any request fails.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import random_answer
+
+TECH_STACKS = [["Python", "Django", "PostgreSQL"], ["React", "TypeScript", "Node.js"], ["Java", "Spring", "Kafka"],
+               ["Go", "Kubernetes", "AWS"], ["C#", ".NET", "Azure"]]
+
+
+def configure_environment(args):
+    """Settings both apps read at import"""
+    os.environ.update({
+        "LLM_BACKEND": "simulated",
+        "LLM_SIM_LATENCY": args.latency,
+        "LLM_SIM_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "LLM_SIM_ERROR_RATE": str(args.error_rate),
+        "LLM_RPM": str(args.rpm),
+        "LLM_RECORD_FILE": args.record or "",
+        "LLM_REPLAY_FILE": args.replay or "",
+        "GRADING_OFFLINE": "1",
+        "JOB_WORKERS": "0",
+    })
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return "n/a"
+    pick = lambda fraction: values[min(len(values) - 1, int(fraction * len(values)))]
+    return f"p50 {pick(0.5):.2f}s p99 {pick(0.99):.2f}s"
+
+
+def screening_round(engine, tech_stack):
+    """One candidate's technical round; returns (time to first token, total seconds)"""
+    from llm.scheduler import BACKGROUND, call_priority
+
+    scheduled = engine.model.model  # Past the response cache, so every round reaches the backend
+    prompts = [engine.build_question_prompt(tech_stack, i) for i in range(engine.max_questions)]
+
+    def background(prompt):
+        with call_priority(BACKGROUND):
+            return scheduled.generate_content(prompt, generation_config=engine.generation_config).text
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=len(prompts) - 1) as executor:
+        pending = [executor.submit(background, prompt) for prompt in prompts[1:]]
+        first_token = None
+        for chunk in scheduled.generate_content(prompts[0], generation_config=engine.generation_config, stream=True):
+            if first_token is None:
+                first_token = time.monotonic() - start
+        for future in pending:
+            future.result()
+    return first_token, time.monotonic() - start
+
+
+def load_engine():
+    """The configured engine, with in-memory responses and history so runs leave no files behind"""
+    import sys
+
+    from common import ROOT_DIR
+
+    sys.path.insert(0, ROOT_DIR)
+    from chatbot.engine import get_engine
+    from llm.cache import CachedModel, ResponseCache
+
+    engine = get_engine()
+    engine.model = CachedModel(engine.model.model, engine.model.model_name, ResponseCache(None))
+    engine.history_dir = None
+    return engine
+
+
+def run_screening(args):
+    engine = load_engine()
+    first_tokens, totals = [], []
+    lock = threading.Lock()
+
+    def candidate(n):
+        first_token, total = screening_round(engine, TECH_STACKS[n % len(TECH_STACKS)])
+        with lock:
+            first_tokens.append(first_token)
+            totals.append(total)
+
+    elapsed, failures = drive(candidate, args)
+    print(f"screening: {len(totals)}/{args.requests} rounds in {elapsed:.1f}s "
+          f"({len(totals) / elapsed:.2f} rounds/s, {3 * len(totals) / elapsed:.2f} questions/s)")
+    print(f"  time to first token {percentiles(first_tokens)}; round {percentiles(totals)}")
+    return engine.model.model.scheduler, engine.model.model.model, failures
+
+
+def conversation(n):
+    """Candidate messages for one whole screening"""
+    tech_stack = TECH_STACKS[n % len(TECH_STACKS)]
+    return ["yes", f"Candidate {n}", f"candidate{n}@example.com", "+1 555 123 4567", f"{n % 10} years",
+            "Backend Engineer", "Berlin, Germany", f"I work with {', '.join(tech_stack)}",
+            "First answer.", "Second answer.", "Third answer."]
+
+
+async def screening_session(url, n, stats):
+    """Run one candidate's conversation over a WebSocket"""
+    import websockets
+
+    async with websockets.connect(url, max_queue=None) as socket:
+        stats["open"] += 1
+        stats["peak_open"] = max(stats["peak_open"], stats["open"])
+        try:
+            async def reply():
+                start = time.monotonic()
+                first_token = None
+                while True:
+                    event = json.loads(await socket.recv())
+                    if event["type"] == "token" and first_token is None:
+                        first_token = time.monotonic() - start
+                    elif event["type"] == "error":
+                        raise RuntimeError(event["error"])
+                    elif event["type"] == "reply":
+                        return event, first_token, time.monotonic() - start
+
+            if json.loads(await socket.recv())["type"] != "session":
+                raise RuntimeError("Expected a session event")
+            await reply()  # Greeting
+            for message in conversation(n):
+                await socket.send(json.dumps({"type": "message", "text": message}))
+                event, first_token, seconds = await reply()
+                stats["replies"].append(seconds)
+                if first_token is not None:
+                    stats["first_tokens"].append(first_token)
+            if event["state"] != "conclusion":
+                raise RuntimeError(f"Conversation ended in state {event['state']!r}")
+        finally:
+            stats["open"] -= 1
+
+
+def run_server(args):
+    import uvicorn
+
+    from chatbot.server import create_app
+
+    engine = load_engine()
+    app = create_app(engine, workers=64)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning",
+                                           ws_max_queue=1024, backlog=4096))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    url = f"ws://127.0.0.1:{port}/ws"
+    stats = {"open": 0, "peak_open": 0, "replies": [], "first_tokens": []}
+
+    async def clients():
+        limit = asyncio.Semaphore(args.clients)
+        failures = 0
+
+        async def session(n):
+            nonlocal failures
+            async with limit:
+                try:
+                    await screening_session(url, n, stats)
+                except Exception as e:
+                    failures += 1
+                    print(f"  session failed: {str(e)}")
+
+        await asyncio.gather(*(session(n) for n in range(args.requests)))
+        return failures
+
+    start = time.monotonic()
+    failures = asyncio.run(clients())
+    elapsed = time.monotonic() - start
+    server.should_exit = True
+    completed = args.requests - failures
+    print(f"server: {completed}/{args.requests} conversations in {elapsed:.1f}s, up to {stats['peak_open']} "
+          f"sessions open at once ({len(stats['replies']) / elapsed:.1f} turns/s)")
+    print(f"  reply {percentiles(stats['replies'])}; streamed question first token {percentiles(stats['first_tokens'])}")
+    return engine.model.model.scheduler, engine.model.model.model, failures
+
+
+def run_grading(args):
+    from common import SimulatedGenerator, fit_plagiarism_models, isolate_grading_data, load_grading_module
+    from llm.cache import CachedModel, ResponseCache
+
+    grading = load_grading_module()
+    isolate_grading_data(grading, tempfile.mkdtemp(prefix="load_test_"))
+    grading.cached_model = CachedModel(grading.model, grading.MODEL_NAME, ResponseCache(None))
+    rng = random.Random(9)
+    answers = [random_answer(rng, 20) for _ in range(args.requests)]
+    grading.plagiarism_models.set(fit_plagiarism_models([grading.preprocess_text(a) for a in answers[:300]]))
+    client = grading.app.test_client()
+    latencies = []
+    lock = threading.Lock()
+
+    def submit(n):
+        start = time.monotonic()
+        response = client.post("/api/evaluate", json={
+            "assignmentId": f"load_{n % 4}",
+            "assignmentQuestion": f"Explain topic {n % 4} in detail.",
+            "studentAnswer": answers[n],
+            "studentId": f"student_{n}",
+            "totalMarks": 10
+        })
+        body = response.get_json()
+        if response.status_code != 200 or body.get("score_data") is None:
+            raise RuntimeError(body.get("error") or body.get("feedback"))
+        with lock:
+            latencies.append(time.monotonic() - start)
+
+    elapsed, failures = drive(submit, args)
+    print(f"grading: {len(latencies)}/{args.requests} evaluations in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed:.2f} evaluations/s)")
+    print(f"  request {percentiles(latencies)}")
+    return grading.scheduler, grading.gemini_client.get(), failures
+
+
+def drive(work, args):
+    """Run work(n) for every request on `clients` threads; returns (seconds, failure count)"""
+    failures = 0
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        for future in [executor.submit(work, n) for n in range(args.requests)]:
+            try:
+                future.result()
+            except Exception as e:
+                failures += 1
+                print(f"  request failed: {str(e)}")
+    return time.monotonic() - start, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("target", choices=["screening", "server", "grading"])
+    parser.add_argument("--clients", type=int, default=None)
+    parser.add_argument("--requests", type=int, default=None)
+    parser.add_argument("--latency", default="lognormal:0.8,0.4", help="Time to first token distribution")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--rpm", type=int, default=600, help="Scheduler requests per minute")
+    parser.add_argument("--record", help="Append every response to this JSON lines file")
+    parser.add_argument("--replay", help="Answer from responses recorded with --record")
+    args = parser.parse_args()
+    args.clients = args.clients or {"screening": 20, "server": 1000, "grading": 8}[args.target]
+    args.requests = args.requests or {"screening": 100, "server": 1000, "grading": 64}[args.target]
+
+    configure_environment(args)
+    run = {"screening": run_screening, "server": run_server, "grading": run_grading}[args.target]
+    scheduler, backend, failures = run(args)
+
+    stats = scheduler.stats()
+    print(f"  scheduler: {stats['calls']} calls, {stats['retries']} retries ({stats['throttled']} throttled), "
+          f"{stats['failures']} failures")
+    simulated = getattr(backend, "backend", backend)  # Unwrap a RecordingBackend
+    if hasattr(simulated, "stats"):
+        backend_stats = simulated.stats()
+        print(f"  backend: {backend_stats['calls']} calls, {backend_stats['errors']} injected errors, "
+              f"{backend_stats['replayed']} replayed")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
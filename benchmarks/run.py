@@ -0,0 +1,398 @@
+"""Benchmark suite for the chat flow and the grading pipeline.
+
+Usage:
+    python benchmarks/run.py [--profile quick|full] [--only NAME] [--threshold 0.25]
+    python benchmarks/run.py --save-baseline
+
+Runs each case at each of its sizes in a fresh interpreter (offline, fixed
+seeds, Gemini replaced by an instant stub) and reports throughput, p50/p99
+latency per operation and the peak Python memory allocated while running
+it. Results are compared with the stored baseline for the profile
+(benchmarks/baselines/<profile>.json); the run fails when a case's p50 or
+peak memory grew by more than `threshold`. ``--save-baseline`` stores the
+run as the new baseline.
+
+Cases:
+    chat.parse_tech_stack             one tech-stack message
+    chat.conversation                 engine turns from greeting to conclusion (12 turns)
+    chat.save_candidate_data@N        save a new candidate with N already stored
+    grading.preprocess_text           one unseen sentence
+    grading.detect_plagiarism@N       one unseen answer against N peers
+    grading.check_assignment@N        end to end with N peers, saving the answer as a peer
+
+Large fixtures (1M candidates, 10k peers) are built once and cached in
+benchmarks/.cache; the first full run takes a few minutes longer.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import ROOT_DIR, WORDS, random_answer, random_sentence
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+CACHE_DIR = os.path.join(BENCH_DIR, ".cache")
+
+PROFILES = {
+    "quick": {"candidates": [10, 10000], "peers": [10, 1000]},
+    "full": {"candidates": [10, 10000, 1000000], "peers": [10, 1000, 10000]},
+}
+
+MIN_TIME = 1.0  # Seconds of timed operations per case (after warm-up)
+MIN_OPS = 20
+WARMUP_OPS = 3
+MEMORY_OPS = 10
+# Changes smaller than these are never regressions
+NOISE_FLOOR = {"p50_ms": 0.02, "peak_kib": 64}
+
+
+# --- Stubs -------------------------------------------------------------------
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Instant stand-in for the Gemini client used by both apps"""
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        text = f"Stub question about {str(prompt)[-40:].strip()}?"
+        if stream:
+            return iter([StubResponse(word + " ") for word in text.split()])
+        return StubResponse(text)
+
+    def start_chat(self, history=None):
+        return StubChat()
+
+
+class StubChat:
+    def send_message(self, prompt, generation_config=None, **kwargs):
+        return StubResponse('Good work.\n```json\n{"total_score": 8, "max_score": 10, "percentage": 80}\n```')
+
+
+# --- Chat cases ----------------------------------------------------------------
+
+def load_engine(tmp):
+    """Conversation engine from config with its data files under `tmp` and the stub model"""
+    sys.path.insert(0, ROOT_DIR)
+    import config
+    from chatbot.engine import ConversationEngine
+
+    return ConversationEngine(
+        StubModel(),
+        config.CONVERSATION_STATES,
+        config.DEFAULT_CANDIDATE,
+        config.GENERATION_CONFIG,
+        max_questions=config.MAX_QUESTIONS_PER_TECH,
+        question_bank_file=os.path.join(tmp, "question_bank.db"),
+        question_cache_variants=config.QUESTION_CACHE_VARIANTS,
+        candidate_log_file=os.path.join(tmp, "candidates.jsonl"),
+        candidate_db_file=os.path.join(tmp, "candidates.db"),
+        stream_responses=False
+    )
+
+
+TECH_MESSAGES = [
+    "I work with Python, Django, PostgreSQL and AWS",
+    "Mostly React.js with TypeScript, some node and docker",
+    "C++ and C#, a bit of Go; also k8s and GCP",
+    "Java, Spring Boot, MySQL, Redis, Kafka",
+    "Data science: pandas, numpy, scikit-learn, PyTorch and TensorFlow",
+]
+
+CONVERSATION = [
+    "yes", "Jane Doe", "jane@example.com", "+1 555 123 4567", "5 years", "Backend Engineer",
+    "Berlin, Germany", "I work with Python, Django and PostgreSQL",
+    "I used Django ORM with select_related to cut queries.", "Indexes on the hot columns.",
+    "Connection pooling with pgbouncer.", "bye",
+]
+
+
+def setup_parse_tech_stack(size, tmp):
+    sys.path.insert(0, ROOT_DIR)
+    from chatbot.engine import parse_tech_stack
+
+    return lambda i: parse_tech_stack(TECH_MESSAGES[i % len(TECH_MESSAGES)])
+
+
+def setup_conversation(size, tmp):
+    engine = load_engine(tmp)
+
+    def op(i):
+        session = engine.new_session()
+        for message in CONVERSATION:
+            engine.handle(session, message)
+        assert session.conversation_state == engine.states["ENDED"]
+    return op
+
+
+def candidate_fixture(size):
+    """Path of a cached candidate database holding `size` candidates (built on first use)"""
+    from chatbot.candidate_repository import CandidateRepository
+
+    path = os.path.join(CACHE_DIR, f"candidates-{size}.db")
+    if os.path.exists(path):
+        return path
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    building = f"{path}.building"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(building + suffix):
+            os.remove(building + suffix)
+    rng = random.Random(size)
+    repository = CandidateRepository(building)
+    repository._conn.execute("PRAGMA synchronous=OFF")  # fixture only; rebuilt if interrupted
+    repository.import_records({
+        "session_id": f"fixture-session-{n}",
+        "email": f"candidate{n}@example.com",
+        "name": f"Candidate {n}",
+        "position": rng.choice(["Backend Engineer", "Data Scientist", "Frontend Developer"]),
+        "location": rng.choice(["Berlin", "Remote", "New York", "Bangalore"]),
+        "tech_stack": rng.sample(["Python", "Java", "React", "AWS", "Docker", "SQL", "Go"], 3),
+        "technical_responses": {"question_1": random_sentence(rng)},
+    } for n in range(size))
+    repository._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    repository.close()
+    os.replace(building, path)
+    return path
+
+
+def setup_save_candidate_data(size, tmp):
+    engine = load_engine(tmp)
+    shutil.copyfile(candidate_fixture(size), engine.candidate_db_file)
+    session = engine.new_session()
+
+    def op(i):
+        session.candidate_data = dict(engine.default_candidate, session_id=f"bench-session-{i}",
+                                      email=f"bench{i}@example.com", name="Bench Candidate",
+                                      tech_stack=["Python", "AWS"], technical_responses={"question_1": "An answer."})
+        engine.save(session)
+    return op
+
+
+# --- Grading cases -------------------------------------------------------------
+
+def load_grading(tmp, peers=0):
+    """Import gemini-ass.py with fitted stand-in models, the stub model and data under `tmp`.
+
+    With `peers`, assignment "bench" gets that many peer answers; their index
+    is cached between runs.
+    """
+    from common import SimulatedGenerator, fit_plagiarism_models, isolate_grading_data, load_grading_module
+
+    grading = load_grading_module()
+    isolate_grading_data(grading, tmp)
+    grading.model = StubModel()
+    grading.cached_model = SimulatedGenerator()
+    rng = random.Random(11)
+    training = [random_answer(rng, 20) for _ in range(300)]
+    grading.plagiarism_models.set(fit_plagiarism_models([grading.preprocess_text(text) for text in training]))
+    if peers:
+        from grading.peer_index import INDEX_VERSION
+
+        # Keyed by format and settings, so a stale fixture is never loaded
+        settings = hashlib.sha1(f"{INDEX_VERSION}:{grading.peer_index_fingerprint()}".encode()).hexdigest()[:12]
+        cached = os.path.join(CACHE_DIR, f"peer-index-{peers}-{settings}.npz")
+        target = grading.peer_index_store.path_for("bench")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(cached):
+            shutil.copyfile(cached, target)
+        else:
+            rng = random.Random(peers)
+            grading.add_many_to_peer_index("bench", [(f"peer_{n}", random_answer(rng, 20)) for n in range(peers)])
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            shutil.copyfile(target, cached)
+    return grading
+
+
+def unseen_answers(count, seed):
+    rng = random.Random(seed)
+    return [random_answer(rng, 20) for _ in range(count)]
+
+
+def setup_preprocess_text(size, tmp):
+    grading = load_grading(tmp)
+    rng = random.Random(3)
+    words = WORDS + [f"{word}{n}" for word in WORDS for n in range(40)]
+    sentences = [random_sentence(rng, rng.randint(8, 16), words) for _ in range(200000)]
+    return lambda i: grading.preprocess_text(sentences[i % len(sentences)])
+
+
+def setup_detect_plagiarism(size, tmp):
+    grading = load_grading(tmp, size)
+    answers = unseen_answers(2000, 17)
+    return lambda i: grading.detect_plagiarism_with_peers(answers[i % len(answers)], "bench", "student")
+
+
+def setup_check_assignment(size, tmp):
+    grading = load_grading(tmp, size)
+    answers = unseen_answers(2000, 23)
+
+    def op(i):
+        result = grading.check_assignment("bench", "Discuss the results.", answers[i % len(answers)],
+                                          student_id=f"student_{i}", total_marks=10)
+        assert result["score_data"] is not None, result["feedback"]
+    return op
+
+
+CASES = {
+    "chat.parse_tech_stack": (setup_parse_tech_stack, None),
+    "chat.conversation": (setup_conversation, None),
+    "chat.save_candidate_data": (setup_save_candidate_data, "candidates"),
+    "grading.preprocess_text": (setup_preprocess_text, None),
+    "grading.detect_plagiarism": (setup_detect_plagiarism, "peers"),
+    "grading.check_assignment": (setup_check_assignment, "peers"),
+}
+
+
+# --- Measurement ---------------------------------------------------------------
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def measure(op):
+    """Time op(i) for at least MIN_TIME seconds, then measure peak memory over MEMORY_OPS calls"""
+    for i in range(WARMUP_OPS):
+        op(i)
+    durations = []
+    i = WARMUP_OPS
+    start = time.perf_counter()
+    while len(durations) < MIN_OPS or time.perf_counter() - start < MIN_TIME:
+        op_start = time.perf_counter()
+        op(i)
+        durations.append(time.perf_counter() - op_start)
+        i += 1
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for n in range(MEMORY_OPS):
+        op(i + n)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    durations.sort()
+    return {
+        "ops": len(durations),
+        "ops_per_sec": round(len(durations) / elapsed, 1),
+        "p50_ms": round(percentile(durations, 0.5) * 1000, 4),
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 4),
+        "peak_kib": round(max(0, peak) / 1024, 1),
+    }
+
+
+def run_worker(name, size):
+    """Child process: set up and measure one case, print its result as JSON"""
+    setup, _ = CASES[name]
+    tmp = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        random.seed(0)
+        op = setup(size, tmp)
+        result = measure(op)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(json.dumps(result))
+
+
+def run_case(name, size):
+    """Run one case in a fresh interpreter; returns its result dict"""
+    command = [sys.executable, os.path.abspath(__file__), "--worker", name]
+    if size is not None:
+        command.append(str(size))
+    env = dict(os.environ, GRADING_OFFLINE="1", PYTHONHASHSEED="0", JOB_WORKERS="0")
+    completed = subprocess.run(command, cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def case_ids(profile, only=None):
+    """(result key, case name, size) for every case in the profile"""
+    ids = []
+    for name, (_, sized_by) in CASES.items():
+        for size in (PROFILES[profile][sized_by] if sized_by else [None]):
+            key = name if size is None else f"{name}@{size}"
+            if only is None or only in key:
+                ids.append((key, name, size))
+    return ids
+
+
+def machine():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def compare(result, base, threshold):
+    """Change notes and whether the result regressed against the baseline entry"""
+    notes = []
+    regressed = False
+    for field, label in (("p50_ms", "p50"), ("peak_kib", "mem")):
+        before, after = base[field], result[field]
+        change = (after - before) / before if before else 0.0
+        worse = change > threshold and after - before >= NOISE_FLOOR[field]
+        regressed = regressed or worse
+        notes.append(f"{label} {change:+.0%}{' REGRESSION' if worse else ''}")
+    return ", ".join(notes), regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--only", help="Run only cases whose name contains this")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative growth of p50 and memory")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--worker", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        name, size = args.worker[0], int(args.worker[1]) if len(args.worker) > 1 else None
+        run_worker(name, size)
+        return
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{args.profile}.json")
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            stored = json.load(f)
+        baseline = stored["results"]
+        if stored.get("machine") != machine():
+            print(f"Note: baseline was recorded on {stored.get('machine')}; timings may not be comparable.")
+
+    print(f"{'case':<40} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'peak KiB':>10}  vs baseline")
+    results = {}
+    regressions = []
+    for key, name, size in case_ids(args.profile, args.only):
+        result = run_case(name, size)
+        results[key] = result
+        note = "new"
+        if key in baseline:
+            note, regressed = compare(result, baseline[key], args.threshold)
+            if regressed:
+                regressions.append(key)
+        print(f"{key:<40} {result['ops_per_sec']:>10.1f} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+              f"{result['peak_kib']:>10.0f}  {note}", flush=True)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        if args.only:
+            results = dict(baseline, **results)
+        with open(baseline_path, "w") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {os.path.relpath(baseline_path, ROOT_DIR)}")
+    elif regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
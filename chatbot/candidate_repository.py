@@ -0,0 +1,288 @@
+"""Indexed SQLite repository for candidate records.
+
+Records have the shape of ``config.DEFAULT_CANDIDATE``. Saving a candidate
+upserts on email or session_id, so repeated saves from the same person update
+one row instead of piling up duplicates. A save whose email matches one row
+and whose session_id matches another merges the two when the session's row
+has no email (it was saved before the email was known); if that row has a
+different email, the save is rejected with ``CandidateConflict``.
+"""
+
+import argparse
+import json
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidates (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT UNIQUE,
+    email TEXT UNIQUE,
+    name TEXT NOT NULL DEFAULT '',
+    phone TEXT NOT NULL DEFAULT '',
+    experience TEXT NOT NULL DEFAULT '',
+    position TEXT NOT NULL DEFAULT '',
+    location TEXT NOT NULL DEFAULT '',
+    technical_responses TEXT NOT NULL DEFAULT '{}',
+    timestamp TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_candidates_position ON candidates (position COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_candidates_location ON candidates (location COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS candidate_tech (
+    candidate_id INTEGER NOT NULL REFERENCES candidates (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tech TEXT NOT NULL COLLATE NOCASE,
+    PRIMARY KEY (candidate_id, tech)
+);
+CREATE INDEX IF NOT EXISTS idx_candidate_tech_tech ON candidate_tech (tech, candidate_id);
+"""
+
+CANDIDATE_COLUMNS = ("id", "session_id", "email", "name", "phone", "experience",
+                     "position", "location", "technical_responses", "timestamp")
+
+
+class CandidateConflict(ValueError):
+    """A save whose session already belongs to a candidate with a different email"""
+
+
+def normalize_email(email):
+    """Normalize an email address for deduplication"""
+    email = (email or "").strip().lower()
+    return email or None
+
+
+class CandidateRepository:
+    """Candidate records stored in SQLite with secondary indexes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # One connection shared by all Streamlit sessions; access is serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def upsert(self, candidate):
+        """Insert or update a candidate, matching on email then session_id.
+
+        Returns the candidate's row id. Raises CandidateConflict (and changes
+        nothing) if the session_id belongs to a candidate with another email.
+        """
+        email = normalize_email(candidate.get("email"))
+        session_id = candidate.get("session_id") or None
+        values = {
+            "session_id": session_id,
+            "email": email,
+            "name": candidate.get("name", ""),
+            "phone": candidate.get("phone", ""),
+            "experience": candidate.get("experience", ""),
+            "position": candidate.get("position", ""),
+            "location": candidate.get("location", ""),
+            "technical_responses": json.dumps(candidate.get("technical_responses") or {}),
+            "timestamp": candidate.get("timestamp", ""),
+        }
+
+        with self._lock, self._conn:
+            row = None
+            if email:
+                row = self._conn.execute(
+                    "SELECT id, session_id FROM candidates WHERE email = ?", (email,)).fetchone()
+            if row is None and session_id:
+                row = self._conn.execute(
+                    "SELECT id, session_id FROM candidates WHERE session_id = ?", (session_id,)).fetchone()
+
+            if row is None:
+                columns = ", ".join(values)
+                placeholders = ", ".join("?" for _ in values)
+                cursor = self._conn.execute(
+                    f"INSERT INTO candidates ({columns}) VALUES ({placeholders})", tuple(values.values()))
+                candidate_id = cursor.lastrowid
+            else:
+                candidate_id = row["id"]
+                if session_id and row["session_id"] != session_id:
+                    # The email matched; another row may already own this session_id
+                    other = self._conn.execute(
+                        "SELECT id, email FROM candidates WHERE session_id = ? AND id != ?",
+                        (session_id, candidate_id)).fetchone()
+                    if other is not None:
+                        if other["email"]:
+                            raise CandidateConflict(
+                                f"Session {session_id} is already saved for {other['email']}, not {email}")
+                        # Saved earlier in this session without an email: merge it into this candidate
+                        self._conn.execute("DELETE FROM candidates WHERE id = ?", (other["id"],))
+                assignments = ", ".join(f"{column} = ?" for column in values)
+                self._conn.execute(
+                    f"UPDATE candidates SET {assignments} WHERE id = ?", (*values.values(), candidate_id))
+
+            self._conn.execute("DELETE FROM candidate_tech WHERE candidate_id = ?", (candidate_id,))
+            seen = set()
+            tech_rows = []
+            for tech in candidate.get("tech_stack") or []:
+                if tech.lower() not in seen:
+                    seen.add(tech.lower())
+                    tech_rows.append((candidate_id, len(tech_rows), tech))
+            self._conn.executemany(
+                "INSERT INTO candidate_tech (candidate_id, position, tech) VALUES (?, ?, ?)", tech_rows)
+            return candidate_id
+
+    def _load(self, rows):
+        """Build candidate dicts from candidate rows"""
+        rows = list(rows)
+        if not rows:
+            return []
+        ids = [row["id"] for row in rows]
+        placeholders = ", ".join("?" for _ in ids)
+        tech_by_id = {candidate_id: [] for candidate_id in ids}
+        for tech_row in self._conn.execute(
+                f"SELECT candidate_id, tech FROM candidate_tech WHERE candidate_id IN ({placeholders}) "
+                f"ORDER BY candidate_id, position", ids):
+            tech_by_id[tech_row["candidate_id"]].append(tech_row["tech"])
+
+        candidates = []
+        for row in rows:
+            candidates.append({
+                "name": row["name"],
+                "email": row["email"] or "",
+                "phone": row["phone"],
+                "experience": row["experience"],
+                "position": row["position"],
+                "location": row["location"],
+                "tech_stack": tech_by_id[row["id"]],
+                "technical_responses": json.loads(row["technical_responses"]),
+                "timestamp": row["timestamp"],
+                "session_id": row["session_id"] or "",
+            })
+        return candidates
+
+    def get_by_email(self, email):
+        """Return the candidate with this email, or None"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM candidates WHERE email = ?", (normalize_email(email),))
+            found = self._load(rows)
+        return found[0] if found else None
+
+    def get_by_session(self, session_id):
+        """Return the candidate saved from this session, or None"""
+        with self._lock:
+            found = self._load(self._conn.execute(
+                "SELECT * FROM candidates WHERE session_id = ?", (session_id,)))
+        return found[0] if found else None
+
+    def find(self, tech=None, position=None, location=None, limit=None):
+        """Find candidates having all of `tech` and matching position/location.
+
+        Every filter is answered from an index: the tech filter seeks
+        idx_candidate_tech_tech once per technology, and position/location use
+        their own case-insensitive indexes.
+        """
+        conditions = []
+        params = []
+        tech = [t for t in (tech or []) if t]
+        if tech:
+            placeholders = ", ".join("?" for _ in tech)
+            conditions.append(
+                f"id IN (SELECT candidate_id FROM candidate_tech WHERE tech IN ({placeholders}) "
+                f"GROUP BY candidate_id HAVING COUNT(*) = ?)")
+            params.extend(tech)
+            params.append(len({t.lower() for t in tech}))
+        if position:
+            conditions.append("position = ? COLLATE NOCASE")
+            params.append(position)
+        if location:
+            conditions.append("location = ? COLLATE NOCASE")
+            params.append(location)
+
+        query = "SELECT * FROM candidates"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._lock:
+            return self._load(self._conn.execute(query, params))
+
+    def count(self):
+        """Return the number of stored candidates"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+
+    def import_records(self, records):
+        """Upsert an iterable of candidate records; returns how many were read.
+
+        Records rejected with CandidateConflict are reported and skipped.
+        """
+        imported = 0
+        for record in records:
+            try:
+                self.upsert(record)
+            except CandidateConflict as e:
+                print(f"Skipping record: {str(e)}")
+            imported += 1
+        return imported
+
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+
+def get_repository(path):
+    """Return the shared repository for `path` (survives Streamlit reruns)"""
+    with _repositories_lock:
+        repository = _repositories.get(path)
+        if repository is None:
+            repository = CandidateRepository(path)
+            _repositories[path] = repository
+        return repository
+
+
+def main():
+    """Command line entry point for the candidate repository"""
+    from config import CANDIDATE_DB_FILE, CANDIDATE_LOG_FILE, DATA_FILE
+    from chatbot.candidate_store import CandidateStore
+
+    parser = argparse.ArgumentParser(description="Query and maintain the candidate database")
+    # Every command takes --db after its name (python -m chatbot.candidate_repository find --db x.db)
+    database = argparse.ArgumentParser(add_help=False)
+    database.add_argument("--db", default=CANDIDATE_DB_FILE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", parents=[database],
+                                          help="Upsert records from the JSON file and JSONL log")
+    import_parser.add_argument("--json", default=DATA_FILE)
+    import_parser.add_argument("--log", default=CANDIDATE_LOG_FILE)
+    find_parser = subparsers.add_parser("find", parents=[database],
+                                        help="Find candidates by tech, position and location")
+    find_parser.add_argument("--tech", nargs="*", default=[])
+    find_parser.add_argument("--position")
+    find_parser.add_argument("--location")
+    find_parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+
+    repository = CandidateRepository(args.db)
+    if args.command == "import":
+        imported = 0
+        try:
+            with open(args.json, "r", encoding="utf-8") as f:
+                imported += repository.import_records(json.load(f))
+        except FileNotFoundError:
+            pass
+        imported += repository.import_records(CandidateStore(args.log).iter_records())
+        print(f"Imported {imported} records; {repository.count()} unique candidates in {args.db}")
+    else:
+        for candidate in repository.find(args.tech, args.position, args.location, args.limit):
+            print(json.dumps(candidate))
+    repository.close()
+
+
+if __name__ == "__main__":
+    main()
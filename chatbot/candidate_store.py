@@ -0,0 +1,210 @@
+"""Append-only, line-delimited candidate store.
+
+Each save appends one JSON line, so its cost does not depend on how many
+candidates are already stored, and concurrent sessions never overwrite each
+other's records. Appends and ``compact`` hold an exclusive lock on
+``<log>.lock``, so compaction (which replaces the log with a new file) can
+run from another process, such as the command line, while the app is
+serving: a writer that finds the log replaced reopens it before appending.
+An appended record reaches the disk after ``fsync_batch`` appends or within
+``fsync_interval`` seconds, whichever comes first.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+from file_locks import locked
+
+DEFAULT_FSYNC_BATCH = 20
+DEFAULT_FSYNC_INTERVAL = 1.0
+
+
+class CandidateStore:
+    """Append-only JSONL log of candidate records"""
+
+    def __init__(self, path, fsync_batch=DEFAULT_FSYNC_BATCH, fsync_interval=DEFAULT_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_batch = max(1, fsync_batch)
+        self.fsync_interval = fsync_interval
+        self.lock_path = f"{path}.lock"
+        self._lock = threading.Lock()
+        self._fd = None
+        self._lock_file = None  # Kept open so an append does not reopen it
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._timer = None  # Syncs pending appends once fsync_interval has passed
+
+    def _open(self):
+        """Open the log for appending, creating it if needed (caller holds both locks).
+
+        A descriptor left on a log that compaction has since replaced is closed
+        and the new log opened; what it wrote is already in the replacement.
+        """
+        if self._fd is not None:
+            try:
+                current = os.stat(self.path)
+            except FileNotFoundError:
+                current = None
+            opened = os.fstat(self._fd)
+            if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+                os.close(self._fd)
+                self._fd = None
+                self._pending = 0
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _file_lock(self):
+        """Lock shared with other processes writing or compacting the log (caller holds the lock)"""
+        if self._lock_file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._lock_file = open(self.lock_path, "a+b")
+        return locked(self._lock_file)
+
+    def append(self, record):
+        """Append one record to the log"""
+        line = (json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock, self._file_lock():
+            fd = self._open()
+            os.write(fd, line)
+            self._pending += 1
+            # Batch fsyncs: one per `fsync_batch` appends, or by the timer `fsync_interval` seconds
+            # after the first unsynced append if no more appends come
+            if self._pending >= self.fsync_batch or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.fsync_interval, self._sync_due)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _sync_due(self):
+        with self._lock:
+            self._timer = None
+            self._sync()
+
+    def _sync(self):
+        """Flush pending appends to disk (caller holds the lock)"""
+        if self._fd is not None and self._pending:
+            os.fsync(self._fd)
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def flush(self):
+        """Force any pending appends to disk"""
+        with self._lock:
+            self._sync()
+
+    def close(self):
+        """Flush and close the log"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._sync()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def iter_records(self):
+        """Lazily yield records from the log, one line at a time"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn trailing line from a crash mid-append; skip it
+                    print(f"Skipping unreadable line in {self.path}")
+
+    def compact(self):
+        """Rewrite the log keeping only the latest record per session_id.
+
+        Returns the number of records kept. Appends from every process are
+        blocked while compacting, and writers reopen the new log afterwards.
+        """
+        with self._lock, self._file_lock():
+            self._sync()
+            latest = {}
+            for position, record in enumerate(self.iter_records()):
+                key = record.get("session_id") or f"__record_{position}"
+                latest.pop(key, None)
+                latest[key] = record
+
+            tmp_path = f"{self.path}.compact"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in latest.values():
+                    f.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            os.replace(tmp_path, self.path)
+            return len(latest)
+
+    def import_json(self, json_path):
+        """Append records from a legacy whole-file JSON array"""
+        with open(json_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        for record in records:
+            self.append(record)
+        self.flush()
+        return len(records)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path, fsync_batch=DEFAULT_FSYNC_BATCH, fsync_interval=DEFAULT_FSYNC_INTERVAL):
+    """Return the shared store for `path`.
+
+    Streamlit re-executes the app script on every rerun, so the store is kept
+    here (in an imported module) to share one descriptor and lock across all
+    sessions of the process.
+    """
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = CandidateStore(path, fsync_batch, fsync_interval)
+            _stores[path] = store
+        return store
+
+
+def main():
+    """Command line entry point for store maintenance"""
+    from config import CANDIDATE_LOG_FILE, DATA_FILE
+
+    parser = argparse.ArgumentParser(description="Maintain the candidate log")
+    parser.add_argument("command", choices=["compact", "import", "count"])
+    parser.add_argument("--log", default=CANDIDATE_LOG_FILE, help="Path to the JSONL log")
+    parser.add_argument("--source", default=DATA_FILE, help="Legacy JSON file for 'import'")
+    args = parser.parse_args()
+
+    store = CandidateStore(args.log)
+    if args.command == "compact":
+        kept = store.compact()
+        print(f"Compacted {args.log}: {kept} records kept")
+    elif args.command == "import":
+        imported = store.import_json(args.source)
+        print(f"Imported {imported} records from {args.source} into {args.log}")
+    else:
+        print(sum(1 for _ in store.iter_records()))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,578 @@
+"""UI-independent screening conversation engine.
+
+A ``Session`` holds one candidate's conversation: the state from
+``config.CONVERSATION_STATES``, the candidate data and the chat history.
+``ConversationEngine.handle`` runs one turn of the state machine on a session
+and returns the assistant's reply. Replies generated by the model can be
+streamed to a ``listener`` with ``update(text)`` (the reply so far),
+``finish(text)`` and ``clear()`` methods; the Streamlit app renders them into
+a placeholder and the HTTP/WebSocket server (``chatbot.server``) forwards
+them to its clients.
+
+Turns on one session are serialized by its lock; different sessions run
+concurrently.
+"""
+
+import copy
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from chatbot.candidate_repository import get_repository
+from chatbot.candidate_store import get_store
+from chatbot.history import ChatHistory, history_path
+from chatbot.intents import EXIT, NEGATIVE, POSITIVE, classify_intent
+from chatbot.question_bank import experience_level, get_question_bank
+from chatbot.tech_matcher import get_tech_matcher
+from llm.scheduler import BACKGROUND, call_priority
+
+GREETING_PROMPT = """
+    You are TalentScout's Hiring Assistant. Greet the candidate professionally and briefly explain that you'll be conducting an initial screening by gathering their information and asking technical questions based on their skills. Ask for their consent to proceed. Keep it friendly and concise.
+    """
+
+FALLBACK_GREETING = "Hello! I'm TalentScout's Hiring Assistant. I'm here to conduct an initial screening by gathering your information and asking some technical questions based on your skills. Are you ready to proceed?"
+
+TECH_STACK_PROMPT = """Now I'd like to learn about your technical skills. Please list the specific technologies you work with, including:
+
+• **Programming languages** you're proficient in (e.g., Python, JavaScript, Java)
+• **Frameworks and libraries** you've used (e.g., React, Django, Spring Boot)  
+• **Databases** you've worked with (e.g., MySQL, MongoDB, PostgreSQL)
+• **Cloud platforms** you have experience with (e.g., AWS, Azure, Google Cloud)
+• **Development tools** you're familiar with (e.g., Git, Docker, Jenkins)
+
+**Example response:** "I work with Python, React, PostgreSQL, and AWS"
+
+Please mention only technologies you feel confident discussing in a technical interview."""
+
+
+class Session:
+    """One candidate's screening conversation"""
+
+    def __init__(self, states, default_candidate, session_id=None, history_dir=None, history_in_memory=None):
+        self.states = states
+        self.default_candidate = default_candidate
+        self.id = session_id or str(uuid.uuid4())
+        self.history_path = history_path(history_dir, self.id) if history_dir else None
+        self.history_in_memory = history_in_memory
+        self.lock = threading.Lock()
+        self.chat_history = None
+        self.reset()
+
+    def reset(self):
+        """Start over as a new candidate (the session id stays the same)"""
+        self.conversation_state = self.states["GREETING"]
+        self.candidate_data = copy.deepcopy(self.default_candidate)
+        self.candidate_data['session_id'] = str(uuid.uuid4())
+        self.candidate_data['timestamp'] = datetime.now().isoformat()
+        if self.chat_history is not None:
+            self.chat_history.clear()
+        self.chat_history = ChatHistory(self.history_path, self.history_in_memory)
+        self.current_tech_stack = []
+        self.current_question_index = 0
+        self.generated_questions = []
+        self.pending_questions = {}  # Question index -> Future of a question still being generated
+        self.last_active = time.time()
+        self.measure()
+
+    def finished_questions(self):
+        """generated_questions with the background questions that have finished so far filled in"""
+        questions = list(self.generated_questions)
+        for i, future in list(self.pending_questions.items()):
+            if future.done():
+                questions[i] = future.result()
+        return questions
+
+    def snapshot(self):
+        """Everything needed to resume the session; spilled history stays in its file"""
+        return {
+            "id": self.id,
+            "conversation_state": self.conversation_state,
+            "candidate_data": self.candidate_data,
+            "chat_history": self.chat_history.recent(),
+            "current_tech_stack": self.current_tech_stack,
+            "current_question_index": self.current_question_index,
+            "generated_questions": self.finished_questions(),  # Unfinished ones are generated live later
+            "last_active": self.last_active,
+        }
+
+    def measure(self, snapshot=None):
+        """Record in `encoded_size` how large `snapshot` (default: a fresh one) is as compact JSON.
+
+        Called after every turn while the session's lock is held, so metrics can
+        read the size without serializing the session again.
+        """
+        if snapshot is None:
+            snapshot = self.snapshot()
+        self.encoded_size = len(json.dumps(snapshot, separators=(",", ":")))
+
+    @classmethod
+    def restore(cls, states, default_candidate, snapshot, history_dir=None, history_in_memory=None):
+        """Rebuild a session from `snapshot()`"""
+        session = cls(states, default_candidate, snapshot["id"], history_dir, history_in_memory)
+        session.conversation_state = snapshot["conversation_state"]
+        session.candidate_data = snapshot["candidate_data"]
+        session.chat_history = ChatHistory.resume(session.history_path, history_in_memory, snapshot["chat_history"])
+        session.current_tech_stack = snapshot["current_tech_stack"]
+        session.current_question_index = snapshot["current_question_index"]
+        session.generated_questions = snapshot["generated_questions"]
+        session.last_active = snapshot["last_active"]
+        session.measure(snapshot)
+        return session
+
+    def to_dict(self):
+        """Public view of the session, with the part of the history held in memory"""
+        return {
+            "session_id": self.id,
+            "state": self.conversation_state,
+            "candidate": self.candidate_data,
+            "history": self.chat_history.recent(),
+            "history_length": len(self.chat_history),
+        }
+
+
+class ConversationEngine:
+    """The screening state machine, driven one candidate message at a time"""
+
+    def __init__(self, model, states, default_candidate, generation_config, max_questions=3,
+                 question_bank_file=None, question_cache_variants=1, candidate_log_file=None,
+                 candidate_db_file=None, fsync_batch=20, fsync_interval=1.0, stream_responses=True,
+                 history_dir=None, history_in_memory=None, question_workers=8):
+        self.model = model
+        self.states = states
+        self.default_candidate = default_candidate
+        self.generation_config = generation_config
+        self.max_questions = max_questions
+        self.question_bank_file = question_bank_file
+        self.question_cache_variants = question_cache_variants
+        self.candidate_log_file = candidate_log_file
+        self.candidate_db_file = candidate_db_file
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.stream_responses = stream_responses
+        self.history_dir = history_dir
+        self.history_in_memory = history_in_memory
+        # Generates the later technical questions of every session in the background
+        self.question_executor = ThreadPoolExecutor(max_workers=question_workers, thread_name_prefix="questions")
+
+    def new_session(self, session_id=None):
+        return Session(self.states, self.default_candidate, session_id, self.history_dir, self.history_in_memory)
+
+    def restore_session(self, snapshot):
+        return Session.restore(self.states, self.default_candidate, snapshot, self.history_dir, self.history_in_memory)
+
+    def start(self, session, listener=None):
+        """Greet a new session; returns the greeting (None if the chat already started)"""
+        with session.lock:
+            if len(session.chat_history) or session.conversation_state != self.states["GREETING"]:
+                return None
+            greeting = self.greeting(listener)
+            session.chat_history.append({"role": "assistant", "content": greeting})
+            session.last_active = time.time()
+            session.measure()
+            return greeting
+
+    def handle(self, session, user_input, listener=None):
+        """Run one turn for a candidate message; returns the assistant's reply"""
+        with session.lock:
+            session.last_active = time.time()
+            bot_response = self._handle(session, user_input, listener)
+            session.chat_history.append({"role": "assistant", "content": bot_response})
+            session.measure()
+            return bot_response
+
+    def _handle(self, session, user_input, listener):
+        states = self.states
+        # Add user message to chat history
+        session.chat_history.append({"role": "user", "content": user_input})
+
+        # Classify consent, refusal or exit once for the whole turn; answers to a question
+        # (every state but the greeting and the end) only exit when they are a bare exit phrase
+        answering = session.conversation_state not in (states["GREETING"], states["ENDED"])
+        intent = classify_intent(user_input, answering)
+
+        if intent == EXIT:
+            session.conversation_state = states["ENDED"]
+            return self.conclusion(session)
+
+        # Handle based on current state
+        current_state = session.conversation_state
+
+        if current_state == states["GREETING"]:
+            # Check for consent with improved logic
+            if intent == POSITIVE:
+                bot_response = "Excellent! Let's start with your basic information. Could you please tell me your full name?"
+                session.conversation_state = states["COLLECT_NAME"]
+            elif intent == NEGATIVE:
+                bot_response = "I understand. If you change your mind and would like to proceed with the screening, just let me know!"
+                session.conversation_state = states["ENDED"]
+            else:
+                # If unclear, ask for clarification
+                bot_response = "I'd like to confirm - are you ready to proceed with the screening process? Please respond with 'yes' to continue or 'no' if you'd prefer not to proceed at this time."
+
+        elif current_state == states["COLLECT_NAME"]:
+            # Check if user is just saying yes/no instead of providing name
+            if intent == POSITIVE and len(user_input.split()) < 2:
+                bot_response = "I need your actual full name, not just confirmation. Please provide your first and last name (for example: John Smith)."
+            elif len(user_input.split()) >= 2 and not user_input.lower() in ['yes', 'no', 'ok', 'okay']:
+                session.candidate_data['name'] = user_input
+                first_name = user_input.split()[0]
+                bot_response = f"Thank you, {first_name}! Now, could you please provide your email address?"
+                session.conversation_state = states["COLLECT_EMAIL"]
+            else:
+                bot_response = "Could you please provide your full name with both first and last name? (Example: Jane Doe)"
+
+        elif current_state == states["COLLECT_EMAIL"]:
+            if intent == POSITIVE and '@' not in user_input:
+                bot_response = "I need your actual email address, not just confirmation. Please provide your email (for example: john@email.com)."
+            elif '@' in user_input and '.' in user_input and len(user_input) > 5:
+                session.candidate_data['email'] = user_input
+                bot_response = "Great! What's your phone number?"
+                session.conversation_state = states["COLLECT_PHONE"]
+            else:
+                bot_response = "Please provide a valid email address (for example: john@example.com)"
+
+        elif current_state == states["COLLECT_PHONE"]:
+            if intent == POSITIVE and not any(char.isdigit() for char in user_input):
+                bot_response = "I need your actual phone number, not just confirmation. Please provide your phone number (for example: +1-555-123-4567)."
+            elif any(char.isdigit() for char in user_input) and len(user_input.replace(' ', '').replace('-', '').replace('(', '').replace(')', '').replace('+', '')) >= 10:
+                session.candidate_data['phone'] = user_input
+                bot_response = "Perfect! How many years of professional experience do you have in technology?"
+                session.conversation_state = states["COLLECT_EXPERIENCE"]
+            else:
+                bot_response = "Please provide a valid phone number with at least 10 digits."
+
+        elif current_state == states["COLLECT_EXPERIENCE"]:
+            if intent == POSITIVE and not any(char.isdigit() for char in user_input) and 'entry' not in user_input.lower():
+                bot_response = "I need the actual number of years of experience, not just confirmation. Please tell me how many years (for example: '3 years' or 'entry level')."
+            elif any(char.isdigit() for char in user_input) or 'entry' in user_input.lower() or 'fresh' in user_input.lower() or 'beginner' in user_input.lower():
+                session.candidate_data['experience'] = user_input
+                bot_response = "Excellent! What position or role are you interested in applying for?"
+                session.conversation_state = states["COLLECT_POSITION"]
+            else:
+                bot_response = "Please specify the number of years of experience (for example: '3 years', '5', or 'entry level')"
+
+        elif current_state == states["COLLECT_POSITION"]:
+            if intent == POSITIVE and len(user_input.split()) < 2:
+                bot_response = "I need to know the specific position you're interested in, not just confirmation. Please tell me the role (for example: 'Software Developer' or 'Data Scientist')."
+            else:
+                session.candidate_data['position'] = user_input
+                bot_response = "Thank you! What's your current location or preferred work location?"
+                session.conversation_state = states["COLLECT_LOCATION"]
+
+        elif current_state == states["COLLECT_LOCATION"]:
+            if intent == POSITIVE and len(user_input.split()) < 2:
+                bot_response = "I need to know your actual location, not just confirmation. Please tell me your city/state or preferred work location."
+            else:
+                session.candidate_data['location'] = user_input
+                bot_response = TECH_STACK_PROMPT
+                session.conversation_state = states["COLLECT_TECH_STACK"]
+
+        elif current_state == states["COLLECT_TECH_STACK"]:
+            if intent == POSITIVE and len(user_input.split()) < 3:
+                bot_response = """I need to know your actual technical skills, not just confirmation. Please list specific technologies you work with. For example:
+
+**"I work with Python, React, MySQL, and AWS"**
+
+Or be more detailed:
+- Programming languages: Python, JavaScript
+- Frameworks: React, Django  
+- Databases: MySQL, MongoDB
+- Cloud: AWS, Docker"""
+            else:
+                # Parse the tech stack properly
+                tech_stack = parse_tech_stack(user_input)
+                if tech_stack and len(tech_stack) > 0:
+                    session.candidate_data['tech_stack'] = tech_stack
+                    session.current_tech_stack = tech_stack
+                    bot_response = self.technical_questions(session, tech_stack, listener)
+                    session.conversation_state = states["TECHNICAL_QUESTIONS"]
+                else:
+                    bot_response = """I didn't catch specific technologies from your response. Could you please list specific technologies you work with? For example:
+
+**"I work with Python, React, MySQL, and AWS"**
+
+Or list them by category:
+- Programming languages: Python, JavaScript, Java, etc.
+- Frameworks: React, Django, Spring, etc.  
+- Databases: MySQL, MongoDB, PostgreSQL, etc.
+- Cloud platforms: AWS, Azure, Google Cloud, etc."""
+
+        elif current_state == states["TECHNICAL_QUESTIONS"]:
+            # Store the answer, then serve the next question
+            question_key = f"question_{session.current_question_index + 1}"
+            session.candidate_data['technical_responses'][question_key] = user_input
+            bot_response = self.next_technical_question(session, listener)
+
+        elif current_state == states["ENDED"]:
+            # If conversation has ended but user wants to restart
+            if intent == POSITIVE:
+                session.reset()
+                bot_response = self.greeting(listener)
+                session.conversation_state = states["COLLECT_NAME"]
+            else:
+                bot_response = "Our conversation has ended. If you'd like to start a new screening, please use the Reset Conversation button or say 'yes' to restart."
+
+        else:
+            bot_response = "I'm not sure how to help with that. Could you please provide the information I asked for?"
+
+        return bot_response
+
+    def generate_response(self, prompt, listener=None, prefix="", cache=False, variants=1):
+        """Generate assistant text, streaming it to `listener` (prefixed by `prefix`) as it arrives.
+
+        Returns the full generated text (without the prefix).
+        """
+        if listener is None or not self.stream_responses:
+            response = self.model.generate_content(prompt, generation_config=self.generation_config,
+                                                   cache=cache, variants=variants)
+            return response.text
+
+        text = ""
+        try:
+            for chunk in self.model.generate_content(prompt, generation_config=self.generation_config, stream=True,
+                                                     cache=cache, variants=variants):
+                try:
+                    text += chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. only safety metadata)
+                    continue
+                listener.update(f"{prefix}{text}")
+        except Exception:
+            listener.clear()
+            raise
+        if not text:
+            listener.clear()
+            raise ValueError("Empty response from model")
+        listener.finish(f"{prefix}{text}")
+        return text
+
+    def greeting(self, listener=None):
+        """Generate the initial greeting"""
+        try:
+            # The greeting prompt is static, so every session can share one response
+            return self.generate_response(GREETING_PROMPT, listener, cache=True)
+        except Exception as e:
+            return FALLBACK_GREETING
+
+    def build_question_prompt(self, tech_stack, question_index):
+        """Build the generation prompt for one question of the technical round"""
+        if question_index == 0:
+            primary_tech = tech_stack[0]  # Focus on the first technology mentioned
+            tech_list = ', '.join(tech_stack[:3])  # Show up to 3 technologies
+            return f"""
+    You are a technical interviewer for TalentScout. A candidate has mentioned they work with: {tech_list}
+    
+    Generate a practical, screening-level technical question focused on {primary_tech}. The question should:
+    - Test real-world application knowledge
+    - Be appropriate for initial screening (not too basic, not too advanced)
+    - Be specific and clear
+    - Allow the candidate to demonstrate their experience
+    
+    Present just one question in a conversational, encouraging tone.
+    """
+
+        # Later questions cover a different technology if available
+        return f"""
+    Generate a different technical question about {question_tech(tech_stack, question_index)} for a candidate screening. 
+    This is question {question_index + 1} of {self.max_questions}.
+    Make it practical and different from previous questions. Keep it conversational.
+    """
+
+    def generate_question_text(self, prompt):
+        """Generate one question without streaming it; returns None on failure"""
+        try:
+            # Prefetched questions yield to chat turns that a candidate is waiting on
+            with call_priority(BACKGROUND):
+                response = self.model.generate_content(prompt, generation_config=self.generation_config,
+                                                       cache=True, variants=self.question_cache_variants)
+            return response.text
+        except Exception as e:
+            return None
+
+    def technical_questions(self, session, tech_stack, listener=None):
+        """Prepare the full set of technical questions based on tech stack.
+
+        Questions come from the offline question bank when it covers the
+        technology; the rest are generated in the background while the first
+        one streams and the candidate answers it (see next_technical_question).
+        """
+        if not tech_stack:
+            return "I notice you didn't mention specific technologies I recognize. Could you please clarify what programming languages or frameworks you work with?"
+
+        primary_tech = tech_stack[0]  # Focus on the first technology mentioned
+        tech_list = ', '.join(tech_stack[:3])  # Show up to 3 technologies
+        prompts = [self.build_question_prompt(tech_stack, i) for i in range(self.max_questions)]
+
+        # Draw from the precomputed pool first; no network wait for known technologies
+        bank = get_question_bank(self.question_bank_file)
+        level = experience_level(session.candidate_data.get('experience', ''))
+        questions = []
+        for i in range(self.max_questions):
+            questions.append(bank.draw(question_tech(tech_stack, i), level, exclude=questions))
+
+        intro = f"Great! I can see you have experience with {tech_list}. Let me ask you some technical questions to better understand your expertise.\n\n"
+        session.current_question_index = 0
+        # Only the first question is waited for; the later ones are collected when they are asked
+        session.pending_questions = {i: self.question_executor.submit(self.generate_question_text, prompts[i])
+                                     for i in range(1, self.max_questions) if questions[i] is None}
+        if questions[0] is None:
+            try:
+                questions[0] = self.generate_response(prompts[0], listener, prefix=intro, cache=True,
+                                                      variants=self.question_cache_variants)
+            except Exception as e:
+                questions[0] = None
+        session.generated_questions = questions
+
+        if questions[0] is None:
+            return f"Great! I see you work with {tech_list}. Let's start with a question about {primary_tech}: Can you describe a recent project where you used {primary_tech} and what challenges you faced?"
+        return f"{intro}{questions[0]}"
+
+    def next_technical_question(self, session, listener=None):
+        """Serve the next pre-generated technical question or conclude"""
+        session.current_question_index += 1
+        question_index = session.current_question_index
+
+        if question_index >= self.max_questions:
+            session.conversation_state = self.states["CONCLUSION"]
+            return self.conclusion(session)
+
+        intro = "Thank you for that answer. Here's my next question:\n\n"
+        questions = session.generated_questions
+        pending = session.pending_questions.pop(question_index, None)
+        if pending is not None:
+            questions[question_index] = pending.result()  # Usually finished while the candidate answered
+        if question_index < len(questions) and questions[question_index]:
+            return f"{intro}{questions[question_index]}"
+
+        # Not generated up front (e.g. the batch call failed); generate it live
+        prompt = self.build_question_prompt(session.current_tech_stack, question_index)
+        try:
+            return f"{intro}{self.generate_response(prompt, listener, prefix=intro, cache=True, variants=self.question_cache_variants)}"
+        except Exception as e:
+            return "Thank you for that answer. Can you tell me about a challenging technical problem you've solved recently and how you approached it?"
+
+    def conclusion(self, session):
+        """Generate conclusion message"""
+        name = session.candidate_data.get('name', 'there')
+        first_name = name.split()[0] if name else 'there'
+        return f"""Thank you {first_name} for taking the time to complete this initial screening! 
+
+I've gathered all the necessary information about your background and technical skills. Here's what happens next:
+
+✅ Our HR team will review your responses within 2-3 business days
+✅ If your profile matches our current opportunities, we'll contact you via email to schedule a detailed interview
+✅ Feel free to reach out to us at careers@talentscout.com if you have any questions
+
+We appreciate your interest in working with TalentScout. Have a great day!"""
+
+    def reset(self, session):
+        """Start the session over as a new candidate"""
+        with session.lock:
+            session.reset()
+            session.last_active = time.time()
+
+    def save(self, session):
+        """Upsert the candidate data into the repository, then append it to the candidate log.
+
+        A rejected upsert (CandidateConflict) raises before anything is logged.
+        """
+        with session.lock:
+            candidate = copy.deepcopy(session.candidate_data)
+        get_repository(self.candidate_db_file).upsert(candidate)
+        get_store(self.candidate_log_file, self.fsync_batch, self.fsync_interval).append(candidate)
+
+
+def parse_tech_stack(user_input):
+    """Parse and extract technologies from user input"""
+    # One pass over the input with the precompiled matcher (aliases, word boundaries)
+    mentioned_tech = get_tech_matcher().find_all(user_input)
+
+    # If no recognized technologies, try to extract from common patterns
+    if not mentioned_tech:
+        # Look for common technology patterns
+        words = user_input.replace(',', ' ').replace('.', ' ').split()
+        for word in words:
+            word_clean = word.strip().title()
+            if len(word_clean) > 2:  # Avoid very short words
+                mentioned_tech.append(word_clean)
+
+    return mentioned_tech[:5] if mentioned_tech else []  # Limit to 5 technologies
+
+
+def question_tech(tech_stack, question_index):
+    """Technology the question at `question_index` is about"""
+    if len(tech_stack) > question_index:
+        return tech_stack[question_index]
+    return tech_stack[0]  # Fallback to first technology
+
+
+def build_model():
+    """The model client from config: backend, rate-limited scheduler and response cache"""
+    from config import (GOOGLE_API_KEY, LLM_BACKEND, LLM_CACHE_DIR, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL,
+                        LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES, LLM_QUEUE_TIMEOUT, LLM_RECORD_FILE, LLM_REPLAY_FILE,
+                        LLM_REQUEST_TIMEOUT, LLM_RPM, LLM_SIM_ERROR_CODES, LLM_SIM_ERROR_RATE, LLM_SIM_LATENCY,
+                        LLM_SIM_TOKENS_PER_SECOND, LLM_TPM, MODEL_NAME)
+    from llm.backends import create_backend
+    from llm.cache import CachedModel, get_cache
+    from llm.scheduler import ScheduledModel, get_scheduler
+
+    # Google Gemini unless LLM_BACKEND says otherwise
+    backend = create_backend(
+        LLM_BACKEND,
+        MODEL_NAME,
+        api_key=GOOGLE_API_KEY,
+        record_file=LLM_RECORD_FILE,
+        replay_file=LLM_REPLAY_FILE,
+        latency=LLM_SIM_LATENCY,
+        tokens_per_second=LLM_SIM_TOKENS_PER_SECOND,
+        error_rate=LLM_SIM_ERROR_RATE,
+        error_codes=LLM_SIM_ERROR_CODES
+    )
+    scheduler = get_scheduler(
+        rpm=LLM_RPM,
+        tpm=LLM_TPM,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        max_retries=LLM_MAX_RETRIES,
+        queue_timeout=LLM_QUEUE_TIMEOUT
+    )
+    return CachedModel(
+        ScheduledModel(backend, scheduler, LLM_REQUEST_TIMEOUT),
+        MODEL_NAME,
+        get_cache(LLM_CACHE_DIR, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL)
+    )
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Return the engine configured from config (built once per process, survives Streamlit reruns)"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            from config import (CANDIDATE_DB_FILE, CANDIDATE_FSYNC_BATCH, CANDIDATE_FSYNC_INTERVAL,
+                                CANDIDATE_LOG_FILE, CHAT_HISTORY_DIR, CHAT_HISTORY_IN_MEMORY, CONVERSATION_STATES,
+                                DEFAULT_CANDIDATE, GENERATION_CONFIG, MAX_QUESTIONS_PER_TECH, QUESTION_BANK_FILE,
+                                QUESTION_CACHE_VARIANTS, STREAM_RESPONSES)
+
+            _engine = ConversationEngine(
+                build_model(),
+                CONVERSATION_STATES,
+                DEFAULT_CANDIDATE,
+                GENERATION_CONFIG,
+                max_questions=MAX_QUESTIONS_PER_TECH,
+                question_bank_file=QUESTION_BANK_FILE,
+                question_cache_variants=QUESTION_CACHE_VARIANTS,
+                candidate_log_file=CANDIDATE_LOG_FILE,
+                candidate_db_file=CANDIDATE_DB_FILE,
+                fsync_batch=CANDIDATE_FSYNC_BATCH,
+                fsync_interval=CANDIDATE_FSYNC_INTERVAL,
+                stream_responses=STREAM_RESPONSES,
+                history_dir=CHAT_HISTORY_DIR,
+                history_in_memory=CHAT_HISTORY_IN_MEMORY
+            )
+        return _engine
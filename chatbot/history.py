@@ -0,0 +1,115 @@
+"""Chat history with a bounded in-memory tail.
+
+Only the most recent ``max_in_memory`` messages stay in memory; older ones
+are appended to a JSON lines file, with their byte offsets kept so any
+range can be read back without scanning the file. Without a path nothing
+is spilled and every message stays in memory.
+"""
+
+import json
+import os
+import threading
+
+
+def history_path(directory, session_id):
+    """Spill file for a session's history under `directory`"""
+    return os.path.join(directory, f"{session_id}.jsonl")
+
+
+class ChatHistory:
+    """Append-only list of chat messages ({"role", "content"} dicts)"""
+
+    def __init__(self, path=None, max_in_memory=None):
+        self.path = path
+        self.max_in_memory = max_in_memory
+        self._lock = threading.Lock()
+        self._recent = []
+        self._offsets = []  # Byte offset of each spilled message in `path`
+
+    @classmethod
+    def resume(cls, path, max_in_memory, recent):
+        """Reattach to the spill file at `path` (if any) with `recent` as the in-memory tail"""
+        history = cls(path, max_in_memory)
+        if path and os.path.exists(path):
+            offset = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    history._offsets.append(offset)
+                    offset += len(line)
+        history._recent = list(recent)
+        return history
+
+    def __len__(self):
+        with self._lock:
+            return len(self._offsets) + len(self._recent)
+
+    def __iter__(self):
+        return iter(self.slice(0, len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return self.slice(start, stop)[::step]
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("chat history index out of range")
+        return self.slice(index, index + 1)[0]
+
+    def append(self, message):
+        with self._lock:
+            self._recent.append(message)
+            if self.path and self.max_in_memory and len(self._recent) > self.max_in_memory:
+                # Spill the older half at once so appends stay cheap on average
+                self._spill(len(self._recent) - self.max_in_memory // 2)
+
+    def _spill(self, count):
+        """Move the oldest `count` in-memory messages to the file (caller holds the lock)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            for message in self._recent[:count]:
+                line = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+                f.write(line)
+                self._offsets.append(offset)
+                offset += len(line)
+        del self._recent[:count]
+
+    def slice(self, start, stop):
+        """Messages [start, stop) in order, reading spilled ones back from the file"""
+        with self._lock:
+            spilled = len(self._offsets)
+            stop = min(stop, spilled + len(self._recent))
+            start = max(0, start)
+            if start >= stop:
+                return []
+            messages = []
+            if start < spilled:
+                with open(self.path, "rb") as f:
+                    f.seek(self._offsets[start])
+                    for _ in range(min(stop, spilled) - start):
+                        messages.append(json.loads(f.readline()))
+            if stop > spilled:
+                messages.extend(self._recent[max(0, start - spilled):stop - spilled])
+            return messages
+
+    def tail(self, count):
+        """The last `count` messages"""
+        length = len(self)
+        return self.slice(length - count, length)
+
+    def recent(self):
+        """The messages still held in memory"""
+        with self._lock:
+            return list(self._recent)
+
+    def clear(self):
+        """Forget every message and remove the spill file"""
+        with self._lock:
+            self._recent = []
+            self._offsets = []
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,98 @@
+"""Single-pass intent classifier for consent, refusal and exit messages.
+
+Every phrase is compiled once into one token-boundary regex, so a message is
+scanned once and "n" no longer matches inside "know" nor "end" inside
+"recommend". When a message mentions several intents, exit beats negative
+and negative beats positive. A message answering a question (a profile
+field or a technical question) only counts as an exit when it is a bare exit
+phrase, give or take filler words ("I'm done", "bye, thanks"), so answers
+such as "Back end engineer", "West End, London" or "stop the consumer and
+drain the queue" do not end the screening.
+"""
+
+import re
+import threading
+
+from chatbot.tech_matcher import trie_pattern
+
+POSITIVE = "positive"
+NEGATIVE = "negative"
+EXIT = "exit"
+NONE = "none"
+
+# Checked in this order when a message mentions several intents
+PRIORITY = [EXIT, NEGATIVE, POSITIVE]
+
+# Apostrophes belong to the word, so "n" does not match the end of "don't"
+LEFT_BOUNDARY = r"(?<![\w'])"
+RIGHT_BOUNDARY = r"(?![\w'])"
+
+_WORD = re.compile(r"[\w']+")
+
+
+def _normalize(text):
+    return " ".join(text.lower().replace("’", "'").split())
+
+
+class IntentClassifier:
+    """Maps a chat message to one of POSITIVE, NEGATIVE, EXIT or NONE"""
+
+    def __init__(self, positive, negative, exit_keywords, exit_max_words=None, exit_filler_words=()):
+        self.exit_max_words = exit_max_words
+        self.exit_filler_words = {_normalize(word) for word in exit_filler_words}
+        self._intents = {}
+        # A phrase may carry several intents ("stop" is both negative and exit)
+        for intent, phrases in ((POSITIVE, positive), (NEGATIVE, negative), (EXIT, exit_keywords)):
+            for phrase in phrases:
+                self._intents.setdefault(_normalize(phrase), set()).add(intent)
+        self._regex = re.compile(f"{LEFT_BOUNDARY}{trie_pattern(self._intents)}{RIGHT_BOUNDARY}")
+
+    def classify(self, text, answering=False):
+        """Intent of `text`: EXIT, NEGATIVE, POSITIVE or NONE.
+
+        `answering` marks a message that answers a question, which is an exit
+        only if nothing but filler words surrounds its exit phrases.
+        """
+        text = _normalize(text)
+        found = set()
+        rest = []  # Text outside exit phrases
+        end = 0
+        for match in self._regex.finditer(text):
+            intents = self._intents[match.group(0)]
+            found |= intents
+            if EXIT in intents:
+                rest.append(text[end:match.start()])
+                end = match.end()
+        rest.append(text[end:])
+        if EXIT in found:
+            if answering:
+                if any(word not in self.exit_filler_words for word in _WORD.findall(" ".join(rest))):
+                    found.discard(EXIT)  # An answer that happens to use an exit word
+            elif self.exit_max_words is not None and len(text.split()) > self.exit_max_words:
+                found.discard(EXIT)  # A long message is an answer that happens to use an exit word
+        for intent in PRIORITY:
+            if intent in found:
+                return intent
+        return NONE
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier():
+    """Return the classifier built from the phrase lists in config (compiled once per process)"""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            from config import (CONSENT_NEGATIVE_PHRASES, CONSENT_POSITIVE_PHRASES, EXIT_FILLER_WORDS,
+                                EXIT_KEYWORDS, EXIT_MAX_WORDS)
+
+            _classifier = IntentClassifier(CONSENT_POSITIVE_PHRASES, CONSENT_NEGATIVE_PHRASES,
+                                           EXIT_KEYWORDS, EXIT_MAX_WORDS, EXIT_FILLER_WORDS)
+        return _classifier
+
+
+def classify_intent(text, answering=False):
+    """Classify one chat message with the shared classifier"""
+    return get_intent_classifier().classify(text, answering)
@@ -0,0 +1,204 @@
+"""Offline, precomputed pool of screening questions per technology.
+
+``python -m chatbot.question_bank build`` walks ``config.TECH_CATEGORIES``
+and asks Gemini for a pool of questions for every technology at each
+difficulty level, storing them in a small indexed SQLite file. The app then
+draws questions from the pool without waiting on the network and only
+generates live for technologies the bank does not cover.
+"""
+
+import argparse
+import json
+import random
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+LEVELS = ["easy", "medium", "hard"]
+
+LEVEL_GUIDANCE = {
+    "easy": "suitable for a candidate with 0-2 years of experience; focus on core concepts used in practice",
+    "medium": "suitable for a candidate with 2-5 years of experience; focus on real-world application and trade-offs",
+    "hard": "suitable for a senior candidate with 5+ years of experience; focus on design, scaling and debugging",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    tech TEXT NOT NULL COLLATE NOCASE,
+    level TEXT NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE (tech, level, text)
+);
+CREATE INDEX IF NOT EXISTS idx_questions_tech_level ON questions (tech, level);
+"""
+
+
+def experience_level(experience):
+    """Map a free-text experience answer (e.g. '3 years', 'entry level') to a difficulty level"""
+    experience = (experience or "").lower()
+    if any(word in experience for word in ("entry", "fresh", "beginner", "intern")):
+        return "easy"
+    match = re.search(r"\d+(\.\d+)?", experience)
+    if not match:
+        return "medium"
+    years = float(match.group(0))
+    if years < 2:
+        return "easy"
+    if years < 5:
+        return "medium"
+    return "hard"
+
+
+def build_prompt(tech, level, count):
+    """Prompt asking for a JSON array of screening questions"""
+    return f"""
+    You are a technical interviewer for TalentScout. Write {count} distinct, practical screening questions about {tech},
+    {LEVEL_GUIDANCE[level]}.
+
+    Each question should be specific, clear, answerable in a few paragraphs, and phrased in a conversational,
+    encouraging tone addressed to the candidate.
+
+    Respond with only a JSON array of {count} strings, one question per string.
+    """
+
+
+def parse_questions(text):
+    """Extract question strings from a model response"""
+    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    try:
+        questions = json.loads(cleaned)
+        if isinstance(questions, list):
+            return [q.strip() for q in questions if isinstance(q, str) and q.strip()]
+    except json.JSONDecodeError:
+        pass
+    # Fall back to one question per numbered or bulleted line
+    lines = [re.sub(r"^\s*(?:\d+[.)]|[-*•])\s*", "", line).strip() for line in text.splitlines()]
+    return [line for line in lines if line.endswith("?")]
+
+
+class QuestionBank:
+    """In-memory view of the question bank file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._questions = {}
+        try:
+            conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        except sqlite3.OperationalError:
+            return  # No bank built yet; every draw falls back to live generation
+        try:
+            for tech, level, text in conn.execute("SELECT tech, level, text FROM questions ORDER BY rowid"):
+                self._questions.setdefault((tech.lower(), level), []).append(text)
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.close()
+
+    def __len__(self):
+        return sum(len(questions) for questions in self._questions.values())
+
+    def has(self, tech):
+        """Whether the bank holds any question for `tech`"""
+        return any((tech.lower(), level) in self._questions for level in LEVELS)
+
+    def draw(self, tech, level, exclude=(), rng=random):
+        """Random question for `tech` at `level` not in `exclude`, or None.
+
+        Falls back to neighbouring levels when the requested one is empty.
+        """
+        order = sorted(LEVELS, key=lambda candidate: abs(LEVELS.index(candidate) - LEVELS.index(level)))
+        for candidate in order:
+            pool = [q for q in self._questions.get((tech.lower(), candidate), []) if q not in exclude]
+            if pool:
+                return rng.choice(pool)
+        return None
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_question_bank(path):
+    """Return the shared question bank for `path` (loaded once per process)"""
+    with _banks_lock:
+        bank = _banks.get(path)
+        if bank is None:
+            bank = QuestionBank(path)
+            _banks[path] = bank
+        return bank
+
+
+def build(path, model, technologies, levels, per_level, generation_config=None, workers=4):
+    """Generate questions for every (technology, level) and store them in `path`"""
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    jobs = [(tech, level) for tech in technologies for level in levels]
+
+    def generate(tech, level):
+        response = model.generate_content(build_prompt(tech, level, per_level), generation_config=generation_config)
+        return parse_questions(response.text)[:per_level]
+
+    stored = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(generate, tech, level): (tech, level) for tech, level in jobs}
+        for future in as_completed(futures):
+            tech, level = futures[future]
+            try:
+                questions = future.result()
+            except Exception as e:
+                print(f"Error generating {level} questions for {tech}: {str(e)}")
+                continue
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO questions (tech, level, text) VALUES (?, ?, ?)",
+                    [(tech, level, question) for question in questions]
+                )
+            stored += len(questions)
+            print(f"{tech} [{level}]: {len(questions)} questions")
+    conn.execute("VACUUM")
+    conn.close()
+    return stored
+
+
+def main():
+    """Command line entry point for building and inspecting the question bank"""
+    from config import (GENERATION_CONFIG, GOOGLE_API_KEY, LLM_BACKEND, LLM_MAX_RETRIES, LLM_RECORD_FILE,
+                        LLM_REPLAY_FILE, LLM_REQUEST_TIMEOUT, LLM_RPM, LLM_SIM_ERROR_CODES, LLM_SIM_ERROR_RATE,
+                        LLM_SIM_LATENCY, LLM_SIM_TOKENS_PER_SECOND, LLM_TPM, MODEL_NAME, QUESTION_BANK_FILE,
+                        get_all_technologies)
+
+    parser = argparse.ArgumentParser(description="Build or inspect the offline question bank")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    bank_file = argparse.ArgumentParser(add_help=False)
+    bank_file.add_argument("--file", default=QUESTION_BANK_FILE)
+    build_parser = subparsers.add_parser("build", help="Pre-generate questions with Gemini", parents=[bank_file])
+    build_parser.add_argument("--tech", nargs="*", help="Only these technologies (default: all in TECH_CATEGORIES)")
+    build_parser.add_argument("--levels", nargs="*", default=LEVELS, choices=LEVELS)
+    build_parser.add_argument("--per-level", type=int, default=5)
+    build_parser.add_argument("--workers", type=int, default=4)
+    subparsers.add_parser("stats", help="Show how many questions each technology has", parents=[bank_file])
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from llm.backends import create_backend
+        from llm.scheduler import ScheduledModel, get_scheduler
+
+        backend = create_backend(LLM_BACKEND, MODEL_NAME, GOOGLE_API_KEY, LLM_RECORD_FILE, LLM_REPLAY_FILE,
+                                 LLM_SIM_LATENCY, LLM_SIM_TOKENS_PER_SECOND, LLM_SIM_ERROR_RATE, LLM_SIM_ERROR_CODES)
+        scheduler = get_scheduler(rpm=LLM_RPM, tpm=LLM_TPM, max_concurrency=args.workers,
+                                  max_retries=LLM_MAX_RETRIES, queue_timeout=None)
+        model = ScheduledModel(backend, scheduler, LLM_REQUEST_TIMEOUT)
+        technologies = args.tech or get_all_technologies()
+        stored = build(args.file, model, technologies, args.levels, args.per_level, GENERATION_CONFIG, args.workers)
+        print(f"Stored {stored} questions in {args.file}")
+    else:
+        bank = QuestionBank(args.file)
+        for tech in get_all_technologies():
+            counts = {level: len(bank._questions.get((tech.lower(), level), [])) for level in LEVELS}
+            print(f"{tech}: " + ", ".join(f"{level}={count}" for level, count in counts.items()))
+        print(f"Total: {len(bank)}")
+
+
+if __name__ == "__main__":
+    main()
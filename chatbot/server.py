@@ -0,0 +1,280 @@
+"""Async HTTP/WebSocket API for the screening conversation engine.
+
+Usage: python -m chatbot.server [--host 127.0.0.1] [--port 8000]
+
+HTTP (JSON):
+    POST /api/sessions                  start a session; returns it with the greeting
+    GET  /api/sessions/{id}             state, candidate data and the recent history
+    GET  /api/sessions/{id}/history     ?start=&limit= page through the whole history
+    POST /api/sessions/{id}/messages    {"text": ...}; returns {"reply", "state", ...}
+    POST /api/sessions/{id}/reset       start over as a new candidate
+    POST /api/sessions/{id}/save        save the candidate data
+    DELETE /api/sessions/{id}           forget the session and its history
+    GET  /healthz
+    GET  /metrics                       live/suspended sessions and memory (Prometheus)
+
+WebSocket /ws[?session_id=...] resumes the session (or starts one) and
+sends {"type": "session", ...}, streaming the greeting if it is new. The
+client sends {"type": "message", "text": ...}, {"type": "reset"} or
+{"type": "save"}; model output streams back as {"type": "token", "text":
+delta} events ({"type": "stream_reset"} discards what was streamed after a
+failed call) followed by {"type": "reply", "text": ..., "state": ...}.
+
+Each connection is a coroutine; a turn runs on a bounded thread pool
+(config.ENGINE_WORKERS) only while it is being processed, so idle sessions
+cost memory but no threads. Sessions idle for config.SESSION_TIMEOUT are
+suspended to disk and restored on their next request (chatbot.sessions).
+"""
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+
+from chatbot.candidate_repository import CandidateConflict
+from chatbot.sessions import SessionStore, session_metrics, valid_session_id
+from grading.metrics import CONTENT_TYPE
+
+HISTORY_PAGE = 100  # Most messages returned by one history request
+
+_DONE = object()
+
+
+class QueueListener:
+    """Engine stream listener that forwards deltas to an asyncio queue from a worker thread"""
+
+    def __init__(self, loop, queue):
+        self.loop = loop
+        self.queue = queue
+        self.sent = ""
+
+    def _put(self, event):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    def update(self, text):
+        if text.startswith(self.sent):
+            delta = text[len(self.sent):]
+        else:
+            self._put({"type": "stream_reset"})
+            delta = text
+        self.sent = text
+        if delta:
+            self._put({"type": "token", "text": delta})
+
+    def finish(self, text):
+        self.update(text)
+
+    def clear(self):
+        if self.sent:
+            self._put({"type": "stream_reset"})
+        self.sent = ""
+
+
+def session_view(session, reply=None):
+    body = session.to_dict()
+    if reply is not None:
+        body["reply"] = reply
+    return body
+
+
+def create_app(engine, workers=64, sessions=None):
+    """Starlette app serving `engine`; turns run on a pool of `workers` threads"""
+    if sessions is None:
+        sessions = SessionStore(engine)
+    metrics = session_metrics(sessions)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="engine")
+
+    async def run(fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    def lookup(request):
+        # Restoring a suspended session reads a small file; cheap enough for the event loop
+        session = sessions.get(request.path_params["session_id"])
+        if session is None:
+            return None, JSONResponse({"error": "Unknown session"}, status_code=404)
+        return session, None
+
+    async def read_text(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return None
+        text = body.get("text") if isinstance(body, dict) else None
+        return text.strip() if isinstance(text, str) and text.strip() else None
+
+    async def create_session(request):
+        session = sessions.create()
+        greeting = await run(engine.start, session)
+        return JSONResponse(session_view(session, greeting), status_code=201)
+
+    async def get_session(request):
+        session, error = lookup(request)
+        return error or JSONResponse(session_view(session))
+
+    async def get_history(request):
+        session, error = lookup(request)
+        if error:
+            return error
+        try:
+            start = int(request.query_params.get("start", 0))
+            limit = min(int(request.query_params.get("limit", HISTORY_PAGE)), HISTORY_PAGE)
+        except ValueError:
+            return JSONResponse({"error": "'start' and 'limit' must be integers"}, status_code=400)
+        messages = await run(session.chat_history.slice, start, start + limit)
+        return JSONResponse({"messages": messages, "start": start, "length": len(session.chat_history)})
+
+    async def post_message(request):
+        session, error = lookup(request)
+        if error:
+            return error
+        text = await read_text(request)
+        if text is None:
+            return JSONResponse({"error": "Missing 'text'"}, status_code=400)
+        reply = await run(engine.handle, session, text)
+        return JSONResponse({"reply": reply, "state": session.conversation_state})
+
+    async def reset_session(request):
+        session, error = lookup(request)
+        if error:
+            return error
+        await run(engine.reset, session)
+        greeting = await run(engine.start, session)
+        return JSONResponse(session_view(session, greeting))
+
+    async def save_session(request):
+        session, error = lookup(request)
+        if error:
+            return error
+        try:
+            await run(engine.save, session)
+        except CandidateConflict as e:
+            return JSONResponse({"error": f"Error saving data: {str(e)}"}, status_code=409)
+        except Exception as e:
+            return JSONResponse({"error": f"Error saving data: {str(e)}"}, status_code=500)
+        return JSONResponse({"saved": True, "session_id": session.id})
+
+    async def delete_session(request):
+        if not await run(sessions.delete, request.path_params["session_id"]):
+            return JSONResponse({"error": "Unknown session"}, status_code=404)
+        return JSONResponse({"deleted": True})
+
+    async def healthz(request):
+        return JSONResponse({"status": "ok", "sessions": len(sessions)})
+
+    async def get_metrics(request):
+        return Response(await run(metrics.render), media_type=CONTENT_TYPE)
+
+    async def streamed(websocket, fn, *args):
+        """Run an engine call, forwarding its stream to the socket; returns its result"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        future = loop.run_in_executor(executor, fn, *args, QueueListener(loop, queue))
+        future.add_done_callback(lambda _: queue.put_nowait(_DONE))
+        while True:
+            event = await queue.get()
+            if event is _DONE:
+                break
+            await websocket.send_json(event)
+        return future.result()
+
+    async def send_reply(websocket, session, reply):
+        await websocket.send_json({"type": "reply", "text": reply, "state": session.conversation_state})
+
+    async def chat_socket(websocket):
+        await websocket.accept()
+        session_id = websocket.query_params.get("session_id")
+        session = sessions.get(session_id) if session_id else None
+        if session is None:
+            session = sessions.create(session_id if valid_session_id(session_id) else None)
+        await websocket.send_json({"type": "session", **session_view(session)})
+        try:
+            greeting = await streamed(websocket, engine.start, session)
+            if greeting is not None:
+                await send_reply(websocket, session, greeting)
+            while True:
+                try:
+                    message = json.loads(await websocket.receive_text())
+                except ValueError:
+                    await websocket.send_json({"type": "error", "error": "Invalid JSON"})
+                    continue
+                kind = message.get("type") if isinstance(message, dict) else None
+                # Look the session up again: it may have been suspended while the socket sat idle
+                session = sessions.get(session.id) or sessions.create(session.id)
+                if kind == "message":
+                    text = message.get("text")
+                    if not isinstance(text, str) or not text.strip():
+                        await websocket.send_json({"type": "error", "error": "Missing 'text'"})
+                        continue
+                    try:
+                        reply = await streamed(websocket, engine.handle, session, text.strip())
+                    except Exception as e:
+                        await websocket.send_json({"type": "error", "error": str(e)})
+                        continue
+                    await send_reply(websocket, session, reply)
+                elif kind == "reset":
+                    await run(engine.reset, session)
+                    await websocket.send_json({"type": "session", **session_view(session)})
+                    await send_reply(websocket, session, await streamed(websocket, engine.start, session))
+                elif kind == "save":
+                    try:
+                        await run(engine.save, session)
+                        await websocket.send_json({"type": "saved", "session_id": session.id})
+                    except Exception as e:
+                        await websocket.send_json({"type": "error", "error": f"Error saving data: {str(e)}"})
+                else:
+                    await websocket.send_json({"type": "error", "error": f"Unknown message type {kind!r}"})
+        except WebSocketDisconnect:
+            pass
+
+    @asynccontextmanager
+    async def lifespan(app):
+        sessions.start_sweeper()
+        yield
+        sessions.stop_sweeper()
+        executor.shutdown(wait=False)
+
+    app = Starlette(
+        routes=[
+            Route("/api/sessions", create_session, methods=["POST"]),
+            Route("/api/sessions/{session_id}", get_session, methods=["GET"]),
+            Route("/api/sessions/{session_id}", delete_session, methods=["DELETE"]),
+            Route("/api/sessions/{session_id}/history", get_history, methods=["GET"]),
+            Route("/api/sessions/{session_id}/messages", post_message, methods=["POST"]),
+            Route("/api/sessions/{session_id}/reset", reset_session, methods=["POST"]),
+            Route("/api/sessions/{session_id}/save", save_session, methods=["POST"]),
+            Route("/healthz", healthz, methods=["GET"]),
+            Route("/metrics", get_metrics, methods=["GET"]),
+            WebSocketRoute("/ws", chat_socket),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.engine = engine
+    app.state.sessions = sessions
+    return app
+
+
+def main():
+    from config import ENGINE_WORKERS, SERVER_HOST, SERVER_PORT
+
+    parser = argparse.ArgumentParser(description="Screening conversation API server")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=ENGINE_WORKERS, help="Chat turns processed at once")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    from chatbot.sessions import get_session_store
+
+    sessions = get_session_store()
+    uvicorn.run(create_app(sessions.engine, args.workers, sessions), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""Registry of screening sessions with idle eviction and disk offload.
+
+Live sessions are held in memory, keyed by session id. ``evict_idle``
+(run periodically by ``start_sweeper``) suspends sessions idle for longer
+than ``ttl`` seconds: their state is written to ``<offload_dir>/<id>.json.z``
+(compact, zlib-compressed JSON; chat history already spilled by
+``ChatHistory`` stays in its own file) and dropped from memory. ``get``
+restores a suspended session transparently, so clients never see the
+difference. Suspended sessions untouched for ``retention`` seconds are
+deleted along with their chat history.
+
+Without ``ttl`` sessions are never evicted; without ``offload_dir``
+evicted sessions are discarded instead of suspended.
+
+``session_metrics`` builds the session and memory gauges; the API server
+renders them on its own ``/metrics`` and the Streamlit app exports them with
+``start_metrics_server``.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+from chatbot.history import history_path
+from grading.metrics import Registry, resident_memory_bytes, serve_metrics
+
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+SNAPSHOT_SUFFIX = ".json.z"
+
+
+def valid_session_id(session_id):
+    """Whether `session_id` is safe to use as a key and a file name"""
+    return isinstance(session_id, str) and bool(SESSION_ID_PATTERN.match(session_id))
+
+
+def encode_snapshot(snapshot):
+    return zlib.compress(json.dumps(snapshot, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+
+def decode_snapshot(data):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+class SessionStore:
+    """Sessions created by one engine, shared by every client of the process"""
+
+    def __init__(self, engine, ttl=None, offload_dir=None, retention=None):
+        self.engine = engine
+        self.ttl = ttl
+        self.offload_dir = offload_dir
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._sweeper = None
+        self._stop = threading.Event()
+        self.evicted = 0
+        self.restored = 0
+        self.expired = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def _snapshot_path(self, session_id):
+        return os.path.join(self.offload_dir, f"{session_id}{SNAPSHOT_SUFFIX}")
+
+    def create(self, session_id=None):
+        """Start a new session (replacing any session with the same id)"""
+        if session_id is not None and not valid_session_id(session_id):
+            raise ValueError(f"Invalid session id {session_id!r}")
+        session = self.engine.new_session(session_id)
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        """The session for `session_id`, restored from disk if it was suspended; None if unknown"""
+        if not valid_session_id(session_id):
+            return None
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._restore(session_id)
+            if session is not None:
+                # Counts as activity, so the sweeper leaves it alone while the caller uses it
+                session.last_active = time.time()
+            return session
+
+    def _restore(self, session_id):
+        """Load a suspended session back into memory (caller holds the lock)"""
+        if not self.offload_dir:
+            return None
+        path = self._snapshot_path(session_id)
+        try:
+            with open(path, "rb") as f:
+                snapshot = decode_snapshot(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            print(f"Error restoring session {session_id}: {str(e)}")
+            return None
+        session = self.engine.restore_session(snapshot)
+        self._sessions[session_id] = session
+        os.remove(path)
+        self.restored += 1
+        return session
+
+    def delete(self, session_id):
+        """Forget a session, live or suspended, and its chat history; returns whether it existed"""
+        if not valid_session_id(session_id):
+            return False
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            existed = self._remove_files(session_id) or session is not None
+        if session is not None:
+            session.chat_history.clear()
+        return existed
+
+    def _remove_files(self, session_id):
+        """Remove a suspended session's snapshot and chat history; returns whether a snapshot existed"""
+        removed = False
+        if self.offload_dir:
+            try:
+                os.remove(self._snapshot_path(session_id))
+                removed = True
+            except FileNotFoundError:
+                pass
+        if self.engine.history_dir:
+            try:
+                os.remove(history_path(self.engine.history_dir, session_id))
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def evict_idle(self, now=None):
+        """Suspend (or drop) sessions idle for longer than `ttl`; returns how many were evicted"""
+        if not self.ttl:
+            return 0
+        now = now or time.time()
+        with self._lock:
+            idle = [session for session in self._sessions.values() if now - session.last_active > self.ttl]
+        evicted = 0
+        for session in idle:
+            # A session in the middle of a turn is not idle, whatever its timestamp says
+            if not session.lock.acquire(blocking=False):
+                continue
+            try:
+                last_active = session.last_active
+                if self.offload_dir:
+                    self._offload(session)
+                with self._lock:
+                    if session.last_active != last_active or self._sessions.get(session.id) is not session:
+                        # Picked up by a client while it was being written; keep it live
+                        if self.offload_dir:
+                            os.remove(self._snapshot_path(session.id))
+                        continue
+                    del self._sessions[session.id]
+                    self.evicted += 1
+                if not self.offload_dir:
+                    session.chat_history.clear()
+                evicted += 1
+            except OSError as e:
+                print(f"Error suspending session {session.id}: {str(e)}")
+            finally:
+                session.lock.release()
+        return evicted
+
+    def _offload(self, session):
+        """Write a session's snapshot atomically (caller holds the session's lock)"""
+        os.makedirs(self.offload_dir, exist_ok=True)
+        path = self._snapshot_path(session.id)
+        temp_path = f"{path}.tmp"
+        snapshot = session.snapshot()
+        session.measure(snapshot)  # Still counted if a client picks the session up meanwhile
+        with open(temp_path, "wb") as f:
+            f.write(encode_snapshot(snapshot))
+        os.replace(temp_path, path)
+
+    def expire_suspended(self, now=None):
+        """Delete suspended sessions untouched for longer than `retention`; returns how many"""
+        if not self.retention or not self.offload_dir or not os.path.isdir(self.offload_dir):
+            return 0
+        now = now or time.time()
+        expired = 0
+        for name in os.listdir(self.offload_dir):
+            if not name.endswith(SNAPSHOT_SUFFIX):
+                continue
+            session_id = name[:-len(SNAPSHOT_SUFFIX)]
+            with self._lock:
+                try:
+                    if now - os.path.getmtime(os.path.join(self.offload_dir, name)) <= self.retention:
+                        continue
+                except FileNotFoundError:
+                    continue  # Restored meanwhile
+                if self._remove_files(session_id):
+                    expired += 1
+                    self.expired += 1
+        return expired
+
+    def suspended_count(self):
+        if not self.offload_dir or not os.path.isdir(self.offload_dir):
+            return 0
+        return sum(1 for name in os.listdir(self.offload_dir) if name.endswith(SNAPSHOT_SUFFIX))
+
+    def live_bytes(self):
+        """Approximate memory held by live sessions: the size of their encoded state.
+
+        Sums the sizes each session recorded after its last turn (or suspension
+        attempt), so a scrape neither serializes sessions nor waits for their locks.
+        """
+        with self._lock:
+            return sum(session.encoded_size for session in self._sessions.values())
+
+    def stats(self):
+        return {
+            "live": len(self),
+            "suspended": self.suspended_count(),
+            "evicted": self.evicted,
+            "restored": self.restored,
+            "expired": self.expired,
+        }
+
+    def sweep(self):
+        """One pass of eviction and expiry"""
+        self.evict_idle()
+        self.expire_suspended()
+
+    def start_sweeper(self, interval=None):
+        """Run `sweep` every `interval` seconds (default: a quarter of the TTL, at most a minute) in a daemon thread"""
+        if not self.ttl or self._sweeper is not None:
+            return
+        interval = interval or min(60.0, self.ttl / 4)
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    print(f"Error sweeping sessions: {str(e)}")
+
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=run, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+
+def session_metrics(sessions):
+    """Registry with the session gauges exported on /metrics"""
+    metrics = Registry()
+    metrics.gauge("chat_sessions", "Screening sessions by state", ("state",),
+                  lambda: {(state,): count for state, count in sessions.stats().items()
+                           if state in ("live", "suspended")})
+    metrics.gauge("chat_session_transitions", "Sessions evicted, restored and expired since start", ("event",),
+                  lambda: {(event,): count for event, count in sessions.stats().items()
+                           if event in ("evicted", "restored", "expired")})
+    metrics.gauge("chat_sessions_memory_bytes", "Encoded size of the state held by live sessions", (),
+                  lambda: {(): sessions.live_bytes()})
+    metrics.gauge("process_resident_memory_bytes", "Resident memory of this process", (),
+                  lambda: {(): resident_memory_bytes()})
+    return metrics
+
+
+_store = None
+_store_lock = threading.Lock()
+_metrics_server = None
+
+
+def get_session_store():
+    """Return the session store for the configured engine (one per process, sweeper running)"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            from config import SESSION_OFFLOAD_DIR, SESSION_RETENTION, SESSION_TIMEOUT
+
+            from chatbot.engine import get_engine
+
+            _store = SessionStore(get_engine(), SESSION_TIMEOUT, SESSION_OFFLOAD_DIR, SESSION_RETENTION)
+            _store.start_sweeper()
+        return _store
+
+
+def start_metrics_server(sessions, host, port):
+    """Export session_metrics(sessions) on http://host:port/metrics (once per process; port 0 disables it)"""
+    global _metrics_server
+    with _store_lock:
+        if _metrics_server is None and port:
+            try:
+                _metrics_server = serve_metrics(session_metrics(sessions), host, port)
+            except OSError as e:
+                # Another process (e.g. a second app instance) already exports on this port
+                print(f"Error starting the metrics server on {host}:{port}: {str(e)}")
+                _metrics_server = False
+        return _metrics_server or None
@@ -0,0 +1,96 @@
+"""Single-pass technology matcher for candidate tech-stack answers.
+
+All technology names and aliases are compiled once into one regex with token
+boundaries, so a whole answer is scanned in one pass and "Go" no longer
+matches "good" nor "Java" match "JavaScript". The spellings are folded into a
+character trie before compiling, so the regex engine follows one branch per
+character instead of retrying every spelling at every position.
+"""
+
+import re
+import threading
+
+# A match may not touch a word character or the symbols used inside
+# technology names (C++, C#, Node.js), so "Java" never matches "JavaScript"
+LEFT_BOUNDARY = r"(?<![\w+#])"
+RIGHT_BOUNDARY = r"(?![\w+#]|\.\w)"
+
+
+def _normalize(surface):
+    return " ".join(surface.lower().split())
+
+
+def trie_pattern(surfaces):
+    """Regex matching any of the normalized `surfaces`, factored by common prefix"""
+    trie = {}
+    for surface in surfaces:
+        node = trie
+        for char in surface:
+            node = node.setdefault(char, {})
+        node[""] = {}  # end of a spelling
+
+    def build(node):
+        branches = [(r"\s+" if char == " " else re.escape(char)) + build(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            # Greedy optional: longer spellings ("Vue.js") are tried before "Vue"
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class TechMatcher:
+    """Finds canonical technology names mentioned in free text"""
+
+    def __init__(self, technologies, aliases=None, case_sensitive=()):
+        aliases = aliases or {}
+        case_sensitive = set(case_sensitive)
+        self._canonical = {}
+        self._exact = {}
+        for tech in technologies:
+            if tech in case_sensitive:
+                self._exact[tech] = tech
+            else:
+                self._canonical[_normalize(tech)] = tech
+            for alias in aliases.get(tech, []):
+                self._canonical[_normalize(alias)] = tech
+
+        # Case-sensitive names are matched case-insensitively too and filtered in _resolve
+        surfaces = set(self._canonical) | {_normalize(tech) for tech in self._exact}
+        self._regex = re.compile(f"{LEFT_BOUNDARY}{trie_pattern(surfaces)}{RIGHT_BOUNDARY}", re.IGNORECASE)
+
+    def _resolve(self, surface):
+        tech = self._exact.get(surface)
+        if tech is None:
+            tech = self._canonical.get(_normalize(surface))
+        return tech
+
+    def find_all(self, text):
+        """Canonical technologies mentioned in `text`, in order of first mention"""
+        found = []
+        seen = set()
+        for match in self._regex.finditer(text):
+            tech = self._resolve(match.group(0))
+            if tech is not None and tech not in seen:
+                seen.add(tech)
+                found.append(tech)
+        return found
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_tech_matcher():
+    """Return the matcher built from config.TECH_CATEGORIES (compiled once per process)"""
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            from config import CASE_SENSITIVE_TECH, TECH_ALIASES, get_all_technologies
+
+            _matcher = TechMatcher(get_all_technologies(), TECH_ALIASES, CASE_SENSITIVE_TECH)
+        return _matcher
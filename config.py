@@ -10,21 +10,94 @@ TEMPERATURE = 0.6
 TOP_P = 0.8
 TOP_K = 40
 
+# Model backend: "gemini", or "simulated" for offline load tests (see llm/backends.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_SIM_LATENCY = os.getenv("LLM_SIM_LATENCY", "lognormal:0.8,0.4")  # Seconds to first token
+LLM_SIM_TOKENS_PER_SECOND = float(os.getenv("LLM_SIM_TOKENS_PER_SECOND", "80"))
+LLM_SIM_ERROR_RATE = float(os.getenv("LLM_SIM_ERROR_RATE", "0"))  # Fraction of calls that fail...
+LLM_SIM_ERROR_CODES = os.getenv("LLM_SIM_ERROR_CODES", "429,503")  # ...with one of these statuses
+LLM_RECORD_FILE = os.getenv("LLM_RECORD_FILE", "")  # Append every response here (JSON lines)...
+LLM_REPLAY_FILE = os.getenv("LLM_REPLAY_FILE", "")  # ...and replay them from the simulated backend
+
+STREAM_RESPONSES = True  # Render Gemini tokens in the chat as they arrive
+
+# LLM response cache (greeting and question prompts opt in)
+LLM_CACHE_DIR = "data/llm_cache"
+LLM_CACHE_MAX_ENTRIES = 512  # In-memory LRU size
+LLM_CACHE_TTL = 7 * 24 * 3600  # Seconds before a cached response is regenerated
+QUESTION_CACHE_VARIANTS = 5  # Distinct cached questions per prompt, for variety
+# Seconds before a cached model answer or rubric is regenerated (gemini-ass.py)
+GRADING_LLM_CACHE_TTL = int(os.getenv("GRADING_LLM_CACHE_TTL", str(30 * 24 * 3600)))
+
+# Gemini call scheduler (limits are per process; give each process its share of the quota)
+LLM_RPM = int(os.getenv("LLM_RPM", "15"))  # Requests per minute
+LLM_TPM = int(os.getenv("LLM_TPM", "1000000"))  # Tokens per minute
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # Calls in flight at once
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))  # Retries on 429 / 5xx, with jittered exponential backoff
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))  # Seconds a chat turn waits for a slot before falling back
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))  # Seconds before a single Gemini request is abandoned
+# Seconds a grading call waits for a slot (gemini-ass.py); grading has no fallback reply, so it waits longer
+GRADING_LLM_QUEUE_TIMEOUT = float(os.getenv("GRADING_LLM_QUEUE_TIMEOUT", "120"))
+
+# Offline question bank (build with: python -m chatbot.question_bank build)
+QUESTION_BANK_FILE = "data/question_bank.db"
+
+# Screening API server (python -m chatbot.server)
+SERVER_HOST = os.getenv("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+ENGINE_WORKERS = int(os.getenv("ENGINE_WORKERS", "64"))  # Chat turns processed at once (idle sessions cost none)
+
+# Session and memory gauges of the Streamlit app, on http://APP_METRICS_HOST:APP_METRICS_PORT/metrics (0 disables)
+APP_METRICS_HOST = os.getenv("APP_METRICS_HOST", "127.0.0.1")
+APP_METRICS_PORT = int(os.getenv("APP_METRICS_PORT", "9108"))
+
 # App Configuration
 APP_TITLE = "TalentScout Hiring Assistant"
 APP_DESCRIPTION = "AI-powered chatbot for candidate screening using Google Gemini"
 
 # Data
-DATA_FILE = "data/candidates.json"
+DATA_FILE = "data/candidates.json"  # Legacy whole-file store (import with chatbot.candidate_store)
 DATA_DIR = "data"
+CANDIDATE_LOG_FILE = "data/candidates.jsonl"
+CANDIDATE_FSYNC_BATCH = 20  # fsync after this many appends...
+CANDIDATE_FSYNC_INTERVAL = 1.0  # ...or after this many seconds, whichever comes first
+CANDIDATE_DB_FILE = "data/candidates.db"  # Indexed, deduplicated view of saved candidates
 
 # Create data directory if it doesn't exist
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
+# Chat history
+CHAT_WINDOW = 20  # Messages rendered at once; "Load earlier messages" shows this many more
+CHAT_HISTORY_IN_MEMORY = 40  # Messages kept in memory per session; older ones are spilled...
+CHAT_HISTORY_DIR = "data/chat_history"  # ...to <session id>.jsonl here
+
+# Sessions (see chatbot/sessions.py)
+SESSION_TIMEOUT = int(os.getenv("SESSION_TIMEOUT", "1800"))  # Idle seconds before a session is suspended to disk
+SESSION_OFFLOAD_DIR = "data/sessions"  # Suspended sessions, restored on their next request
+SESSION_RETENTION = int(os.getenv("SESSION_RETENTION", str(7 * 24 * 3600)))  # Seconds before a suspended session is deleted
+
 # Conversation
 MAX_QUESTIONS_PER_TECH = 3
 EXIT_KEYWORDS = ["exit", "quit", "bye", "goodbye", "done", "stop", "finish", "end"]
+EXIT_MAX_WORDS = 6  # Longer messages are answers that merely mention "end", "done", etc.
+# While a question is being answered only a bare exit phrase ends the screening, give or take these
+# words: "I'm done" and "bye, thanks" end it, "Back end engineer" and "stop the server" do not
+EXIT_FILLER_WORDS = ["i", "i'm", "im", "am", "we're", "all", "please", "thanks", "thank", "you", "now", "for", "today",
+                     "ok", "okay", "so"]
+
+# Consent phrases, matched as whole words; the longest phrase wins, so "no problem" is positive
+CONSENT_POSITIVE_PHRASES = [
+    "yes", "y", "yeah", "yep", "sure", "ok", "okay", "proceed", "continue",
+    "go ahead", "start", "begin", "ready", "let's go", "lets go", "fine",
+    "alright", "agree", "accept", "let's do this", "lets do this",
+    "no problem", "of course", "why not", "sounds good", "don't mind", "dont mind"
+]
+CONSENT_NEGATIVE_PHRASES = [
+    "no", "n", "nope", "not now", "maybe later", "stop", "cancel",
+    "don't want", "dont want", "refuse", "decline", "not interested",
+    "not ready", "no thanks", "no thank you", "not really", "not sure", "don't know", "dont know"
+]
 
 # Supported Technologies (simplified list for rapid development)
 TECH_CATEGORIES = {
@@ -36,6 +109,34 @@ TECH_CATEGORIES = {
     "Tools": ["Git", "Jenkins", "Nginx", "Linux", "REST APIs", "GraphQL"]
 }
 
+# Other ways candidates refer to supported technologies (matched case-insensitively)
+TECH_ALIASES = {
+    "Python": ["Python3"],
+    "JavaScript": ["JS", "ES6", "ECMAScript"],
+    "C++": ["cpp", "C plus plus"],
+    "C#": ["csharp", "C sharp"],
+    "Go": ["Golang"],
+    "TypeScript": ["TS"],
+    "React": ["ReactJS", "React.js"],
+    "Angular": ["AngularJS"],
+    "Vue.js": ["Vue", "VueJS"],
+    "HTML/CSS": ["HTML", "HTML5", "CSS", "CSS3"],
+    "Tailwind CSS": ["Tailwind", "TailwindCSS"],
+    "Express.js": ["Express", "ExpressJS"],
+    "Spring Boot": ["Spring", "SpringBoot"],
+    "Node.js": ["Node", "NodeJS"],
+    "PostgreSQL": ["Postgres", "psql"],
+    "MongoDB": ["Mongo"],
+    "AWS": ["Amazon Web Services"],
+    "Google Cloud": ["GCP", "Google Cloud Platform"],
+    "Azure": ["Microsoft Azure"],
+    "Kubernetes": ["k8s"],
+    "REST APIs": ["REST", "RESTful", "REST API"],
+}
+
+# Names that are also common English words, matched only with this exact capitalization
+CASE_SENSITIVE_TECH = ["Go"]
+
 # Conversation States for flow management
 CONVERSATION_STATES = {
     "GREETING": "greeting",
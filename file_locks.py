@@ -0,0 +1,44 @@
+"""Exclusive file locks shared by the chatbot and grading packages.
+
+``locked`` holds an advisory lock on an open file (``fcntl.flock`` on POSIX,
+``msvcrt.locking`` on Windows) and ``file_lock`` opens a lock file by path
+and holds it, so threads and processes that share the file serialize on it.
+"""
+
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `path` (created if missing) for the duration of the block"""
+    with open(path, "a+b") as f, locked(f):
+        yield
+
+
+@contextmanager
+def locked(f):
+    """Hold an exclusive lock on the open binary file `f` for the duration of the block"""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError:
+                pass  # LK_LOCK gives up after ~10 seconds; keep waiting
+    try:
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -1,60 +1,171 @@
 import os
-import google.generativeai as gen_ai
+import bisect
 from dotenv import load_dotenv
-import nltk
-from sklearn.metrics.pairwise import cosine_similarity
-import pandas as pd
+import scipy.sparse as sp
 import numpy as np
-import string
-from nltk.corpus import stopwords
 import pickle
 import json
 import re
-from google.generativeai.types import GenerationConfig
-from flask import Flask, request, jsonify
+import glob
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-
-# Download necessary NLTK data
-nltk.download("popular", quiet=True)
+from config import (GOOGLE_API_KEY, GRADING_LLM_CACHE_TTL, GRADING_LLM_QUEUE_TIMEOUT, LLM_BACKEND,
+                    LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES, LLM_RECORD_FILE, LLM_REPLAY_FILE, LLM_REQUEST_TIMEOUT,
+                    LLM_RPM, LLM_SIM_ERROR_CODES, LLM_SIM_ERROR_RATE, LLM_SIM_LATENCY,
+                    LLM_SIM_TOKENS_PER_SECOND, LLM_TPM, MODEL_NAME)
+from grading.lsh import MinHasher, shingles
+from llm.backends import create_backend
+from llm.cache import CachedModel, get_cache
+from llm.scheduler import BATCH, ScheduledModel, call_priority, get_scheduler, with_priority
+from grading.peer_index import PeerIndex, PeerIndexStore, vectorizer_fingerprint
+from grading.jobs import FAILED, QUEUED, JobQueue, JobWorkerPool
+from grading.metrics import CONTENT_TYPE, Registry, StageTimer
+from grading.preprocessing import MemoCache, TextPreprocessor, content_key
+from grading.scoring import FAILED as SCORE_FAILED, parse_score, structured_generation_config
+from grading.resources import LazyProxy, Resource, prewarm, sentence_tokenizer, stop_words
+from grading.single_flight import SingleFlight
+from grading.winnowing import FingerprintIndex, fingerprint_document
 
 # Load environment variables
 load_dotenv()
 
-# Configure Google Gemini-Flash AI model
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")  # Get API key from environment variables
-gen_ai.configure(api_key=GOOGLE_API_KEY)
-model = gen_ai.GenerativeModel('models/gemini-2.0-flash-lite')
+# Google Gemini model and call limits are shared with the chat app (config.py)
+def load_gemini_client():
+    """Build the model backend; the Gemini SDK is slow to import, so this is deferred to first use"""
+    return create_backend(
+        LLM_BACKEND,
+        MODEL_NAME,
+        api_key=GOOGLE_API_KEY,
+        record_file=LLM_RECORD_FILE,
+        replay_file=LLM_REPLAY_FILE,
+        latency=LLM_SIM_LATENCY,
+        tokens_per_second=LLM_SIM_TOKENS_PER_SECOND,
+        error_rate=LLM_SIM_ERROR_RATE,
+        error_codes=LLM_SIM_ERROR_CODES
+    )
+
+gemini_client = Resource("Gemini client", load_gemini_client)
+
+# Every Gemini call goes through one rate-limited scheduler; interactive
+# /api/evaluate requests are admitted before batch and queued grading
+scheduler = get_scheduler(
+    rpm=LLM_RPM,
+    tpm=LLM_TPM,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_retries=LLM_MAX_RETRIES,
+    queue_timeout=GRADING_LLM_QUEUE_TIMEOUT
+)
+model = ScheduledModel(LazyProxy(gemini_client), scheduler, LLM_REQUEST_TIMEOUT)
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Set up directory for storing assignment data
+# Request counts and per-stage latency for /metrics
+metrics = Registry()
+stages = StageTimer(metrics, "grading")
+http_requests = metrics.counter("grading_http_requests_total", "HTTP requests by endpoint and status",
+                                ("endpoint", "method", "status"))
+http_latency = metrics.histogram("grading_http_request_seconds", "HTTP request latency by endpoint", ("endpoint",))
+answer_words = metrics.histogram("grading_answer_words", "Words per graded answer",
+                                 buckets=(50, 100, 250, 500, 1000, 2500, 5000, 10000))
+score_parses = metrics.counter("grading_score_parse_total",
+                               "Score extractions by outcome (structured, embedded or failed)", ("outcome",))
+peers_compared = metrics.histogram("grading_peers_compared", "Peer answers scored per plagiarism check",
+                                   buckets=(0, 10, 100, 1000, 10000, 100000))
+
+# Directories for storing assignment data (created on first write)
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
-    
 PEER_ANSWERS_DIR = os.path.join(DATA_DIR, "peer_answers")
-if not os.path.exists(PEER_ANSWERS_DIR):
-    os.makedirs(PEER_ANSWERS_DIR)
-    
 MODEL_ANSWERS_DIR = os.path.join(DATA_DIR, "model_answers")
-if not os.path.exists(MODEL_ANSWERS_DIR):
-    os.makedirs(MODEL_ANSWERS_DIR)
-    
 RUBRICS_DIR = os.path.join(DATA_DIR, "rubrics")
-if not os.path.exists(RUBRICS_DIR):
-    os.makedirs(RUBRICS_DIR)
-
-# Load the plagiarism detection model and vectorizer
-try:
-    plagiarism_model = pickle.load(open('model.pkl', 'rb'))
-    tfidf_vectorizer = pickle.load(open('tfidf_vectorizer.pkl', 'rb'))
-    print("Plagiarism detection models loaded successfully.")
-except FileNotFoundError:
-    print("Error: Plagiarism detection model or vectorizer file not found.")
-    plagiarism_model = None
-    tfidf_vectorizer = None
+
+# Model answers and rubrics depend only on the question, so identical prompts share one response
+LLM_CACHE_DIR = os.path.join(DATA_DIR, "llm_cache")
+cached_model = CachedModel(model, MODEL_NAME, get_cache(LLM_CACHE_DIR, ttl=GRADING_LLM_CACHE_TTL))
+
+# Precomputed TF-IDF vectors of peer answers, one index file per assignment
+PEER_INDEX_DIR = os.path.join(DATA_DIR, "peer_index")
+peer_index_store = PeerIndexStore(PEER_INDEX_DIR)
+
+# Concurrent first submissions share one model answer/rubric generation per
+# assignment; lock files coordinate the generation across worker processes
+LOCKS_DIR = os.path.join(DATA_DIR, "locks")
+generation_flight = SingleFlight(LOCKS_DIR)
+
+# "structured": Gemini returns a schema-constrained JSON envelope (feedback + scores);
+# "text": free-form feedback ending in a JSON score object
+GRADING_OUTPUT_MODE = os.getenv("GRADING_OUTPUT_MODE", "structured")
+
+# Batch evaluation: concurrent Gemini grading calls per request, and the largest accepted batch
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+BATCH_MAX_SUBMISSIONS = int(os.getenv("BATCH_MAX_SUBMISSIONS", "500"))
+
+# MinHash/LSH candidate lookup for assignments with many submissions.
+# Pairs above a Jaccard similarity of roughly (1/LSH_BANDS)**(1/LSH_ROWS) (0.125
+# by default, well below the 30% plagiarism threshold) are scored exactly;
+# below LSH_MIN_PEERS every peer is scored exactly.
+LSH_BANDS = int(os.getenv("LSH_BANDS", "64"))
+LSH_ROWS = int(os.getenv("LSH_ROWS", "2"))
+LSH_NUM_PERM = max(128, LSH_BANDS * LSH_ROWS)
+LSH_SHINGLE_SIZE = 3
+LSH_MIN_PEERS = int(os.getenv("LSH_MIN_PEERS", "2000"))
+minhasher = MinHasher(LSH_NUM_PERM)
+
+# Copied passages are located with winnowing fingerprints over WINNOW_K-word k-grams
+# (after stop-word removal); any passage of WINNOW_K + WINNOW_WINDOW - 1 words is found
+WINNOW_K = int(os.getenv("WINNOW_K", "5"))
+WINNOW_WINDOW = int(os.getenv("WINNOW_WINDOW", "4"))
+
+# Preprocessed texts and sentence splits, and whole answer analyses, memoized
+# by content hash so an answer is tokenized and vectorized once
+PREPROCESS_CACHE_SIZE = int(os.getenv("PREPROCESS_CACHE_SIZE", "65536"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+answer_cache = MemoCache(ANSWER_CACHE_SIZE)
+
+# Everything plagiarism checks need from one answer, computed in a single pass
+AnswerVectors = namedtuple(
+    "AnswerVectors", ["raw", "doc", "fingerprints", "signature"]
+)
+
+PLAGIARISM_MODEL_FILE = os.getenv("PLAGIARISM_MODEL_FILE", "model.pkl")
+VECTORIZER_FILE = os.getenv("VECTORIZER_FILE", "tfidf_vectorizer.pkl")
+
+def load_plagiarism_models():
+    """Unpickle the plagiarism detection model and vectorizer; (None, None) if missing"""
+    try:
+        with open(PLAGIARISM_MODEL_FILE, 'rb') as file:
+            plagiarism_model = pickle.load(file)
+        with open(VECTORIZER_FILE, 'rb') as file:
+            tfidf_vectorizer = pickle.load(file)
+        print("Plagiarism detection models loaded successfully.")
+        return plagiarism_model, tfidf_vectorizer
+    except FileNotFoundError:
+        print("Error: Plagiarism detection model or vectorizer file not found.")
+        return None, None
+
+plagiarism_models = Resource("plagiarism models", load_plagiarism_models)
+
+def load_text_preprocessor():
+    """Build the memoizing preprocessor from the stop words and sentence tokenizer"""
+    return TextPreprocessor(stop_words.get(), sentence_tokenizer.get(), PREPROCESS_CACHE_SIZE)
+
+text_preprocessor = Resource("text preprocessor", load_text_preprocessor)
+
+# Loaded in the background when the server starts, so the first request does not wait for them
+PREWARM_RESOURCES = [plagiarism_models, text_preprocessor, gemini_client]
+
+def write_json_atomic(path, data):
+    """Write JSON through a temporary file so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
 
 def save_assignment_data(assignment_id, data_type, content):
     """Save assignment-related data to file system for future reference"""
@@ -71,8 +182,7 @@ def save_assignment_data(assignment_id, data_type, content):
     filename = os.path.join(directory, f"{assignment_id}_{data_type}.json")
     
     # Save the data
-    with open(filename, 'w') as file:
-        json.dump({"content": content}, file)
+    write_json_atomic(filename, {"content": content})
         
     return filename
 
@@ -87,7 +197,6 @@ def load_assignment_data(assignment_id, data_type):
         # For peer answers, we need to load all files with the assignment ID
         peer_answers = []
         pattern = f"{assignment_id}_peer_answer_*.json"
-        import glob
         files = glob.glob(os.path.join(directory, pattern))
         for file_path in files:
             try:
@@ -115,13 +224,92 @@ def load_assignment_data(assignment_id, data_type):
 
 def preprocess_text(text):
     """Preprocesses text by removing punctuation, converting to lowercase, and removing stop words."""
-    if not text:
-        return ""
-    text = text.translate(str.maketrans("", "", string.punctuation))
-    text = text.lower()
-    stop_words = set(stopwords.words("english"))
-    text = " ".join(word for word in text.split() if word not in stop_words)
-    return text
+    return text_preprocessor.get().normalize(text)
+
+def analyze_answer(text):
+    """Vectorize and fingerprint an answer for peer comparison (memoized per vectorizer)"""
+    return answer_cache.get_or_compute(
+        (peer_index_fingerprint(), content_key(text)),
+        lambda: vectorize_answer(text)
+    )
+
+def vectorize_answer(text):
+    """Uncached analyze_answer"""
+    plagiarism_model, tfidf_vectorizer = plagiarism_models.get()
+    preprocessor = text_preprocessor.get()
+    processed_text = preprocessor.normalize(text)
+    raw = tfidf_vectorizer.transform([processed_text])
+    from sklearn.preprocessing import normalize  # Loaded with the vectorizer's own sklearn imports
+    return AnswerVectors(
+        raw=raw,
+        doc=normalize(raw),
+        fingerprints=fingerprint_document(preprocessor.tokens(text), WINNOW_K, WINNOW_WINDOW),
+        signature=minhasher.signature(shingles(processed_text, LSH_SHINGLE_SIZE))
+    )
+
+def peer_index_fingerprint():
+    """Identifies the vectorizer, MinHash and winnowing settings a peer index was built with"""
+    tfidf_vectorizer = plagiarism_models.get()[1]
+    return (f"{vectorizer_fingerprint(tfidf_vectorizer)}:{LSH_NUM_PERM}:{LSH_SHINGLE_SIZE}"
+            f":{WINNOW_K}:{WINNOW_WINDOW}")
+
+def rebuild_peer_index(assignment_id):
+    """Build an assignment's peer index from its saved peer answer files"""
+    tfidf_vectorizer = plagiarism_models.get()[1]
+    index = PeerIndex(peer_index_fingerprint(), len(tfidf_vectorizer.vocabulary_), LSH_NUM_PERM)
+    prefix = f"{assignment_id}_peer_answer_"
+    files = glob.glob(os.path.join(PEER_ANSWERS_DIR, f"{prefix}*.json"))
+    entries = []
+    for file_path in sorted(files, key=os.path.getmtime):
+        try:
+            with open(file_path, 'r') as file:
+                content = json.load(file)["content"]
+        except Exception as e:
+            print(f"Error loading peer answer from {file_path}: {str(e)}")
+            continue
+        peer_key = os.path.basename(file_path)[len(prefix):-len(".json")]
+        answer = analyze_answer(content)
+        entries.append((peer_key, answer.doc, answer.fingerprints, answer.signature))
+    index.add_many(entries)
+    return index
+
+def get_peer_index(assignment_id):
+    """Load the peer index for an assignment (None if there are no peers yet)"""
+    return peer_index_store.get(
+        assignment_id,
+        peer_index_fingerprint(),
+        lambda: rebuild_peer_index(assignment_id)
+    )
+
+def add_to_peer_index(assignment_id, peer_key, text):
+    """Append one submission to the assignment's peer index"""
+    if plagiarism_models.get()[1] is None:
+        return
+    answer = analyze_answer(text)
+    peer_index_store.add(
+        assignment_id,
+        peer_index_fingerprint(),
+        lambda: rebuild_peer_index(assignment_id),
+        peer_key,
+        answer.doc,
+        answer.fingerprints,
+        answer.signature
+    )
+
+def add_many_to_peer_index(assignment_id, peers):
+    """Append (peer_key, text) submissions to the assignment's peer index in one update"""
+    if plagiarism_models.get()[1] is None:
+        return
+    entries = []
+    for peer_key, text in peers:
+        answer = analyze_answer(text)
+        entries.append((peer_key, answer.doc, answer.fingerprints, answer.signature))
+    peer_index_store.add_many(
+        assignment_id,
+        peer_index_fingerprint(),
+        lambda: rebuild_peer_index(assignment_id),
+        entries
+    )
 
 def detect_plagiarism_with_peers(input_text, assignment_id=None, student_id=None):
     """
@@ -143,7 +331,8 @@ def detect_plagiarism_with_peers(input_text, assignment_id=None, student_id=None
             "plagiarized_parts": [],
             "message": "No text provided for plagiarism check."
         }
-        
+    
+    plagiarism_model, tfidf_vectorizer = plagiarism_models.get()
     if plagiarism_model is None or tfidf_vectorizer is None:
         return {
             "is_plagiarized": False,
@@ -152,81 +341,102 @@ def detect_plagiarism_with_peers(input_text, assignment_id=None, student_id=None
             "message": "Plagiarism check not available due to missing models."
         }
     
+    with stages.stage("plagiarism_score"):
+        return score_plagiarism(plagiarism_model, input_text, assignment_id, student_id)
+
+def score_plagiarism(plagiarism_model, input_text, assignment_id, student_id):
+    """Model score and peer comparison for one answer"""
     # Basic model-based plagiarism detection
-    processed_text = preprocess_text(input_text)
-    vectorized_text = tfidf_vectorizer.transform([processed_text])
+    answer = analyze_answer(input_text)
+    vectorized_text = answer.raw
     model_result = plagiarism_model.predict(vectorized_text)
     model_probability = plagiarism_model.predict_proba(vectorized_text)
     
     # Calculate plagiarism score (percentage) from the model
     model_plagiarism_score = round(model_probability[0][1] * 100, 2)
     
-    # Load peer answers for this assignment
-    peer_answers = []
-    if assignment_id:
-        peer_answers = load_assignment_data(assignment_id, "peer_answers")
+    # Load the precomputed peer vectors for this assignment
+    with stages.stage("peer_load"):
+        index = get_peer_index(assignment_id) if assignment_id else None
     
     # Find plagiarized parts by comparing with peer answers
     plagiarized_parts = []
     max_similarity = 0
     most_similar_peer = None
     
-    if peer_answers and isinstance(peer_answers, list) and len(peer_answers) > 0:
-        # Calculate sentence level similarities
-        sentences = nltk.sent_tokenize(input_text)
-        input_sentences_processed = [preprocess_text(s) for s in sentences]
+    if index is not None and index.peer_count > 0:
+        # Skip comparison with own submission if student_id is provided
+        allowed = np.ones(index.peer_count, dtype=bool)
+        allowed[excluded_peer_positions(index, student_id)] = False
         
-        for peer_idx, peer_answer in enumerate(peer_answers):
-            # Skip comparison with own submission if student_id is provided
-            peer_id = f"peer_{peer_idx+1}"
-            if peer_id == student_id:
-                continue
-                
-            peer_sentences = nltk.sent_tokenize(peer_answer)
-            peer_sentences_processed = [preprocess_text(s) for s in peer_sentences]
+        # Find copied passages: the fingerprint lookup costs the same however many peers there are
+        matches = index.fingerprints.match(answer.fingerprints, allowed, WINNOW_K)
+        plagiarized_parts = copied_parts(input_text, matches)
+        
+        # Large assignments only score the LSH candidates (and peers sharing a passage)
+        # exactly; small ones score every peer
+        if index.peer_count >= LSH_MIN_PEERS:
+            positions = np.union1d(index.candidate_positions(answer.signature, LSH_BANDS, LSH_ROWS),
+                                   np.array([match.owner for match in matches], dtype=np.int64))
+            positions = positions[allowed[positions]]
+        else:
+            positions = np.flatnonzero(allowed)
+        peers_compared.observe(len(positions))
+        
+        if len(positions):
+            full = len(positions) == index.peer_count
             
             # Calculate document similarity
-            input_vec = tfidf_vectorizer.transform([processed_text])
-            peer_vec = tfidf_vectorizer.transform([preprocess_text(peer_answer)])
-            similarity = cosine_similarity(input_vec, peer_vec)[0][0]
-            
-            if similarity > max_similarity:
-                max_similarity = similarity
-                most_similar_peer = peer_id
-            
-            # Find similar sentences
-            for i, input_sent in enumerate(input_sentences_processed):
-                if len(input_sent.split()) < 5:  # Skip very short sentences
-                    continue
-                    
-                for j, peer_sent in enumerate(peer_sentences_processed):
-                    # Calculate similarity between sentences
-                    if len(peer_sent.split()) < 5:
-                        continue
-                        
-                    sent_vec1 = tfidf_vectorizer.transform([input_sent])
-                    sent_vec2 = tfidf_vectorizer.transform([peer_sent])
-                    sent_similarity = cosine_similarity(sent_vec1, sent_vec2)[0][0]
-                    
-                    # If high similarity, mark as potentially plagiarized
-                    if sent_similarity > 0.8:  # Threshold for sentence similarity
-                        plagiarized_parts.append({
-                            "text": sentences[i],
-                            "index": i,
-                            "similarity": float(sent_similarity),
-                            "source": f"peer_{peer_idx+1}"
-                        })
-    
-    # Calculate final plagiarism score
-    # Combine model score with peer comparison
+            doc_vectors = index.doc_vectors if full else index.doc_vectors[positions]
+            doc_similarities = (doc_vectors @ answer.doc.T).toarray().ravel()
+            best = int(np.argmax(doc_similarities))
+            if doc_similarities[best] > 0:
+                max_similarity = doc_similarities[best]
+                most_similar_peer = PeerIndex.peer_label(positions[best])
+    
+    return plagiarism_summary(model_plagiarism_score, max_similarity, most_similar_peer, plagiarized_parts)
+
+def copied_parts(input_text, matches):
+    """Plagiarized parts for passages found in peer answers, with their character spans in both texts.
+
+    Each part also keeps the fields of the earlier sentence-level report: `index`, the
+    input sentence the passage starts in, and `similarity`, 1.0 for a verbatim copy.
+    """
+    if not matches:
+        return []
+    # Start offset of each input sentence, to report the sentence a passage starts in
+    sentence_starts = []
+    position = 0
+    for sentence in text_preprocessor.get().sentences(input_text):
+        found = input_text.find(sentence, position)
+        if found >= 0:
+            position = found
+        sentence_starts.append(position)
+
+    plagiarized_parts = []
+    # Matches come in peer, input position order
+    for match in matches:
+        plagiarized_parts.append({
+            "text": input_text[match.start:match.end],
+            "index": max(0, bisect.bisect_right(sentence_starts, match.start) - 1),
+            "similarity": 1.0,
+            "source": PeerIndex.peer_label(match.owner),
+            "start": match.start,
+            "end": match.end,
+            "source_start": match.source_start,
+            "source_end": match.source_end
+        })
+    return plagiarized_parts
+
+def plagiarism_summary(model_plagiarism_score, max_similarity, most_similar_peer, plagiarized_parts):
+    """Combine the model score with the peer comparison into the reported result"""
     peer_plagiarism_score = max_similarity * 100 if max_similarity > 0 else 0
     final_plagiarism_score = max(model_plagiarism_score, peer_plagiarism_score)
     
     # Determine if plagiarized based on score threshold
-    is_plagiarized = final_plagiarism_score > 30 or len(plagiarized_parts) > 0
+    is_plagiarized = bool(final_plagiarism_score > 30 or len(plagiarized_parts) > 0)
     
-    # Construct response
-    result_dict = {
+    return {
         "is_plagiarized": is_plagiarized,
         "plagiarism_score": round(final_plagiarism_score, 2),
         "plagiarized_parts": plagiarized_parts,
@@ -235,8 +445,95 @@ def detect_plagiarism_with_peers(input_text, assignment_id=None, student_id=None
         "peer_plagiarism_score": round(peer_plagiarism_score, 2),
         "message": "Plagiarism Detected" if is_plagiarized else "No Plagiarism Detected"
     }
+
+def excluded_peer_positions(index, student_id):
+    """Positions of a student's own earlier submission, which is never compared against"""
+    excluded = []
+    if student_id and index is not None:
+        position = index.position(student_id)
+        if position is not None:
+            excluded.append(position)
+        label_match = re.fullmatch(r"peer_(\d+)", student_id)
+        if label_match and 0 < int(label_match.group(1)) <= index.peer_count:
+            excluded.append(int(label_match.group(1)) - 1)
+    return excluded
+
+def detect_plagiarism_batch(input_texts, assignment_id=None, student_ids=None):
+    """
+    Detects plagiarism for many answers to one assignment in one matrix pass.
+    
+    Each answer is compared with the assignment's past peers and with the
+    other answers in the batch. Batch answers are reported under the peer
+    labels they get once appended to the index (after the current peers).
+    
+    Returns:
+        list: One plagiarism result dict per input text, as from detect_plagiarism_with_peers
+    """
+    student_ids = list(student_ids) if student_ids else [None] * len(input_texts)
+    plagiarism_model, tfidf_vectorizer = plagiarism_models.get()
+    if plagiarism_model is None or tfidf_vectorizer is None:
+        return [detect_plagiarism_with_peers(text) for text in input_texts]
+    
+    results = [None] * len(input_texts)
+    live = []
+    for i, text in enumerate(input_texts):
+        if text:
+            live.append(i)
+        else:
+            results[i] = detect_plagiarism_with_peers(text)
+    if not live:
+        return results
+    
+    answers = [analyze_answer(input_texts[i]) for i in live]
+    model_probabilities = plagiarism_model.predict_proba(sp.vstack([answer.raw for answer in answers]))
     
-    return result_dict
+    # Columns are the current peers followed by the batch itself
+    with stages.stage("peer_load"):
+        index = get_peer_index(assignment_id) if assignment_id else None
+    past = index.peer_count if index is not None else 0
+    docs = sp.vstack(([index.doc_vectors] if past else []) + [answer.doc for answer in answers], format="csr")
+    fingerprints = index.fingerprints.copy() if past else FingerprintIndex()
+    fingerprints.add_many(answer.fingerprints for answer in answers)
+    
+    doc_similarities = (docs[past:] @ docs.T).tocsr()
+    use_lsh = past > 0 and past >= LSH_MIN_PEERS
+    
+    for k, (i, answer) in enumerate(zip(live, answers)):
+        # Peers this answer may be compared with
+        allowed = np.ones(docs.shape[0], dtype=bool)
+        allowed[excluded_peer_positions(index, student_ids[i])] = False
+        allowed[past + k] = False
+        if student_ids[i]:
+            for m, j in enumerate(live):
+                if student_ids[j] == student_ids[i]:
+                    allowed[past + m] = False
+        
+        matches = fingerprints.match(answer.fingerprints, allowed, WINNOW_K)
+        plagiarized_parts = copied_parts(input_texts[i], matches)
+        
+        # Past peers scored exactly: LSH candidates and peers sharing a passage on large assignments
+        scored = allowed
+        if use_lsh:
+            scored = np.zeros_like(allowed)
+            scored[past:] = allowed[past:]
+            scored[index.candidate_positions(answer.signature, LSH_BANDS, LSH_ROWS)] = True
+            scored[[match.owner for match in matches]] = True
+            scored &= allowed
+        
+        max_similarity = 0
+        most_similar_peer = None
+        row = doc_similarities[k].toarray().ravel()
+        row[~scored] = 0
+        if scored.any():
+            best = int(np.argmax(np.where(scored, row, -1)))
+            if row[best] > 0:
+                max_similarity = row[best]
+                most_similar_peer = PeerIndex.peer_label(best)
+        
+        model_plagiarism_score = round(model_probabilities[k][1] * 100, 2)
+        results[i] = plagiarism_summary(model_plagiarism_score, max_similarity, most_similar_peer, plagiarized_parts)
+    
+    return results
 
 def generate_model_answer(assignment_text, total_marks=None):
     """Generates a model answer using Gemini."""
@@ -252,19 +549,18 @@ def generate_model_answer(assignment_text, total_marks=None):
     
     prompt += "Please provide a detailed model answer that demonstrates mastery of the subject matter."
     
-    chat_session = model.start_chat(history=[])
-    
-    generation_config = GenerationConfig(
-        temperature=0.2,
-        top_p=0.8,
-        top_k=40
-    )
+    generation_config = {
+        "temperature": 0.2,
+        "top_p": 0.8,
+        "top_k": 40
+    }
     
     try:
-        response = chat_session.send_message(prompt, generation_config=generation_config)
+        response = cached_model.generate_content(prompt, generation_config=generation_config, cache=True)
         return response.text
     except Exception as e:
         print(f"Error generating model answer: {str(e)}")
+        stages.error("model_answer_generate")
         return None
 
 def generate_rubric(assignment_text, total_marks=None):
@@ -286,23 +582,48 @@ def generate_rubric(assignment_text, total_marks=None):
         "Make sure the rubric is comprehensive and aligned with academic standards."
     )
     
-    chat_session = model.start_chat(history=[])
-    
-    generation_config = GenerationConfig(
-        temperature=0.2,
-        top_p=0.8,
-        top_k=40
-    )
+    generation_config = {
+        "temperature": 0.2,
+        "top_p": 0.8,
+        "top_k": 40
+    }
     
     try:
-        response = chat_session.send_message(prompt, generation_config=generation_config)
+        response = cached_model.generate_content(prompt, generation_config=generation_config, cache=True)
         return response.text
     except Exception as e:
         print(f"Error generating rubric: {str(e)}")
+        stages.error("rubric_generate")
         return None
 
-def generate_prompt(assignment_text, student_answer_text, model_answer_text, rubric_text, total_marks):
-    """Generates an improved prompt for the Gemini model."""
+STRUCTURED_OUTPUT_INSTRUCTIONS = (
+    "Please respond with a single JSON object with these fields:\n"
+    "   - 'feedback': your full evaluation for the student, in Markdown, with these sections:\n"
+    "     'Overall Assessment' (a brief 2-3 sentence summary of the submission), "
+    "'Strengths' (2-3 specific strengths of the student's work), "
+    "'Areas for Improvement' (2-3 specific areas where the student could improve), "
+    "'Criterion-by-Criterion Feedback' (detailed feedback on each criterion from the rubric) and "
+    "'Next Steps' (specific, actionable suggestions for how the student could improve)\n"
+    "   - 'total_score': a number representing the final score\n"
+    "   - 'max_score': the maximum possible score\n"
+    "   - 'percentage': the percentage score\n"
+    "   - 'criteria_scores': a list with one {'criterion', 'score'} object per criterion\n\n"
+)
+
+def generate_prompt(assignment_text, student_answer_text, model_answer_text, rubric_text, total_marks, structured=False):
+    """Generates an improved prompt for the Gemini model (asking for the JSON envelope when `structured`)."""
+    if structured:
+        prompt = (
+            f"You are an expert academic evaluator providing feedback to a student on their assignment submission. "
+            f"You need to evaluate the student's answer and provide constructive, encouraging feedback.\n\n"
+            f"{STRUCTURED_OUTPUT_INSTRUCTIONS}"
+            f"Assignment Question: {assignment_text}\n\n"
+            f"Student's Answer: {student_answer_text}\n\n"
+        )
+        return prompt + reference_instructions(model_answer_text, rubric_text, total_marks) + (
+            "\n\nIMPORTANT: Be encouraging and constructive in your feedback. Focus on how the student can improve rather than just what they did wrong. "
+            "Use a supportive tone throughout.")
+
     prompt = (
         f"You are an expert academic evaluator providing feedback to a student on their assignment submission. "
         f"You need to evaluate the student's answer and provide constructive, encouraging feedback. "
@@ -326,6 +647,16 @@ def generate_prompt(assignment_text, student_answer_text, model_answer_text, rub
         f"Student's Answer: {student_answer_text}\n\n"
     )
 
+    prompt += reference_instructions(model_answer_text, rubric_text, total_marks)
+
+    prompt += ("\n\nIMPORTANT: Be encouraging and constructive in your feedback. Focus on how the student can improve rather than just what they did wrong. "
+              "Use a supportive tone throughout. Remember to include the JSON object at the end of your response with the score information.")
+    
+    return prompt
+
+def reference_instructions(model_answer_text, rubric_text, total_marks):
+    """Prompt section with the marks, model answer and rubric to grade against"""
+    prompt = ""
     if total_marks is not None:
         prompt += f"Total marks available: {total_marks}\n\n"
 
@@ -338,14 +669,14 @@ def generate_prompt(assignment_text, student_answer_text, model_answer_text, rub
     else:
         prompt += ("No rubric provided. Please create and use a suitable rubric based on "
                   "the subject matter and academic level before evaluation.")
-
-    prompt += ("\n\nIMPORTANT: Be encouraging and constructive in your feedback. Focus on how the student can improve rather than just what they did wrong. "
-              "Use a supportive tone throughout. Remember to include the JSON object at the end of your response with the score information.")
-    
     return prompt
 
-def check_assignment(assignment_id, assignment_text, student_answer_text, student_id=None, model_answer_text="", rubric_text="", total_marks=None):
-    """Checks the assignment using Gemini-Pro and performs enhanced plagiarism check against peers."""
+def check_assignment(assignment_id, assignment_text, student_answer_text, student_id=None, model_answer_text="", rubric_text="", total_marks=None, raise_errors=False):
+    """Checks the assignment using Gemini-Pro and performs enhanced plagiarism check against peers.
+
+    With `raise_errors`, Gemini failures propagate (so a job can be retried) instead of
+    being reported in the feedback.
+    """
     
     if not assignment_text or not student_answer_text:
         return {
@@ -361,138 +692,395 @@ def check_assignment(assignment_id, assignment_text, student_answer_text, studen
             "plagiarism_data": None
         }
 
-    # Check if we need to generate and save a model answer
-    if not model_answer_text and assignment_id:
-        # Try to load existing model answer
-        existing_model_answer = load_assignment_data(assignment_id, "model_answer")
-        if existing_model_answer:
-            model_answer_text = existing_model_answer
-        else:
-            # Generate a new model answer
-            model_answer_text = generate_model_answer(assignment_text, total_marks)
-            if model_answer_text:
-                # Save the generated model answer
-                save_assignment_data(assignment_id, "model_answer", model_answer_text)
-    
-    # Check if we need to generate and save a rubric
-    if not rubric_text and assignment_id:
-        # Try to load existing rubric
-        existing_rubric = load_assignment_data(assignment_id, "rubric")
-        if existing_rubric:
-            rubric_text = existing_rubric
-        else:
-            # Generate a new rubric
-            rubric_text = generate_rubric(assignment_text, total_marks)
-            if rubric_text:
-                # Save the generated rubric
-                save_assignment_data(assignment_id, "rubric", rubric_text)
-
-    # Generate prompt for Gemini
-    prompt = generate_prompt(assignment_text, student_answer_text, model_answer_text, rubric_text, total_marks)
-
-    # Initialize chat session with Gemini
-    chat_session = model.start_chat(history=[])
-
-    # Set generation config with low temperature for consistent results
-    generation_config = GenerationConfig(
-        temperature=0.2,
-        top_p=0.8,
-        top_k=40,
-        frequency_penalty=0.0,
-        presence_penalty=0.0
+    model_answer_text, rubric_text = resolve_reference_texts(
+        assignment_id, assignment_text, model_answer_text, rubric_text, total_marks
     )
 
-    # Send the message with the generation config
     try:
-        response = chat_session.send_message(prompt, generation_config=generation_config)
-        feedback_text = response.text
+        feedback_text, score_data = grade_answer(
+            assignment_text, student_answer_text, model_answer_text, rubric_text, total_marks
+        )
         
-        # Extract JSON score data
-        # Look for JSON data at the end of the response
-        json_match = re.search(r'```json\s*(.*?)\s*```', feedback_text, re.DOTALL)
-        if not json_match:
-            json_match = re.search(r'{[\s\S]*"total_score"[\s\S]*}', feedback_text)
-            
-        score_data = None
-        if json_match:
-            try:
-                json_str = json_match.group(1) if '```json' in feedback_text else json_match.group(0)
-                score_data = json.loads(json_str)
-                # Remove the JSON from the feedback text
-                feedback_text = re.sub(r'```json\s*(.*?)\s*```', '', feedback_text, flags=re.DOTALL)
-                feedback_text = re.sub(r'{[\s\S]*"total_score"[\s\S]*}', '', feedback_text)
-            except json.JSONDecodeError:
-                print("Failed to parse JSON from response")
-                score_data = None
+        # Perform plagiarism check against past peer answers
+        plagiarism_data = detect_plagiarism_with_peers(student_answer_text, assignment_id, student_id)
         
         # Save student answer as peer answer for future plagiarism checks
         if assignment_id and student_answer_text:
-            peer_filename = f"{assignment_id}_peer_answer_{student_id if student_id else 'anon_' + str(int(time.time()))}.json"
-            save_path = os.path.join(PEER_ANSWERS_DIR, peer_filename)
-            with open(save_path, 'w') as file:
-                json.dump({"content": student_answer_text}, file)
-                
-        # Perform plagiarism check against peer answers
-        plagiarism_data = detect_plagiarism_with_peers(student_answer_text, assignment_id, student_id)
+            peer_key = student_id if student_id else 'anon_' + str(int(time.time()))
+            with stages.stage("peer_save"):
+                save_peer_answer(assignment_id, peer_key, student_answer_text)
+                add_to_peer_index(assignment_id, peer_key, student_answer_text)
         
-        # Add plagiarism info to feedback but not the detailed data
-        if plagiarism_data["is_plagiarized"]:
-            feedback_text += f"\n\n**Plagiarism Alert**: Approximately {plagiarism_data['plagiarism_score']}% of your submission shows signs of plagiarism. Academic integrity is important - please ensure all work is original and properly cited."
-        
-        return {
-            "feedback": feedback_text.strip(),
-            "score_data": score_data,
-            "plagiarism_data": plagiarism_data
-        }
+        return evaluation_result(feedback_text, score_data, plagiarism_data)
         
     except Exception as e:
         print(f"Error calling Gemini API: {str(e)}")
+        if raise_errors:
+            raise
         return {
             "feedback": f"Error evaluating assignment: {str(e)}",
             "score_data": None,
             "plagiarism_data": None
         }
 
+def resolve_reference_texts(assignment_id, assignment_text, model_answer_text, rubric_text, total_marks):
+    """Return the model answer and rubric to grade against, loading or generating missing ones"""
+    # Load the saved model answer, or generate it once for all concurrent requests
+    if not model_answer_text and assignment_id:
+        model_answer_text = generation_flight.do(
+            f"{assignment_id}_model_answer",
+            stages.timed("model_answer_load", lambda: load_assignment_data(assignment_id, "model_answer")),
+            stages.timed("model_answer_generate", lambda: generate_model_answer(assignment_text, total_marks)),
+            lambda text: save_assignment_data(assignment_id, "model_answer", text)
+        )
+    
+    # Same for the rubric
+    if not rubric_text and assignment_id:
+        rubric_text = generation_flight.do(
+            f"{assignment_id}_rubric",
+            stages.timed("rubric_load", lambda: load_assignment_data(assignment_id, "rubric")),
+            stages.timed("rubric_generate", lambda: generate_rubric(assignment_text, total_marks)),
+            lambda text: save_assignment_data(assignment_id, "rubric", text)
+        )
+    
+    return model_answer_text, rubric_text
+
+def grade_answer(assignment_text, student_answer_text, model_answer_text, rubric_text, total_marks):
+    """Ask Gemini to grade one answer; returns (feedback_text, score_data)"""
+    answer_words.observe(len(student_answer_text.split()))
+    
+    structured = GRADING_OUTPUT_MODE == "structured"
+    
+    # Generate prompt for Gemini
+    with stages.stage("prompt_build"):
+        prompt = generate_prompt(assignment_text, student_answer_text, model_answer_text, rubric_text, total_marks,
+                                 structured)
+
+    # Initialize chat session with Gemini
+    chat_session = model.start_chat(history=[])
+
+    # Set generation config with low temperature for consistent results
+    generation_config = {
+        "temperature": 0.2,
+        "top_p": 0.8,
+        "top_k": 40,
+        "frequency_penalty": 0.0,
+        "presence_penalty": 0.0
+    }
+    if structured:
+        generation_config = structured_generation_config(generation_config)
+
+    # Send the message with the generation config
+    with stages.stage("gemini_call"):
+        response = chat_session.send_message(prompt, generation_config=generation_config)
+        feedback_text = response.text
+    
+    with stages.stage("score_extract"):
+        feedback_text, score_data = extract_score_data(feedback_text)
+    
+    return feedback_text, score_data
+
+def extract_score_data(feedback_text):
+    """Split the score out of Gemini's feedback; returns (feedback_text, score_data)"""
+    feedback_text, score_data, outcome = parse_score(feedback_text)
+    score_parses.inc(outcome)
+    if outcome == SCORE_FAILED:
+        print("Failed to parse score data from response")
+        stages.error("score_extract")
+    return feedback_text, score_data
+
+def save_peer_answer(assignment_id, peer_key, text):
+    """Save a student answer as a peer answer file for future plagiarism checks"""
+    peer_filename = f"{assignment_id}_peer_answer_{peer_key}.json"
+    save_path = os.path.join(PEER_ANSWERS_DIR, peer_filename)
+    write_json_atomic(save_path, {"content": text})
+    return save_path
+
+def evaluation_result(feedback_text, score_data, plagiarism_data):
+    """Response for one graded answer, with a plagiarism alert appended to the feedback"""
+    # Add plagiarism info to feedback but not the detailed data
+    if plagiarism_data["is_plagiarized"]:
+        feedback_text += f"\n\n**Plagiarism Alert**: Approximately {plagiarism_data['plagiarism_score']}% of your submission shows signs of plagiarism. Academic integrity is important - please ensure all work is original and properly cited."
+    
+    return {
+        "feedback": feedback_text.strip(),
+        "score_data": score_data,
+        "plagiarism_data": plagiarism_data
+    }
+
+def check_assignment_batch(assignment_id, assignment_text, submissions, model_answer_text="", rubric_text="", total_marks=None, max_workers=None):
+    """Grades many (student_id, answer) submissions for one assignment.
+
+    The model answer and rubric are resolved once, Gemini calls run on a pool
+    of at most `max_workers` threads, and plagiarism is checked for the whole
+    batch at once while the grading calls are in flight.
+    """
+    if not assignment_text:
+        return [check_assignment(assignment_id, assignment_text, answer, student_id) for student_id, answer in submissions]
+    
+    if total_marks is not None and not str(total_marks).isdigit():
+        return [check_assignment(assignment_id, assignment_text, answer, student_id, total_marks=total_marks)
+                for student_id, answer in submissions]
+    
+    with call_priority(BATCH):
+        model_answer_text, rubric_text = resolve_reference_texts(
+            assignment_id, assignment_text, model_answer_text, rubric_text, total_marks
+        )
+    
+    results = [None] * len(submissions)
+    graded = [i for i, (_, answer) in enumerate(submissions) if answer]
+    for i, (student_id, answer) in enumerate(submissions):
+        if not answer:
+            results[i] = check_assignment(assignment_id, assignment_text, answer, student_id)
+    
+    with ThreadPoolExecutor(max_workers=max_workers or BATCH_MAX_WORKERS) as executor:
+        futures = {
+            i: executor.submit(with_priority(BATCH, grade_answer), assignment_text, submissions[i][1], model_answer_text, rubric_text, total_marks)
+            for i in graded
+        }
+        # CPU-bound plagiarism pass overlaps with the network-bound grading calls
+        with stages.stage("plagiarism_score"):
+            plagiarism_results = detect_plagiarism_batch(
+                [submissions[i][1] for i in graded], assignment_id, [submissions[i][0] for i in graded]
+            )
+        
+        peers = []
+        batch_time = int(time.time())
+        for i, plagiarism_data in zip(graded, plagiarism_results):
+            student_id, answer = submissions[i]
+            try:
+                feedback_text, score_data = futures[i].result()
+            except Exception as e:
+                print(f"Error calling Gemini API: {str(e)}")
+                results[i] = {
+                    "feedback": f"Error evaluating assignment: {str(e)}",
+                    "score_data": None,
+                    "plagiarism_data": None
+                }
+                continue
+            results[i] = evaluation_result(feedback_text, score_data, plagiarism_data)
+            if assignment_id:
+                peers.append((student_id if student_id else f"anon_{batch_time}_{i}", answer))
+    
+    # Save graded answers as peers, with a single index update for the batch
+    if peers:
+        with stages.stage("peer_save"):
+            for peer_key, answer in peers:
+                save_peer_answer(assignment_id, peer_key, answer)
+            add_many_to_peer_index(assignment_id, peers)
+    
+    return results
+
+def parse_evaluation_request(data):
+    """Arguments for check_assignment from an /api/evaluate request body.
+
+    Raises ValueError with a message for the client when the body is invalid.
+    """
+    total_marks = data.get('totalMarks')
+    if total_marks:
+        try:
+            total_marks = int(total_marks)
+        except ValueError:
+            raise ValueError("Total marks must be a number")
+    
+    assignment_id = data.get('assignmentId', '')
+    assignment_text = data.get('assignmentQuestion', '')
+    # If no assignment ID is provided, generate one based on the question
+    if not assignment_id:
+        import hashlib
+        assignment_id = hashlib.md5(assignment_text.encode()).hexdigest()[:10]
+    
+    return {
+        "assignment_id": assignment_id,
+        "assignment_text": assignment_text,
+        "student_answer_text": data.get('studentAnswer', ''),
+        "student_id": data.get('studentId', ''),
+        "model_answer_text": data.get('modelAnswer', ''),
+        "rubric_text": data.get('rubric', ''),
+        "total_marks": total_marks
+    }
+
+def parse_batch_request(data):
+    """Arguments for check_assignment_batch from an /api/evaluate/batch request body"""
+    submissions = data.get('submissions') or []
+    if not isinstance(submissions, list) or not submissions:
+        raise ValueError("Provide a non-empty list of submissions")
+    if len(submissions) > BATCH_MAX_SUBMISSIONS:
+        raise ValueError(f"At most {BATCH_MAX_SUBMISSIONS} submissions per batch")
+    
+    args = parse_evaluation_request(data)
+    return {
+        "assignment_id": args["assignment_id"],
+        "assignment_text": args["assignment_text"],
+        "submissions": [(item.get('studentId', ''), item.get('studentAnswer', '')) for item in submissions],
+        "model_answer_text": args["model_answer_text"],
+        "rubric_text": args["rubric_text"],
+        "total_marks": args["total_marks"]
+    }
+
+def batch_response(assignment_id, submissions, results):
+    """Response body for a graded batch"""
+    return {
+        "assignmentId": assignment_id,
+        "results": [dict(result, studentId=student_id) for (student_id, _), result in zip(submissions, results)]
+    }
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count every request and time it by endpoint (the route pattern, so ids don't create new series)"""
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    http_requests.inc(endpoint, request.method, str(response.status_code))
+    start = getattr(g, "request_start", None)
+    if start is not None:
+        http_latency.observe(time.perf_counter() - start, endpoint)
+    return response
+
 @app.route('/api/evaluate', methods=['POST'])
 def evaluate_assignment():
     """API endpoint to evaluate an assignment"""
     try:
-        data = request.json
+        try:
+            args = parse_evaluation_request(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        assignment_id = data.get('assignmentId', '')
-        student_id = data.get('studentId', '')
-        assignment_text = data.get('assignmentQuestion', '')
-        student_answer = data.get('studentAnswer', '')
-        model_answer = data.get('modelAnswer', '')
-        rubric = data.get('rubric', '')
-        total_marks = data.get('totalMarks')
+        result = check_assignment(**args)
         
-        if total_marks:
-            try:
-                total_marks = int(total_marks)
-            except ValueError:
-                return jsonify({"error": "Total marks must be a number"}), 400
+        return jsonify(result)
         
-        # If no assignment ID is provided, generate one based on the question
-        if not assignment_id:
-            import hashlib
-            assignment_id = hashlib.md5(assignment_text.encode()).hexdigest()[:10]
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/evaluate/batch', methods=['POST'])
+def evaluate_assignment_batch():
+    """API endpoint to evaluate many student answers to one assignment"""
+    try:
+        try:
+            args = parse_batch_request(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        result = check_assignment(
-            assignment_id,
-            assignment_text,
-            student_answer,
-            student_id,
-            model_answer,
-            rubric,
-            total_marks
-        )
+        results = check_assignment_batch(**args)
         
-        return jsonify(result)
+        return jsonify(batch_response(args["assignment_id"], args["submissions"], results))
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def run_evaluation_job(args):
+    """Job handler for a queued /api/evaluate request"""
+    with call_priority(BATCH):
+        return check_assignment(**args, raise_errors=True)
+
+def run_batch_job(args):
+    """Job handler for a queued /api/evaluate/batch request"""
+    submissions = [tuple(pair) for pair in args["submissions"]]
+    results = check_assignment_batch(**dict(args, submissions=submissions))
+    return batch_response(args["assignment_id"], submissions, results)
+
+# Queued evaluations, drained by background workers; the queue file survives restarts
+JOBS_FILE = os.path.join(DATA_DIR, "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+job_queue = JobQueue(JOBS_FILE, lease_seconds=int(os.getenv("JOB_LEASE_SECONDS", "300")))
+job_workers = JobWorkerPool(job_queue, {"evaluate": run_evaluation_job, "evaluate_batch": run_batch_job}, JOB_WORKERS)
+
+background_pid = None
+background_lock = threading.Lock()
+
+def start_background_work():
+    """Prewarm heavy resources and start the job workers (once per process).
+
+    Called by the process that serves the app, not on import: the __main__ block
+    below, or ``create_app`` in each WSGI worker. Threads do not survive a fork,
+    so every forked worker calls it itself.
+    """
+    global background_pid
+    with background_lock:
+        if background_pid == os.getpid():
+            return
+        background_pid = os.getpid()
+    prewarm(PREWARM_RESOURCES)
+    if JOB_WORKERS > 0:
+        job_workers.start()
+
+def create_app():
+    """WSGI app factory: the app, with this worker's background work started"""
+    start_background_work()
+    return app
+
+def job_response(job):
+    """Public view of a job"""
+    return {
+        "jobId": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "result": job["result"],
+        "error": job["error"] if job["status"] == FAILED else None
+    }
+
+@app.route('/api/evaluate/jobs', methods=['POST'])
+def submit_evaluation_job():
+    """API endpoint to queue an evaluation; poll /api/jobs/<job_id> for the result"""
+    try:
+        try:
+            args = parse_evaluation_request(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        job_id = job_queue.submit("evaluate", args)
+        return jsonify({"jobId": job_id, "status": QUEUED}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/evaluate/batch/jobs', methods=['POST'])
+def submit_batch_job():
+    """API endpoint to queue a batch evaluation"""
+    try:
+        try:
+            args = parse_batch_request(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        job_id = job_queue.submit("evaluate_batch", args)
+        return jsonify({"jobId": job_id, "status": QUEUED}), 202
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """API endpoint to poll a queued evaluation"""
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        return jsonify(job_response(job))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/llm/stats', methods=['GET'])
+def get_llm_stats():
+    """API endpoint exposing Gemini queue depth, throttling and cache counters"""
+    return jsonify({
+        "scheduler": scheduler.stats(),
+        "cache": cached_model.cache.stats(),
+        "generation": generation_flight.stats(),
+        "jobs": job_queue.counts()
+    })
+
+metrics.gauge("grading_jobs", "Evaluation jobs by status", ("status",),
+              lambda: {(status,): count for status, count in job_queue.counts().items()})
+metrics.gauge("grading_llm_queue_depth", "Gemini calls waiting for a scheduler slot", ("priority",),
+              lambda: {(priority,): depth for priority, depth in scheduler.stats()["queue_depth"].items()})
+metrics.gauge("grading_llm_in_flight", "Gemini calls in flight", (),
+              lambda: {(): scheduler.stats()["in_flight"]})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint: request counts, stage latency histograms and error counters"""
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
 @app.route('/api/assignments/<assignment_id>/model-answer', methods=['GET'])
 def get_model_answer(assignment_id):
     """API endpoint to retrieve a model answer for an assignment"""
@@ -518,8 +1106,8 @@ def get_rubric(assignment_id):
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
-    # Fix missing import
-    import time
-    
+    # The debug reloader serves from a child process; only that one drains the job queue
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_work()
     # Run the Flask app
     app.run(debug=True, port=5000)
\ No newline at end of file
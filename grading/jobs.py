@@ -0,0 +1,312 @@
+"""Persistent evaluation job queue backed by a local SQLite file.
+
+``JobQueue.submit`` stores a job and returns its id straight away; a
+``JobWorkerPool`` of background threads claims queued jobs, runs the handler
+for their kind and records the result. A claim is a lease that the running
+worker renews while the handler works; if the process dies mid-job the lease
+runs out and another worker (in this or a restarted process) picks the job up
+again, so every job runs at least once. A claim is identified by its attempt
+number, and a worker whose lease was taken over cannot record a result or
+failure for the newer attempt. Failed attempts are retried with exponential
+backoff up to ``max_attempts``.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    available_at REAL NOT NULL,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_available ON jobs (status, available_at);
+"""
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 2.0
+
+
+# Open queues, whose connections a forked child must not reuse
+_queues = weakref.WeakSet()
+
+
+def _after_fork():
+    for queue in list(_queues):
+        queue._lock = threading.Lock()
+        queue._db = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class JobQueue:
+    """Jobs stored in SQLite; safe to share between threads and processes"""
+
+    def __init__(self, path, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._db = None
+        _queues.add(self)
+
+    @property
+    def _conn(self):
+        """The database connection, opened on first use (caller holds the lock)"""
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Autocommit mode; claims take an explicit write lock with BEGIN IMMEDIATE
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def submit(self, kind, payload, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Queue a job and return its id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, max_attempts, created, updated, available_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), QUEUED, max_attempts, now, now, now)
+            )
+        return job_id
+
+    def claim(self):
+        """Lease the oldest runnable job, or return None if there is none.
+
+        Runnable means queued and due, or running with an expired lease (its
+        worker died). Jobs whose lease expired on their last attempt fail.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated = ?, lease_until = NULL "
+                    "WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+                    (FAILED, "Worker lease expired on the last attempt", now, RUNNING, now)
+                )
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE (status = ? AND available_at <= ?) OR (status = ? AND lease_until < ?) "
+                    "ORDER BY available_at LIMIT 1",
+                    (QUEUED, now, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated = ?, lease_until = ? WHERE id = ?",
+                    (RUNNING, now, now + self.lease_seconds, row["id"])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        job = self._to_dict(row)
+        job["status"] = RUNNING
+        job["attempts"] += 1
+        return job
+
+    def renew(self, job_id, attempt):
+        """Extend the lease of a running attempt; False if the attempt no longer owns the job"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET updated = ?, lease_until = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (now, now + self.lease_seconds, job_id, RUNNING, attempt)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, result, attempt):
+        """Record the result of a running attempt; False (and nothing recorded) if it lost the job"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, updated = ?, lease_until = NULL "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (DONE, json.dumps(result), time.time(), job_id, RUNNING, attempt)
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, error, attempt):
+        """Record a failed attempt: retry later with backoff, or fail for good after max_attempts.
+
+        Returns False (and records nothing) if the attempt no longer owns the job.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            if attempt < row["max_attempts"]:
+                delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated = ?, available_at = ?, lease_until = NULL "
+                    "WHERE id = ? AND status = ? AND attempts = ?",
+                    (QUEUED, error, now, now + delay, job_id, RUNNING, attempt)
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, updated = ?, lease_until = NULL "
+                    "WHERE id = ? AND status = ? AND attempts = ?",
+                    (FAILED, error, now, job_id, RUNNING, attempt)
+                )
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if the id is unknown"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def counts(self):
+        """Number of jobs in each status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+
+class JobWorkerPool:
+    """Background threads that drain a JobQueue with one handler per job kind"""
+
+    def __init__(self, queue, handlers, workers=2, poll_interval=0.5):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads (no-op if already running)"""
+        with self._lock:
+            # Threads do not survive a fork, so a forked server process starts its own
+            if any(thread.is_alive() for thread in self._threads):
+                return
+            self._threads = []
+            self._stop.clear()
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """Ask the workers to exit after their current job and wait for them"""
+        self._stop.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def run_one(self):
+        """Claim and run a single job; returns False if nothing was runnable"""
+        job = self.queue.claim()
+        if job is None:
+            return False
+        job_id, attempt = job["id"], job["attempts"]
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            self.queue.fail(job_id, f"No handler for job kind {job['kind']!r}", attempt)
+            return True
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job_id, attempt, finished),
+                                     name=f"job-heartbeat-{job_id[:8]}", daemon=True)
+        heartbeat.start()
+        try:
+            result = handler(job["payload"])
+        except Exception as e:
+            print(f"Error running job {job_id} (attempt {attempt}): {str(e)}")
+            recorded = self.queue.fail(job_id, str(e), attempt)
+        else:
+            recorded = self.queue.complete(job_id, result, attempt)
+        finally:
+            finished.set()
+            heartbeat.join()
+        if not recorded:
+            print(f"Job {job_id} (attempt {attempt}) lost its lease; its outcome was not recorded")
+        return True
+
+    def _heartbeat(self, job_id, attempt, finished):
+        """Renew the lease of a running job every third of the lease until it finishes"""
+        while not finished.wait(self.queue.lease_seconds / 3):
+            try:
+                if not self.queue.renew(job_id, attempt):
+                    return
+            except sqlite3.Error as e:
+                print(f"Error renewing the lease of job {job_id}: {str(e)}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                ran = self.run_one()
+            except sqlite3.Error as e:
+                print(f"Error claiming job: {str(e)}")
+                ran = False
+            if not ran:
+                self._stop.wait(self.poll_interval)
+
+
+def main():
+    """Command line entry point for inspecting the job queue"""
+    parser = argparse.ArgumentParser(description="Inspect the evaluation job queue")
+    parser.add_argument("command", choices=["counts", "show"])
+    parser.add_argument("job_id", nargs="?")
+    parser.add_argument("--file", default=os.path.join("data", "jobs.db"))
+    args = parser.parse_args()
+
+    queue = JobQueue(args.file)
+    if args.command == "counts":
+        for status, count in queue.counts().items():
+            print(f"{status}: {count}")
+    else:
+        job = queue.get(args.job_id)
+        print(json.dumps(job, indent=2) if job else f"No job {args.job_id}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
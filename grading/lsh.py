@@ -0,0 +1,83 @@
+"""MinHash signatures and banded LSH for near-duplicate peer lookup.
+
+A submission's signature is the MinHash of its word shingles. Signatures are
+split into ``bands`` bands of ``rows`` values; two submissions become
+candidates when any band matches exactly. The Jaccard similarity at which a
+pair has a 50% chance of becoming a candidate is roughly
+``(1 / bands) ** (1 / rows)``.
+"""
+
+import zlib
+
+import numpy as np
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+DEFAULT_SHINGLE_SIZE = 3
+DEFAULT_SEED = 1
+
+
+def shingles(processed_text, size=DEFAULT_SHINGLE_SIZE):
+    """Return the set of hashed word shingles of a preprocessed text"""
+    words = processed_text.split()
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Computes fixed-length MinHash signatures"""
+
+    def __init__(self, num_perm, seed=DEFAULT_SEED):
+        self.num_perm = num_perm
+        rng = np.random.RandomState(seed)
+        # Universal hashing (a * x + b) mod p, with a, b < 2^32 so products fit in 64 bits
+        self._a = rng.randint(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        """MinHash signature (uint32 array of length num_perm) of a shingle set"""
+        if not shingle_set:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        hashed = (np.outer(values, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+        return hashed.min(axis=0).astype(np.uint32)
+
+
+def estimate_threshold(bands, rows):
+    """Approximate Jaccard similarity at which pairs start becoming candidates"""
+    return (1.0 / bands) ** (1.0 / rows)
+
+
+class LSHIndex:
+    """Band buckets over the signatures of one assignment's peers"""
+
+    def __init__(self, bands, rows):
+        self.bands = bands
+        self.rows = rows
+        self.size = 0
+        self._buckets = [{} for _ in range(bands)]
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, signature):
+        """Add the next peer's signature; peers are numbered in insertion order"""
+        position = self.size
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(position)
+        self.size += 1
+
+    def add_many(self, signatures):
+        for signature in signatures:
+            self.add(signature)
+
+    def candidates(self, signature, limit=None):
+        """Sorted positions of peers sharing at least one band with `signature`"""
+        found = set()
+        for band, key in self._band_keys(signature):
+            found.update(self._buckets[band].get(key, ()))
+        if limit is not None:
+            found = {position for position in found if position < limit}
+        return np.array(sorted(found), dtype=np.int64)
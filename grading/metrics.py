@@ -0,0 +1,238 @@
+"""Request and per-stage metrics in the Prometheus text format.
+
+A ``Registry`` holds counters, histograms and callback gauges and renders
+them for a ``/metrics`` endpoint. ``StageTimer.stage(name)`` times one stage
+of grading (loading the model answer, the Gemini call, plagiarism scoring,
+...) into a latency histogram labelled by stage and counts the exceptions
+raised inside it. Stage durations are exclusive: time spent in a nested
+stage is only reported for the inner stage, so the stages of one request
+add up to its total. ``serve_metrics`` exports a registry from a process
+that has no HTTP app of its own to put ``/metrics`` on (the Streamlit app).
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def resident_memory_bytes():
+    """Resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Counter:
+    """Monotonically increasing count per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, self.labelnames, labels, value) for labels, value in values]
+
+
+class Histogram:
+    """Observations counted into cumulative `buckets`, with their sum and count"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}  # labels -> [per-bucket counts (last is +Inf), sum, count]
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._series[labelvalues] = series
+            position = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    position = i
+                    break
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items())
+        names = self.labelnames + ("le",)
+        samples = []
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", names, labels + (_format_value(bound),), cumulative))
+            samples.append((f"{self.name}_sum", self.labelnames, labels, total))
+            samples.append((f"{self.name}_count", self.labelnames, labels, count))
+        return samples
+
+
+class CallbackGauge:
+    """Current values read from `collect()` at scrape time: {labelvalues tuple: value}"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labelnames, collect):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self):
+        try:
+            values = self.collect()
+        except Exception as e:
+            print(f"Error collecting metric {self.name}: {str(e)}")
+            return []
+        return [(self.name, self.labelnames, labels, value) for labels, value in sorted(values.items())]
+
+
+class Registry:
+    """A set of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, labelnames, collect):
+        return self._add(CallbackGauge(name, help_text, labelnames, collect))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labelnames, labelvalues, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def serve_metrics(registry, host, port):
+    """Serve `registry` on http://host:port/metrics from a daemon thread; returns the server"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # One line per scrape is noise
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+class StageTimer:
+    """Exclusive latency histogram and error counter per named stage"""
+
+    def __init__(self, registry, prefix):
+        self.seconds = registry.histogram(f"{prefix}_stage_seconds", "Time spent in each stage, excluding nested stages",
+                                          ("stage",))
+        self.errors = registry.counter(f"{prefix}_stage_errors_total", "Errors per stage", ("stage",))
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the block as stage `name`; exceptions are counted and re-raised"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        frame = [time.perf_counter(), 0.0]  # start, time spent in nested stages
+        stack.append(frame)
+        try:
+            yield
+        except Exception:
+            self.errors.inc(name)
+            raise
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            if stack:
+                stack[-1][1] += elapsed
+            self.seconds.observe(max(0.0, elapsed - frame[1]), name)
+
+    def timed(self, name, fn):
+        """Wrap `fn` so each call is timed as stage `name`"""
+        def run(*args, **kwargs):
+            with self.stage(name):
+                return fn(*args, **kwargs)
+        return run
+
+    def error(self, name):
+        """Count a failure the stage handled without raising"""
+        self.errors.inc(name)
@@ -0,0 +1,407 @@
+"""Persistent, incremental TF-IDF index of peer answers per assignment.
+
+Each assignment gets one ``.npz`` file holding the L2-normalized TF-IDF
+vector of every peer answer, each peer's winnowing fingerprints (with the
+character span of every token, for locating copied passages) and each
+peer's MinHash signature for LSH candidate lookup. Plagiarism checks only
+load this file; new submissions are appended to it instead of re-analyzing
+all past answers on every request.
+
+New submissions are written as small segments appended to a log next to the
+``.npz`` file, so an append costs the same however many peers the assignment
+has. Loading merges the log into the base file; once the log holds
+``max_segments`` segments or outgrows the base file, the whole index is
+rewritten as a new base file with an empty log. Every load, append and
+rewrite holds a per-assignment lock file, so worker processes never lose
+each other's submissions.
+"""
+
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import uuid
+from collections import namedtuple
+
+import numpy as np
+import scipy.sparse as sp
+
+from grading.lsh import LSHIndex
+from file_locks import file_lock
+from grading.winnowing import FingerprintIndex
+
+INDEX_VERSION = 4
+
+# Each log segment is an .npz archive preceded by its length
+_SEGMENT_HEADER = struct.Struct("<Q")
+
+_fingerprints = {}
+
+
+def vectorizer_fingerprint(vectorizer):
+    """Identify a fitted TF-IDF vectorizer so stale indexes can be rebuilt"""
+    cached = _fingerprints.get(id(vectorizer))
+    if cached is not None and cached[0] is vectorizer:
+        return cached[1]
+    digest = hashlib.sha1()
+    digest.update(str(len(vectorizer.vocabulary_)).encode())
+    digest.update(np.ascontiguousarray(vectorizer.idf_).tobytes())
+    _fingerprints[id(vectorizer)] = (vectorizer, digest.hexdigest())
+    return digest.hexdigest()
+
+
+class PeerIndex:
+    """Document vectors and fingerprints of all peer answers for one assignment"""
+
+    def __init__(self, fingerprint, n_features, num_perm):
+        self.fingerprint = fingerprint
+        self.peer_keys = []
+        self._positions = {}  # peer key -> position in peer_keys
+        self.log_id = None  # Names the log that holds appends made after the last save
+        self.doc_vectors = sp.csr_matrix((0, n_features), dtype=np.float64)
+        self.fingerprints = FingerprintIndex()
+        self.signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self._lsh = None
+
+    @property
+    def peer_count(self):
+        return len(self.peer_keys)
+
+    def copy(self):
+        """Shallow copy; matrices are never modified in place, so readers can keep using the original"""
+        index = PeerIndex(self.fingerprint, self.doc_vectors.shape[1], self.signatures.shape[1])
+        index.peer_keys = list(self.peer_keys)
+        index._positions = dict(self._positions)
+        index.log_id = self.log_id
+        index.doc_vectors = self.doc_vectors
+        index.fingerprints = self.fingerprints.copy()
+        index.signatures = self.signatures
+        # The LSH buckets are shared and only ever appended to; readers of the
+        # old snapshot ignore positions beyond their own peer_count
+        index._lsh = self._lsh
+        return index
+
+    def position(self, peer_key):
+        """Position of a peer, or None if it is not in the index"""
+        return self._positions.get(peer_key)
+
+    @staticmethod
+    def peer_label(position):
+        """Label reported for the peer at `position` (e.g. "peer_3")"""
+        return f"peer_{position + 1}"
+
+    def add(self, peer_key, doc_vector, fingerprints, signature):
+        """Add (or replace) one peer's normalized vector, fingerprints and MinHash signature"""
+        self.add_many([(peer_key, doc_vector, fingerprints, signature)])
+
+    def add_many(self, entries):
+        """Add (or replace) peers given as (key, doc_vector, fingerprints, signature)"""
+        latest = {}
+        for entry in entries:
+            latest[entry[0]] = entry  # The last submission of a key wins
+        entries = list(latest.values())
+        for peer_key in latest:
+            if peer_key in self._positions:
+                self.remove(peer_key)
+        count = self.peer_count
+        docs = [self.doc_vectors]
+        signatures = [self.signatures]
+        for peer_key, doc_vector, _, signature in entries:
+            self._positions[peer_key] = len(self.peer_keys)
+            self.peer_keys.append(peer_key)
+            docs.append(doc_vector)
+            signatures.append(signature.reshape(1, -1))
+        # Stack once so bulk loads stay linear in the number of peers
+        self.doc_vectors = sp.vstack(docs, format="csr")
+        self.fingerprints.add_many(entry[2] for entry in entries)
+        self.signatures = np.vstack(signatures)
+        if self._lsh is not None:
+            if self._lsh.size == count:
+                self._lsh.add_many(self.signatures[count:])
+            else:
+                self._lsh = None  # Another copy already appended its own peers to the shared buckets
+
+    def remove(self, peer_key):
+        """Drop a peer (used when a student resubmits)"""
+        position = self._positions[peer_key]
+        del self.peer_keys[position]
+        self._positions = {key: n for n, key in enumerate(self.peer_keys)}
+        keep_docs = np.arange(self.doc_vectors.shape[0]) != position
+        self.doc_vectors = self.doc_vectors[keep_docs]
+        self.fingerprints.remove(position)
+        self.signatures = np.delete(self.signatures, position, axis=0)
+        # Positions shifted, so the buckets are rebuilt on next use
+        self._lsh = None
+
+    def reuse_lsh(self, previous):
+        """Take over the LSH buckets of an earlier snapshot whose peers this index starts with"""
+        lsh = previous._lsh
+        if lsh is None or self._lsh is not None or lsh.size != previous.peer_count or lsh.size > self.peer_count:
+            return
+        if (self.peer_keys[:lsh.size] == previous.peer_keys
+                and np.array_equal(self.signatures[:lsh.size], previous.signatures)):
+            lsh.add_many(self.signatures[lsh.size:])
+            self._lsh = lsh
+
+    def lsh(self, bands, rows):
+        """LSH buckets over the peer signatures, built on first use"""
+        lsh = self._lsh
+        if lsh is None or lsh.bands != bands or lsh.rows != rows:
+            if bands * rows > self.signatures.shape[1]:
+                raise ValueError(f"LSH needs {bands * rows} hash values, signatures have {self.signatures.shape[1]}")
+            lsh = LSHIndex(bands, rows)
+            lsh.add_many(self.signatures)
+            self._lsh = lsh
+        return lsh
+
+    def candidate_positions(self, signature, bands, rows):
+        """Peers whose signature shares an LSH band with `signature`"""
+        return self.lsh(bands, rows).candidates(signature, limit=self.peer_count)
+
+    def entries(self):
+        """The peers as (key, doc_vector, fingerprints, signature), in position order"""
+        for position, peer_key in enumerate(self.peer_keys):
+            yield (peer_key, self.doc_vectors[position], self.fingerprints.document(position),
+                   self.signatures[position])
+
+    def _to_bytes(self):
+        arrays = {"signatures": self.signatures}
+        matrix = self.doc_vectors
+        arrays["doc_vectors_data"] = matrix.data
+        arrays["doc_vectors_indices"] = matrix.indices
+        arrays["doc_vectors_indptr"] = matrix.indptr
+        arrays["doc_vectors_shape"] = np.asarray(matrix.shape)
+        for name in FingerprintIndex.ARRAYS:
+            arrays[f"fingerprints_{name}"] = getattr(self.fingerprints, name)
+        meta = {"version": INDEX_VERSION, "fingerprint": self.fingerprint, "peer_keys": self.peer_keys,
+                "log_id": self.log_id}
+        arrays["meta"] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    @classmethod
+    def _from_file(cls, f, source):
+        with np.load(f) as arrays:
+            meta = json.loads(arrays["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != INDEX_VERSION:
+                raise ValueError(f"Unsupported peer index version in {source}")
+            shape = tuple(arrays["doc_vectors_shape"])
+            index = cls(meta["fingerprint"], shape[1], arrays["signatures"].shape[1])
+            index.peer_keys = list(meta["peer_keys"])
+            index._positions = {key: n for n, key in enumerate(index.peer_keys)}
+            index.log_id = meta["log_id"]
+            index.doc_vectors = sp.csr_matrix(
+                (arrays["doc_vectors_data"], arrays["doc_vectors_indices"], arrays["doc_vectors_indptr"]), shape=shape)
+            for name in FingerprintIndex.ARRAYS:
+                setattr(index.fingerprints, name, arrays[f"fingerprints_{name}"])
+            index.signatures = arrays["signatures"]
+        return index
+
+    def save(self, path):
+        """Atomically write the index to `path`; later appends go to a new, empty log"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.log_id = uuid.uuid4().hex[:16]
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self._to_bytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read an index written by `save` (without its log)"""
+        with open(path, "rb") as f:
+            return cls._from_file(f, path)
+
+    def segment(self, entries):
+        """Serialized log segment holding peers given as (key, doc_vector, fingerprints, signature)"""
+        entries = list(entries)
+        delta = PeerIndex(self.fingerprint, self.doc_vectors.shape[1], self.signatures.shape[1])
+        delta.add_many(entries)
+        payload = delta._to_bytes()
+        return _SEGMENT_HEADER.pack(len(payload)) + payload
+
+
+def read_segments(path, offset):
+    """Complete segments in the log at `path` from byte `offset`: (indexes, offset after the last one).
+
+    A segment cut short by a crash ends the log.
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], offset
+    segments = []
+    position = 0
+    while position + _SEGMENT_HEADER.size <= len(data):
+        (length,) = _SEGMENT_HEADER.unpack_from(data, position)
+        end = position + _SEGMENT_HEADER.size + length
+        if end > len(data):
+            break
+        try:
+            segments.append(PeerIndex._from_file(io.BytesIO(data[position + _SEGMENT_HEADER.size:end]), path))
+        except Exception as e:
+            print(f"Ignoring damaged peer index segment in {path}: {str(e)}")
+            break
+        position = end
+    return segments, offset + position
+
+
+# An index as last read from disk: the base file's identity, and how much of its log was merged
+_Snapshot = namedtuple("_Snapshot", ["base", "offset", "segments", "index"])
+
+
+class PeerIndexStore:
+    """Loads, caches and updates the per-assignment peer indexes in a directory"""
+
+    def __init__(self, directory, max_segments=64):
+        self.directory = directory
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._assignment_locks = {}
+        self._cache = {}
+
+    def path_for(self, assignment_id):
+        return os.path.join(self.directory, f"{assignment_id}.npz")
+
+    def log_path(self, assignment_id, log_id):
+        return os.path.join(self.directory, f"{assignment_id}.{log_id}.log")
+
+    def _assignment_lock(self, assignment_id):
+        with self._lock:
+            return self._assignment_locks.setdefault(assignment_id, threading.Lock())
+
+    def _file_lock(self, assignment_id):
+        """Lock file serializing index updates across worker processes"""
+        os.makedirs(self.directory, exist_ok=True)
+        return file_lock(os.path.join(self.directory, f"{assignment_id}.lock"))
+
+    def _identity(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _size(self, path):
+        try:
+            return os.stat(path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _is_current(self, assignment_id, snapshot):
+        """Whether neither the base file nor the log changed since `snapshot` was read"""
+        return (snapshot is not None and snapshot.base == self._identity(self.path_for(assignment_id))
+                and snapshot.offset == self._size(self.log_path(assignment_id, snapshot.index.log_id)))
+
+    def get(self, assignment_id, fingerprint, rebuild):
+        """Return the index for an assignment, or None if it has no peers.
+
+        The in-memory copy is reused while the files are unchanged, and
+        segments appended by other processes are merged into it. A missing
+        index, or one built with a different vectorizer, is rebuilt once by
+        calling ``rebuild()``, which must return a fresh PeerIndex.
+        """
+        with self._assignment_lock(assignment_id):
+            snapshot = self._cache.get(assignment_id)
+            if self._is_current(assignment_id, snapshot):
+                return snapshot.index
+            with self._file_lock(assignment_id):
+                snapshot = self._refresh(assignment_id, fingerprint, rebuild)
+            return snapshot.index if snapshot is not None else None
+
+    def _refresh(self, assignment_id, fingerprint, rebuild):
+        """Bring the cached snapshot up to date with the files; caller holds both locks"""
+        path = self.path_for(assignment_id)
+        snapshot = self._cache.get(assignment_id)
+        base = self._identity(path)
+        if snapshot is not None and snapshot.base == base:
+            # Only merge the segments appended since the snapshot was read
+            log_path = self.log_path(assignment_id, snapshot.index.log_id)
+            if self._size(log_path) == snapshot.offset:
+                return snapshot
+            if self._size(log_path) > snapshot.offset:
+                segments, offset = read_segments(log_path, snapshot.offset)
+                index = snapshot.index.copy()
+                index.add_many(entry for segment in segments for entry in segment.entries())
+                snapshot = _Snapshot(base, offset, snapshot.segments + len(segments), index)
+                self._cache[assignment_id] = snapshot
+                return snapshot
+
+        index = None
+        segments, offset = [], 0
+        if base is not None:
+            try:
+                index = PeerIndex.load(path)
+                segments, offset = read_segments(self.log_path(assignment_id, index.log_id), 0)
+                index.add_many(entry for segment in segments for entry in segment.entries())
+            except Exception as e:
+                print(f"Error loading peer index for assignment {assignment_id}: {str(e)}")
+                index = None
+        if index is not None and snapshot is not None and index.fingerprint == snapshot.index.fingerprint:
+            # Rewritten by another process: keep the LSH buckets built for the peers we already had
+            index.reuse_lsh(snapshot.index)
+        if index is None or index.fingerprint != fingerprint:
+            index = rebuild()
+            if index is None or not index.peer_count:
+                self._cache.pop(assignment_id, None)
+                return None
+            return self._save(assignment_id, index)
+
+        snapshot = _Snapshot(base, offset, len(segments), index)
+        self._cache[assignment_id] = snapshot
+        return snapshot
+
+    def _save(self, assignment_id, index):
+        """Write `index` as the new base file and drop any old logs; caller holds both locks"""
+        path = self.path_for(assignment_id)
+        index.save(path)
+        current = os.path.basename(self.log_path(assignment_id, index.log_id))
+        prefix = f"{assignment_id}."
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith(".log") and name != current:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+        snapshot = _Snapshot(self._identity(path), 0, 0, index)
+        self._cache[assignment_id] = snapshot
+        return snapshot
+
+    def add(self, assignment_id, fingerprint, rebuild, peer_key, doc_vector, fingerprints, signature):
+        """Append one peer answer to an assignment's index and persist it"""
+        return self.add_many(assignment_id, fingerprint, rebuild, [(peer_key, doc_vector, fingerprints, signature)])
+
+    def add_many(self, assignment_id, fingerprint, rebuild, entries):
+        """Append peers given as (key, doc_vector, fingerprints, signature) and persist them as one segment"""
+        entries = list(entries)
+        if not entries:
+            return self.get(assignment_id, fingerprint, rebuild)
+        with self._assignment_lock(assignment_id), self._file_lock(assignment_id):
+            # Re-read under the lock so appends from other processes are kept
+            snapshot = self._refresh(assignment_id, fingerprint, rebuild)
+            if snapshot is None:
+                _, doc_vector, _, signature = entries[0]
+                index = PeerIndex(fingerprint, doc_vector.shape[1], len(signature))
+                index.add_many(entries)
+                return self._save(assignment_id, index).index
+
+            # Copy on write so concurrent plagiarism checks keep a consistent snapshot
+            index = snapshot.index.copy()
+            index.add_many(entries)
+            segments = snapshot.segments + 1
+            if segments > self.max_segments or snapshot.offset > snapshot.base[2]:
+                return self._save(assignment_id, index).index
+
+            log_path = self.log_path(assignment_id, index.log_id)
+            with open(log_path, "ab") as f:
+                if f.tell() > snapshot.offset:
+                    f.truncate(snapshot.offset)  # Drop a segment cut short by a crash
+                f.write(index.segment(entries))
+                offset = f.tell()
+            self._cache[assignment_id] = _Snapshot(snapshot.base, offset, segments, index)
+        return index
@@ -0,0 +1,131 @@
+"""Memoized text preprocessing for plagiarism checks.
+
+``TextPreprocessor`` builds the punctuation table and stop-word set once and
+memoizes both sentence splitting and normalization by a hash of the text, so
+a peer answer is only sentence-tokenized the first time it is seen (for
+example when it is checked, and not again when it is appended to the peer
+index). ``normalize_many`` processes a list of texts or sentences in one
+call, doing the work only for the ones not cached yet. ``tokens`` yields
+the same words as ``normalize`` with their character spans in the original
+text, for locating copied passages.
+"""
+
+import hashlib
+import re
+import string
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 65536
+
+# A whitespace-separated word without the punctuation around it ("(word)," -> "word")
+_WORD = re.compile(r"[^\s{0}](?:\S*[^\s{0}])?".format(re.escape(string.punctuation)))
+
+
+def content_key(text):
+    """Short hash identifying a text by its content"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class MemoCache:
+    """Thread-safe LRU of computed values keyed by content hash"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value for `key`, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class TextPreprocessor:
+    """Sentence splitting and normalization (punctuation, case, stop words) with memoization"""
+
+    def __init__(self, stop_words, sentence_tokenizer, max_entries=DEFAULT_MAX_ENTRIES):
+        self.stop_words = frozenset(stop_words)
+        self.sentence_tokenizer = sentence_tokenizer
+        self._punctuation = str.maketrans("", "", string.punctuation)
+        self._normalized = MemoCache(max_entries)
+        self._sentences = MemoCache(max(1, max_entries // 16))
+
+    def _normalize(self, text):
+        stop_words = self.stop_words
+        words = text.translate(self._punctuation).lower().split()
+        return " ".join([word for word in words if word not in stop_words])
+
+    def normalize(self, text):
+        """Text without punctuation and stop words, lowercased"""
+        if not text:
+            return ""
+        return self._normalized.get_or_compute(content_key(text), lambda: self._normalize(text))
+
+    def normalize_many(self, texts):
+        """normalize() for a list of texts, computing each distinct uncached text once"""
+        results = [""] * len(texts)
+        pending = {}
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            key = content_key(text)
+            cached = self._normalized.get(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.setdefault(key, (text, []))[1].append(i)
+        for key, (text, positions) in pending.items():
+            normalized = self._normalize(text)
+            self._normalized.set(key, normalized)
+            for i in positions:
+                results[i] = normalized
+        return results
+
+    def tokens(self, text):
+        """The words of normalize(text) as (word, start, end), with their character spans in `text`"""
+        stop_words = self.stop_words
+        table = self._punctuation
+        tokens = []
+        for match in _WORD.finditer(text):
+            word = match.group().translate(table).lower()
+            if word not in stop_words:
+                tokens.append((word, *match.span()))
+        return tokens
+
+    def sentences(self, text):
+        """The text's sentences as a tuple, tokenized only the first time the text is seen"""
+        if not text:
+            return ()
+        return self._sentences.get_or_compute(content_key(text), lambda: tuple(self.sentence_tokenizer(text)))
+
+    def stats(self):
+        """Cache counters for monitoring"""
+        return {"normalized": self._normalized.stats(), "sentences": self._sentences.stats()}
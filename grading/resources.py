@@ -0,0 +1,151 @@
+"""Lazily loaded, shared resources for the grading service.
+
+Heavy dependencies (NLTK data, the pickled plagiarism models, the Gemini
+client) are declared once as ``Resource`` objects and only loaded on first
+use, so importing the service takes milliseconds. ``prewarm`` loads a set of
+resources on a background thread so the first request does not pay for
+them either; a request that needs a resource still loading waits for it.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Never touch the network for NLTK data (use whatever is installed, or the fallbacks)
+OFFLINE = os.getenv("GRADING_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+class Resource:
+    """A value built by `loader` on first use, once per process"""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value = None
+        self.load_seconds = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        """Return the value, loading it first if needed"""
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                self._value = self.loader()
+                self.load_seconds = time.perf_counter() - start
+                self._loaded = True
+        return self._value
+
+    def set(self, value):
+        """Replace the value (e.g. with models fitted in a benchmark)"""
+        with self._lock:
+            self._value = value
+            self._loaded = True
+
+
+class LazyProxy:
+    """Forwards attribute access to a Resource's value, loading it on first use"""
+
+    def __init__(self, resource):
+        self._resource = resource
+
+    def __getattr__(self, name):
+        return getattr(self._resource.get(), name)
+
+
+def prewarm(resources):
+    """Load `resources` on a daemon thread; returns the thread"""
+    def load_all():
+        for resource in resources:
+            try:
+                resource.get()
+            except Exception as e:
+                print(f"Error prewarming {resource.name}: {str(e)}")
+
+    thread = threading.Thread(target=load_all, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+_warned = set()
+_warned_lock = threading.Lock()
+
+
+def warn_once(message):
+    """Log `message` as a warning the first time it is seen in this process"""
+    with _warned_lock:
+        if message in _warned:
+            return
+        _warned.add(message)
+    logger.warning(message)
+
+
+def ensure_nltk_data(resource_paths, package):
+    """Whether any of the NLTK data `resource_paths` is installed, downloading `package` unless offline"""
+    import nltk
+
+    def installed():
+        for resource_path in resource_paths:
+            try:
+                nltk.data.find(resource_path)
+                return True
+            except LookupError:
+                pass
+        return False
+
+    if installed():
+        return True
+    if OFFLINE:
+        return False
+    nltk.download(package, quiet=True)
+    return installed()
+
+
+def _regex_sentences(text):
+    return [sentence for sentence in re.split(r"(?<=[.!?])\s+", text.strip()) if sentence]
+
+
+def load_sentence_tokenizer():
+    """NLTK's sent_tokenize, or a punctuation splitter when the punkt data is unavailable.
+
+    Newer NLTK releases read ``punkt_tab`` and older ones the pickled ``punkt``,
+    so either is accepted as long as the installed NLTK can use it.
+    """
+    if ensure_nltk_data(("tokenizers/punkt_tab/english/", "tokenizers/punkt"), "punkt_tab"):
+        import nltk
+
+        try:
+            nltk.sent_tokenize("Checks the data. Once per process.")
+            return nltk.sent_tokenize
+        except LookupError:
+            pass  # punkt installed, but this NLTK only reads punkt_tab
+    warn_once("NLTK punkt data not available; splitting sentences on punctuation, "
+              "so plagiarism results may differ from a server with the data installed")
+    return _regex_sentences
+
+
+def load_stop_words():
+    """English stop words from NLTK, or scikit-learn's list when the corpus is unavailable"""
+    if ensure_nltk_data(("corpora/stopwords",), "stopwords"):
+        from nltk.corpus import stopwords
+
+        return frozenset(stopwords.words("english"))
+    warn_once("NLTK stopwords not available; using scikit-learn's English stop words, "
+              "so preprocessing and plagiarism results may differ from a server with the corpus installed")
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+    return frozenset(ENGLISH_STOP_WORDS)
+
+
+sentence_tokenizer = Resource("sentence tokenizer", load_sentence_tokenizer)
+stop_words = Resource("stop words", load_stop_words)
@@ -0,0 +1,209 @@
+"""Score extraction from Gemini grading responses.
+
+In structured mode the model is asked (``response_mime_type`` plus
+``SCORE_ENVELOPE_SCHEMA``) for a JSON envelope holding the feedback and the
+score fields, which is decoded directly. Anything else (free-form text with
+a trailing JSON object, an envelope wrapped in a code fence, text mode) goes
+through ``ScoreParser``: a single pass over the text that tracks JSON
+objects by brace nesting and string state, decodes only completed objects
+holding a ``"total_score"`` key and keeps the last one. Its cost is linear in
+the text, unlike the greedy ``{[\\s\\S]*"total_score"[\\s\\S]*}`` regexes it
+replaces, and it accepts the text in chunks as it streams in.
+"""
+
+import bisect
+import json
+import re
+
+SCORE_FIELDS = ("total_score", "max_score", "percentage", "criteria_scores")
+
+SCORE_ENVELOPE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "feedback": {"type": "string"},
+        "total_score": {"type": "number"},
+        "max_score": {"type": "number"},
+        "percentage": {"type": "number"},
+        "criteria_scores": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"criterion": {"type": "string"}, "score": {"type": "number"}},
+                "required": ["criterion", "score"],
+            },
+        },
+    },
+    "required": ["feedback", "total_score", "max_score", "percentage", "criteria_scores"],
+}
+
+# Structured output from the model, an object found in text, or nothing usable
+STRUCTURED = "structured"
+EMBEDDED = "embedded"
+FAILED = "failed"
+
+# Characters that can change the parser's state; everything else is skipped by the regex engine
+_TOKEN = re.compile(r'```|[{}"\\\n]')
+_SCORE_KEY = '"total_score"'
+
+
+def structured_generation_config(generation_config):
+    """`generation_config` asking for a JSON envelope matching SCORE_ENVELOPE_SCHEMA"""
+    return dict(generation_config, response_mime_type="application/json", response_schema=SCORE_ENVELOPE_SCHEMA)
+
+
+def split_envelope(data):
+    """(feedback_text, score_data) from a decoded object with score fields; None if it has none"""
+    if not isinstance(data, dict) or "total_score" not in data:
+        return None
+    score_data = {field: data[field] for field in SCORE_FIELDS if field in data}
+    criteria = score_data.get("criteria_scores")
+    if isinstance(criteria, list):
+        # The schema lists criteria as [{"criterion", "score"}]; callers expect {criterion: score}
+        score_data["criteria_scores"] = {item["criterion"]: item.get("score") for item in criteria
+                                         if isinstance(item, dict) and "criterion" in item}
+    feedback = data.get("feedback")
+    return (feedback if isinstance(feedback, str) else None), score_data
+
+
+class ScoreParser:
+    """Incremental, linear-time extraction of the score object from free-form feedback"""
+
+    def __init__(self):
+        self._parts = []  # Scanned text
+        self._length = 0
+        self._carry = ""  # Tail held back until the next chunk shows how it continues
+        self._skip = 0  # Offset of a character escaped by a backslash
+        self._in_string = False
+        self._string_start = 0
+        self._starts = []  # Offsets of the '{' of every open object, outermost first
+        self._object = None  # Pieces of the outermost open object from earlier chunks (None outside objects)
+        self._object_offsets = []  # Offset where each of those pieces starts
+        self._key = -1  # Offset of the last "total_score" string seen inside an object
+        self._found = None  # (start, end, decoded object) of the last score object
+
+    def feed(self, chunk):
+        data = self._carry + chunk
+        cut = len(data)
+        # A fence or an escape may be split across chunks: hold back trailing backticks and a backslash
+        while cut > len(data) - 2 and cut > 0 and data[cut - 1] == "`":
+            cut -= 1
+        if cut > 0 and data[cut - 1] == "\\":
+            cut -= 1
+        self._carry = data[cut:]
+        self._scan(data[:cut])
+
+    def _reset(self):
+        self._in_string = False
+        self._starts = []
+        self._object = None
+        self._object_offsets = []
+
+    def _text(self, start, data, end):
+        """Text from offset `start` inside the open object up to `end` within the chunk being scanned.
+
+        Only the pieces from `start` on are joined, so the cost is the length of the text returned.
+        """
+        base = self._length
+        if start >= base:
+            return data[start - base:end]
+        first = bisect.bisect_right(self._object_offsets, start) - 1
+        head = self._object[first][start - self._object_offsets[first]:]
+        return head + "".join(self._object[first + 1:]) + data[:end]
+
+    def _scan(self, data):
+        base = self._length
+        for match in _TOKEN.finditer(data):
+            offset = base + match.start()
+            if offset < self._skip:
+                continue
+            token = match.group()
+            if self._in_string:
+                if token == "\\":
+                    self._skip = offset + 2
+                elif token == '"':
+                    self._in_string = False
+                    if offset - self._string_start == len(_SCORE_KEY) - 1:
+                        if self._text(self._string_start, data, match.end()) == _SCORE_KEY:
+                            self._key = self._string_start
+                elif token == "\n":
+                    self._reset()  # JSON strings cannot span lines: this was prose, not an object
+                continue
+            if token == "```":
+                self._reset()  # Fences delimit code blocks; never inside an object
+            elif token == "{":
+                if not self._starts:
+                    self._object = []
+                    self._object_offsets = []
+                self._starts.append(offset)
+                continue
+            elif token == "}" and self._starts:
+                start = self._starts.pop()
+                # Only objects holding the score key are decoded; prose braces left open around them do no harm
+                if self._key > start:
+                    self._complete(start, self._text(start, data, match.end()))
+                if not self._starts:
+                    self._reset()
+            elif token == '"' and self._starts:
+                self._in_string = True
+                self._string_start = offset
+        if self._object is not None:
+            # The open object continues in the next chunk
+            first = max(self._starts[0], base)
+            self._object.append(data[first - base:])
+            self._object_offsets.append(first)
+        self._parts.append(data)
+        self._length += len(data)
+
+    def _complete(self, start, candidate):
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            return
+        if isinstance(data, dict) and "total_score" in data:
+            self._found = (start, start + len(candidate), data)
+
+    def result(self):
+        """(feedback_text, score_data) once all text has been fed; score_data is None if none was found"""
+        carry, self._carry = self._carry, ""
+        self._scan(carry)
+        text = "".join(self._parts)
+        if self._found is None:
+            return text, None
+        start, end, data = self._found
+        start, end = _widen_to_fence(text, start, end)
+        feedback, score_data = split_envelope(data)
+        if feedback is None:
+            feedback = text[:start] + text[end:]
+        return feedback, score_data
+
+
+def _widen_to_fence(text, start, end):
+    """Extend [start, end) over a ```json ... ``` fence wrapped around it, if any"""
+    before = text[:start].rstrip()
+    for opening in ("```json", "```JSON", "```"):
+        if before.endswith(opening):
+            after = len(text) - len(text[end:].lstrip())
+            if text.startswith("```", after):
+                return len(before) - len(opening), after + 3
+            break
+    return start, end
+
+
+def parse_score(text):
+    """Split a grading response into (feedback_text, score_data, method).
+
+    `method` is STRUCTURED for a bare JSON envelope, EMBEDDED for a score
+    object found in text and FAILED when there was none (score_data is None).
+    """
+    stripped = text.strip()
+    if stripped.startswith("{"):
+        try:
+            parsed = split_envelope(json.loads(stripped))
+        except ValueError:
+            parsed = None
+        if parsed is not None and parsed[0] is not None:
+            return parsed[0], parsed[1], STRUCTURED
+    parser = ScoreParser()
+    parser.feed(text)
+    feedback, score_data = parser.result()
+    return feedback, score_data, EMBEDDED if score_data is not None else FAILED
@@ -0,0 +1,96 @@
+"""Per-key deduplication of expensive generation, within and across processes.
+
+When a burst of first submissions arrives for a new assignment, every request
+finds no saved model answer or rubric. ``SingleFlight.do`` lets one caller
+per key generate and save the value while concurrent callers in the same
+process wait for its result; other worker processes serialize on a lock file
+per key and pick up the saved value once the holder releases it.
+"""
+
+import os
+import threading
+
+from file_locks import file_lock
+
+
+class _Call:
+    """One in-flight generation that followers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one generation per key at a time and shares its result"""
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.generated = 0
+        self.coalesced = 0
+
+    def do(self, key, load, generate, save):
+        """Return load() if it has a value, otherwise generate() and save() it once for all callers.
+
+        `key` must be safe to use in a file name.
+        """
+        value = load()
+        if value:
+            return value
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = self._load_or_generate(key, load, generate, save)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def _load_or_generate(self, key, load, generate, save):
+        if not self.lock_dir:
+            return self._generate(generate, save)
+        os.makedirs(self.lock_dir, exist_ok=True)
+        with file_lock(os.path.join(self.lock_dir, f"{key}.lock")):
+            # Another process may have saved the value while we waited for the lock
+            value = load()
+            if value:
+                return value
+            return self._generate(generate, save)
+
+    def _generate(self, generate, save):
+        value = generate()
+        with self._lock:
+            self.generated += 1
+        if value:
+            save(value)
+        return value
+
+    def stats(self):
+        """Generation and coalescing counters for monitoring"""
+        with self._lock:
+            return {
+                "generated": self.generated,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,254 @@
+"""Winnowing fingerprints for locating copied passages between answers.
+
+A document is the token stream of ``TextPreprocessor.tokens`` (the words
+``preprocess_text`` keeps), each token with its character span in the
+original text. Every run of ``k`` consecutive tokens is hashed, and from each
+window of ``window`` consecutive k-gram hashes the rightmost minimum is kept
+as a fingerprint (Schleimer, Wilkerson and Aiken, "Winnowing: local
+algorithms for document fingerprinting"). Any passage of at least
+``window + k - 1`` tokens shared by two documents shares a fingerprint, so
+``FingerprintIndex.match`` looks up a document's fingerprints and extends
+each hit token by token to the longest common passage around it, reporting
+exact character spans in both documents. Fingerprinting and matching are
+linear in the length of the document (plus the number of hits).
+"""
+
+import threading
+import zlib
+from collections import namedtuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_K = 5
+DEFAULT_WINDOW = 4
+
+# Multiplier for combining token hashes into k-gram hashes (arithmetic wraps modulo 2^64)
+_BASE = np.uint64(0x100000001B3)
+
+# A passage found in both documents: character spans in the query and in the owner's text
+Match = namedtuple("Match", ["start", "end", "owner", "source_start", "source_end", "tokens"])
+
+
+class Fingerprints:
+    """Tokens and winnowed k-gram fingerprints of one document"""
+
+    def __init__(self, token_hashes, token_starts, token_ends, hashes, positions):
+        self.token_hashes = token_hashes  # crc32 of each token
+        self.token_starts = token_starts  # Character span of each token
+        self.token_ends = token_ends
+        self.hashes = hashes  # Selected k-gram hashes
+        self.positions = positions  # Token position where each selected k-gram starts
+
+
+def kgram_hashes(token_hashes, k):
+    """Hash of every run of `k` consecutive tokens"""
+    n = len(token_hashes) - k + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    values = token_hashes.astype(np.uint64)
+    hashes = np.zeros(n, dtype=np.uint64)
+    for m in range(k):
+        hashes = hashes * _BASE + values[m:m + n]
+    return hashes
+
+
+def winnow(hashes, window):
+    """Positions of the rightmost minimum of every `window` consecutive hashes, each reported once"""
+    if not len(hashes):
+        return np.zeros(0, dtype=np.int64)
+    windows = sliding_window_view(hashes, min(window, len(hashes)))
+    # argmin returns the first minimum; on the reversed windows that is the rightmost one
+    rightmost = windows.shape[1] - 1 - np.argmin(windows[:, ::-1], axis=1)
+    return np.unique(np.arange(len(windows)) + rightmost)
+
+
+def fingerprint_document(tokens, k=DEFAULT_K, window=DEFAULT_WINDOW):
+    """Fingerprints of a document given as (word, start, end) tokens"""
+    words, starts, ends = zip(*tokens) if tokens else ((), (), ())
+    token_hashes = np.fromiter(map(zlib.crc32, map(str.encode, words)), dtype=np.uint32, count=len(words))
+    token_starts = np.array(starts, dtype=np.int32)
+    token_ends = np.array(ends, dtype=np.int32)
+    hashes = kgram_hashes(token_hashes, k)
+    positions = winnow(hashes, window)
+    return Fingerprints(token_hashes, token_starts, token_ends, hashes[positions], positions.astype(np.int32))
+
+
+class _Column:
+    """Storage with spare capacity behind one array of a FingerprintIndex and its copies.
+
+    Each copy's array is a prefix of ``buffer``; only a copy whose array ends at
+    ``used`` may append in place, so the prefixes other copies see never change.
+    """
+
+    def __init__(self, array, capacity):
+        self.buffer = np.empty(capacity, dtype=array.dtype)
+        self.buffer[:len(array)] = array
+        self.used = len(array)
+        self.lock = threading.Lock()
+
+    def claim(self, array, size):
+        """Reserve room to grow `array` to `size` in place; False if another copy already grew it"""
+        with self.lock:
+            if array.base is not self.buffer or len(array) != self.used or size > len(self.buffer):
+                return False
+            self.used = size
+            return True
+
+
+class FingerprintIndex:
+    """Fingerprints of many documents (owners 0..count-1) in flat arrays, looked up by hash"""
+
+    ARRAYS = ("token_hashes", "token_starts", "token_ends", "token_offsets", "hashes", "positions")
+
+    def __init__(self):
+        self.token_hashes = np.zeros(0, dtype=np.uint32)
+        self.token_starts = np.zeros(0, dtype=np.int32)
+        self.token_ends = np.zeros(0, dtype=np.int32)
+        self.token_offsets = np.zeros(1, dtype=np.int64)  # Document d owns tokens [offsets[d], offsets[d + 1])
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.positions = np.zeros(0, dtype=np.int32)  # Token position (across all documents) of each fingerprint
+        self._lookup = None  # (order, hashes[order]), kept up to date by add_many once built
+        self._columns = {}  # Array name -> _Column, shared with copies
+
+    @property
+    def count(self):
+        return len(self.token_offsets) - 1
+
+    def copy(self):
+        """Shallow copy; the part of an array a copy can see is never modified"""
+        index = FingerprintIndex()
+        for name in self.ARRAYS:
+            setattr(index, name, getattr(self, name))
+        index._lookup = self._lookup
+        index._columns = dict(self._columns)
+        return index
+
+    def _extend(self, name, parts):
+        """Append `parts` to array `name`, in place when its storage has room (amortized linear in the parts)"""
+        array = getattr(self, name)
+        size = len(array) + sum(len(part) for part in parts)
+        column = self._columns.get(name)
+        if column is None or not column.claim(array, size):
+            column = self._columns[name] = _Column(array, size + size // 2)
+            column.used = size
+        at = len(array)
+        for part in parts:
+            column.buffer[at:at + len(part)] = part
+            at += len(part)
+        setattr(self, name, column.buffer[:size])
+
+    def add_many(self, documents):
+        """Append the Fingerprints of several documents as the next owners"""
+        documents = list(documents)
+        if not documents:
+            return
+        token_hashes, token_starts, token_ends, offsets, hashes, positions = [], [], [], [], [], []
+        total = int(self.token_offsets[-1])
+        for document in documents:
+            token_hashes.append(document.token_hashes)
+            token_starts.append(document.token_starts)
+            token_ends.append(document.token_ends)
+            hashes.append(document.hashes)
+            positions.append((document.positions + total).astype(np.int32))
+            total += len(document.token_hashes)
+            offsets.append(np.asarray([total], dtype=np.int64))
+        # Appended into spare capacity, so adding one document does not copy the whole index
+        added = len(self.hashes)
+        self._extend("token_hashes", token_hashes)
+        self._extend("token_starts", token_starts)
+        self._extend("token_ends", token_ends)
+        self._extend("token_offsets", offsets)
+        self._extend("hashes", hashes)
+        self._extend("positions", positions)
+        if self._lookup is not None:
+            # Merge the new fingerprints into the sorted lookup instead of sorting everything again
+            order, sorted_hashes = self._lookup
+            new_order = (np.argsort(self.hashes[added:], kind="stable") + added).astype(np.int32)
+            new_sorted = self.hashes[new_order]
+            at = np.searchsorted(sorted_hashes, new_sorted, side="right")
+            self._lookup = (np.insert(order, at, new_order), np.insert(sorted_hashes, at, new_sorted))
+
+    def document(self, owner):
+        """The Fingerprints of one indexed document"""
+        first, last = int(self.token_offsets[owner]), int(self.token_offsets[owner + 1])
+        low, high = np.searchsorted(self.positions, [first, last])  # Positions are in document order
+        return Fingerprints(self.token_hashes[first:last], self.token_starts[first:last],
+                            self.token_ends[first:last], self.hashes[low:high],
+                            (self.positions[low:high] - first).astype(np.int32))
+
+    def remove(self, owner):
+        """Drop one document; later owners shift down by one"""
+        first, last = int(self.token_offsets[owner]), int(self.token_offsets[owner + 1])
+        keep_tokens = np.ones(len(self.token_hashes), dtype=bool)
+        keep_tokens[first:last] = False
+        self.token_hashes = self.token_hashes[keep_tokens]
+        self.token_starts = self.token_starts[keep_tokens]
+        self.token_ends = self.token_ends[keep_tokens]
+        offsets = np.delete(self.token_offsets, owner + 1)
+        offsets[owner + 1:] -= last - first
+        self.token_offsets = offsets
+        keep = (self.positions < first) | (self.positions >= last)
+        self.hashes = self.hashes[keep]
+        positions = self.positions[keep]
+        self.positions = np.where(positions >= last, positions - (last - first), positions)
+        self._lookup = None
+
+    def _sorted(self):
+        """(order, hashes[order]) for binary search, built on first use"""
+        lookup = self._lookup
+        if lookup is None:
+            order = np.argsort(self.hashes, kind="stable").astype(np.int32)
+            lookup = self._lookup = (order, self.hashes[order])
+        return lookup
+
+    def match(self, query, allowed=None, min_tokens=DEFAULT_K):
+        """Longest passages of at least `min_tokens` tokens that `query` shares with the indexed
+        documents (only owners where the boolean mask `allowed` is set), ordered by owner and position"""
+        if not len(query.hashes) or not len(self.hashes):
+            return []
+        order, sorted_hashes = self._sorted()
+        low = np.searchsorted(sorted_hashes, query.hashes, side="left")
+        counts = np.searchsorted(sorted_hashes, query.hashes, side="right") - low
+        total = int(counts.sum())
+        if not total:
+            return []
+        # Every (query fingerprint, indexed fingerprint) pair with equal hashes
+        ranks = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        hits = order[np.repeat(low, counts) + ranks]
+        query_positions = np.repeat(query.positions, counts)
+        source_positions = self.positions[hits]
+        owners = np.searchsorted(self.token_offsets, source_positions, side="right") - 1
+        if allowed is not None:
+            keep = allowed[owners]
+            query_positions, source_positions, owners = query_positions[keep], source_positions[keep], owners[keep]
+
+        # Hits on one diagonal (same owner and shift) are usually one passage: visit them in order
+        # and skip those inside the passage already extended
+        diagonals = source_positions - query_positions
+        query_tokens = query.token_hashes.tolist()
+        source_tokens = self.token_hashes
+        offsets = self.token_offsets
+        matches = []
+        passage = (None, None, 0)  # (owner, diagonal, end) of the last passage
+        for s in np.lexsort((query_positions, diagonals, owners)):
+            owner, i, j = int(owners[s]), int(query_positions[s]), int(source_positions[s])
+            if passage[0] == owner and passage[1] == j - i and i < passage[2]:
+                continue
+            first, last = int(offsets[owner]), int(offsets[owner + 1])
+            start, source_start = i, j
+            while start > 0 and source_start > first and query_tokens[start - 1] == source_tokens[source_start - 1]:
+                start -= 1
+                source_start -= 1
+            end, source_end = i, j
+            while end < len(query_tokens) and source_end < last and query_tokens[end] == source_tokens[source_end]:
+                end += 1
+                source_end += 1
+            passage = (owner, j - i, end)
+            if end - start >= min_tokens:  # Shorter means a hash collision, not a shared k-gram
+                matches.append(Match(
+                    int(query.token_starts[start]), int(query.token_ends[end - 1]), owner,
+                    int(self.token_starts[source_start]), int(self.token_ends[source_end - 1]), end - start
+                ))
+        matches.sort(key=lambda match: (match.owner, match.start, match.source_start))
+        return matches
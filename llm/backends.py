@@ -0,0 +1,338 @@
+"""Model backends behind the Gemini client surface both apps use.
+
+A backend provides ``generate_content(prompt, generation_config=None,
+stream=False, **kwargs)`` and ``start_chat(history=None)`` returning a chat
+with ``send_message(content, generation_config=None, **kwargs)``; responses
+(and streamed chunks) have a ``text`` attribute. ``create_backend`` builds
+one from configuration:
+
+- ``"gemini"``: the real client (``google.generativeai`` is imported on first
+  use).
+- ``"simulated"``: a local stand-in for offline load tests. It sleeps for a
+  sampled time to first token, then streams the reply at a fixed token
+  rate, can fail a fraction of calls with 429/5xx errors the scheduler
+  treats like Gemini's, and answers from a file of recorded responses when
+  one is given. Calls asking for JSON (``response_mime_type``
+  ``application/json``) get a JSON reply instead.
+
+With ``record_file``, every response from the backend is appended to a JSON
+lines file that the simulated backend can replay later.
+"""
+
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+
+from llm.cache import ResponseCache, config_to_dict
+from llm.scheduler import accepts_request_options
+
+DEFAULT_LATENCY = "lognormal:0.8,0.4"
+DEFAULT_TOKENS_PER_SECOND = 80.0
+DEFAULT_ERROR_CODES = (429, 503)
+DEFAULT_REPLY_WORDS = 60
+CHARS_PER_TOKEN = 4
+
+ERROR_MESSAGES = {
+    429: "429 Resource has been exhausted (e.g. check quota).",
+    500: "500 An internal error has occurred.",
+    503: "503 The service is currently unavailable.",
+    504: "504 Deadline Exceeded",
+}
+
+
+class SimulatedError(Exception):
+    """An injected API error; `code` is the HTTP status"""
+
+    def __init__(self, code):
+        super().__init__(f"{ERROR_MESSAGES.get(code, f'{code} Simulated error')} (simulated)")
+        self.code = code
+
+
+class UsageMetadata:
+    def __init__(self, prompt_tokens, output_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class SimulatedResponse:
+    """Response or streamed chunk with the attributes callers read from Gemini's"""
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+def count_tokens(text):
+    """Rough token count (~4 characters per token)"""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def latency_sampler(spec):
+    """Build a function returning seconds from a spec like "fixed:0.5", "uniform:0.2,1.5",
+    "normal:0.8,0.2", "lognormal:0.8,0.4" (median, sigma) or "exponential:0.5" (mean)"""
+    kind, _, params = str(spec).partition(":")
+    values = [float(value) for value in params.split(",") if value.strip()] if params else []
+    samplers = {
+        "fixed": (1, lambda rng, a: a),
+        "uniform": (2, lambda rng, a, b: rng.uniform(a, b)),
+        "normal": (2, lambda rng, mu, sigma: rng.gauss(mu, sigma)),
+        "lognormal": (2, lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma)),
+        "exponential": (1, lambda rng, mean: rng.expovariate(1.0 / mean)),
+    }
+    if kind not in samplers or len(values) != samplers[kind][0]:
+        raise ValueError(f"Invalid latency spec {spec!r}; expected e.g. 'lognormal:0.8,0.4'")
+    sample = samplers[kind][1]
+    return lambda rng: max(0.0, sample(rng, *values))
+
+
+def _placeholder(prompt, words):
+    """(digest, body): a hash of `prompt` and deterministic words drawn from it"""
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    vocabulary = [word.strip(".,:;!?'\"()") for word in prompt.split()[:200]]
+    vocabulary = [word for word in vocabulary if word] or ["simulated"]
+    return digest, " ".join(vocabulary[digest[i % len(digest)] % len(vocabulary)] for i in range(words))
+
+
+def default_reply(prompt, words=DEFAULT_REPLY_WORDS):
+    """Deterministic placeholder text; grading prompts get feedback ending in a score JSON"""
+    digest, body = _placeholder(prompt, words)
+    if "total_score" in prompt:
+        score = digest[0] % 11
+        return (f"Overall Assessment: {body}.\n\n```json\n"
+                + json.dumps({"total_score": score, "max_score": 10, "percentage": score * 10,
+                              "criteria_scores": {"content": score}})
+                + "\n```")
+    return f"{body[:1].upper()}{body[1:]}?"
+
+
+def default_json_reply(prompt, words=DEFAULT_REPLY_WORDS):
+    """Deterministic JSON placeholder for calls in JSON mode; grading prompts get a score envelope"""
+    digest, body = _placeholder(prompt, words)
+    if "total_score" in prompt:
+        score = digest[0] % 11
+        return json.dumps({"feedback": f"Overall Assessment: {body}.", "total_score": score, "max_score": 10,
+                           "percentage": score * 10, "criteria_scores": [{"criterion": "content", "score": score}]})
+    return json.dumps({"text": body})
+
+
+class ReplayStore:
+    """Responses recorded by RecordingBackend, looked up by prompt and generation config"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._responses = {}
+        self._served = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._responses.setdefault(entry["key"], []).append(entry["text"])
+
+    def __len__(self):
+        return sum(len(texts) for texts in self._responses.values())
+
+    def lookup(self, key):
+        """The next recorded text for `key` (cycling through repeats), or None"""
+        texts = self._responses.get(key)
+        if not texts:
+            return None
+        with self._lock:
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+        return texts[served % len(texts)]
+
+
+def replay_key(model_name, prompt, generation_config=None):
+    """Key a recorded response is stored and replayed under"""
+    return ResponseCache.make_key(model_name, str(prompt), generation_config)
+
+
+class SimulatedBackend:
+    """Local stand-in for Gemini with configurable latency, token rate and errors"""
+
+    def __init__(self, model_name="simulated", latency=DEFAULT_LATENCY, tokens_per_second=DEFAULT_TOKENS_PER_SECOND,
+                 error_rate=0.0, error_codes=DEFAULT_ERROR_CODES, replay=None, reply=default_reply,
+                 json_reply=default_json_reply, seed=None):
+        self.model_name = model_name
+        self.sample_latency = latency_sampler(latency)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.replay = replay
+        self.reply = reply
+        self.json_reply = json_reply
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.replayed = 0
+
+    def _plan(self, prompt, generation_config):
+        """Decide one call's time to first token, error and reply text"""
+        with self._lock:
+            self.calls += 1
+            first_token = self.sample_latency(self._rng)
+            error = None
+            if self.error_codes and self._rng.random() < self.error_rate:
+                error = self._rng.choice(self.error_codes)
+                self.errors += 1
+        text = self.replay.lookup(replay_key(self.model_name, prompt, generation_config)) if self.replay else None
+        if text is not None:
+            with self._lock:
+                self.replayed += 1
+        elif config_to_dict(generation_config).get("response_mime_type") == "application/json":
+            text = self.json_reply(str(prompt))
+        else:
+            text = self.reply(str(prompt))
+        return first_token, error, text
+
+    def _output_seconds(self, text):
+        return count_tokens(text) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _respond(self, prompt, generation_config, stream, timeout):
+        first_token, error, text = self._plan(prompt, generation_config)
+        usage = UsageMetadata(count_tokens(str(prompt)), count_tokens(text))
+        total = first_token + self._output_seconds(text)
+        if error is not None:
+            time.sleep(first_token)
+            raise SimulatedError(error)
+        if not stream:
+            if timeout and total > timeout:
+                time.sleep(timeout)
+                raise SimulatedError(504)
+            time.sleep(total)
+            return SimulatedResponse(text, usage)
+        return self._stream(text, first_token, usage, timeout)
+
+    def _stream(self, text, first_token, usage, timeout):
+        deadline = time.monotonic() + timeout if timeout else None
+        time.sleep(first_token)
+        words = text.split(" ")
+        for i in range(0, len(words), 4):
+            chunk = " ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "")
+            time.sleep(self._output_seconds(chunk))
+            if deadline is not None and time.monotonic() > deadline:
+                raise SimulatedError(504)
+            yield SimulatedResponse(chunk, usage if i + 4 >= len(words) else None)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None, **kwargs):
+        return self._respond(prompt, generation_config, stream, (request_options or {}).get("timeout"))
+
+    def start_chat(self, history=None, **kwargs):
+        return SimulatedChat(self)
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors, "replayed": self.replayed}
+
+
+class SimulatedChat:
+    def __init__(self, backend):
+        self.backend = backend
+        self.history = []
+
+    def send_message(self, content, generation_config=None, stream=False, request_options=None, **kwargs):
+        response = self.backend.generate_content(content, generation_config, stream, request_options)
+        if not stream:
+            self.history.extend([content, response.text])
+        return response
+
+
+def _with_request_options(method, request_options, kwargs):
+    """Pass request_options on to a wrapped client only if it takes them"""
+    if request_options is not None and accepts_request_options(method):
+        return dict(kwargs, request_options=request_options)
+    return kwargs
+
+
+class RecordingBackend:
+    """Passes calls through to `backend` and appends each response to a JSON lines file"""
+
+    def __init__(self, backend, path, model_name):
+        self.backend = backend
+        self.path = path
+        self.model_name = model_name
+        self._lock = threading.Lock()
+
+    def record(self, prompt, generation_config, text):
+        line = json.dumps({"key": replay_key(self.model_name, prompt, generation_config), "text": text})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def _recorded(self, prompt, generation_config, stream, response):
+        if not stream:
+            self.record(prompt, generation_config, response.text)
+            return response
+        return self._record_stream(prompt, generation_config, response)
+
+    def _record_stream(self, prompt, generation_config, chunks):
+        parts = []
+        for chunk in chunks:
+            try:
+                parts.append(chunk.text)
+            except ValueError:
+                pass  # Chunk without text parts
+            yield chunk
+        self.record(prompt, generation_config, "".join(parts))
+
+    def generate_content(self, prompt, generation_config=None, stream=False, request_options=None, **kwargs):
+        method = self.backend.generate_content
+        response = method(prompt, generation_config=generation_config, stream=stream,
+                          **_with_request_options(method, request_options, kwargs))
+        return self._recorded(prompt, generation_config, stream, response)
+
+    def start_chat(self, *args, **kwargs):
+        return RecordingChat(self.backend.start_chat(*args, **kwargs), self)
+
+
+class RecordingChat:
+    def __init__(self, chat, recorder):
+        self.chat = chat
+        self.recorder = recorder
+
+    def send_message(self, content, generation_config=None, stream=False, request_options=None, **kwargs):
+        method = self.chat.send_message
+        response = method(content, generation_config=generation_config, stream=stream,
+                          **_with_request_options(method, request_options, kwargs))
+        return self.recorder._recorded(content, generation_config, stream, response)
+
+    def __getattr__(self, name):
+        return getattr(self.chat, name)
+
+
+def gemini_backend(model_name, api_key):
+    """The real Gemini client"""
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+
+def parse_error_codes(value):
+    """Error codes from a "429,503" string (or any iterable of ints)"""
+    if isinstance(value, str):
+        return tuple(int(code) for code in value.split(",") if code.strip())
+    return tuple(value)
+
+
+def create_backend(kind, model_name, api_key=None, record_file=None, replay_file=None,
+                   latency=DEFAULT_LATENCY, tokens_per_second=DEFAULT_TOKENS_PER_SECOND,
+                   error_rate=0.0, error_codes=DEFAULT_ERROR_CODES, seed=None):
+    """Build the backend named `kind` ("gemini" or "simulated")"""
+    if kind == "gemini":
+        backend = gemini_backend(model_name, api_key)
+    elif kind == "simulated":
+        replay = ReplayStore(replay_file) if replay_file else None
+        backend = SimulatedBackend(model_name, latency, tokens_per_second, error_rate,
+                                   parse_error_codes(error_codes), replay, seed=seed)
+    else:
+        raise ValueError(f"Unknown LLM backend {kind!r}; expected 'gemini' or 'simulated'")
+    if record_file:
+        backend = RecordingBackend(backend, record_file, model_name)
+    return backend
@@ -0,0 +1,188 @@
+"""Response cache around a Gemini model client.
+
+Responses are keyed on (model name, prompt, generation config, variant) and
+kept in an in-memory LRU backed by an on-disk tier, both subject to a TTL.
+Caching is opt-in per call: pass ``cache=True`` to ``generate_content``.
+Prompts that should still vary between sessions can ask for several
+``variants``; each call then picks one of that many cache slots at random.
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+class CachedResponse:
+    """Minimal stand-in for a Gemini response built from cached text"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def config_to_dict(generation_config):
+    """Turn a generation config (dict, GenerationConfig or None) into a plain dict"""
+    if generation_config is None:
+        return {}
+    if isinstance(generation_config, dict):
+        return dict(generation_config)
+    if dataclasses.is_dataclass(generation_config):
+        return {k: v for k, v in dataclasses.asdict(generation_config).items() if v is not None}
+    return {k: v for k, v in vars(generation_config).items() if v is not None}
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + disk) cache of generated text"""
+
+    def __init__(self, directory=None, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def make_key(model_name, prompt, generation_config=None, variant=0):
+        """Cache key for one model call"""
+        payload = json.dumps(
+            [model_name, prompt, config_to_dict(generation_config), variant],
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _remember(self, key, created, text):
+        """Put an entry in the memory tier (caller holds the lock)"""
+        self._memory[key] = (created, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return cached text for `key`, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._memory[key]
+
+        if self.directory:
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+                if now - entry["created"] < self.ttl:
+                    with self._lock:
+                        self._remember(key, entry["created"], entry["text"])
+                        self.hits += 1
+                        self.disk_hits += 1
+                    return entry["text"]
+                os.remove(self._path(key))
+            except (FileNotFoundError, ValueError, KeyError):
+                pass
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, text):
+        """Store generated text under `key` in both tiers"""
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, text)
+            self.stores += 1
+        if self.directory:
+            path = self._path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"created": created, "text": text}, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Error writing LLM cache entry: {str(e)}")
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "memory_entries": len(self._memory),
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class CachedModel:
+    """Wraps a model client so individual calls can opt in to caching"""
+
+    def __init__(self, model, model_name, cache):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+
+    def generate_content(self, prompt, generation_config=None, stream=False, cache=False, variants=1, **kwargs):
+        """Same as model.generate_content, served from the cache when `cache` is set"""
+        if not cache:
+            return self.model.generate_content(prompt, generation_config=generation_config, stream=stream, **kwargs)
+
+        variant = random.randrange(variants) if variants > 1 else 0
+        key = self.cache.make_key(self.model_name, prompt, generation_config, variant)
+        text = self.cache.get(key)
+        if text is not None:
+            return iter([CachedResponse(text)]) if stream else CachedResponse(text)
+
+        response = self.model.generate_content(prompt, generation_config=generation_config, stream=stream, **kwargs)
+        if stream:
+            return self._store_when_complete(key, response)
+        self.cache.set(key, response.text)
+        return response
+
+    def _store_when_complete(self, key, chunks):
+        """Pass streamed chunks through and cache the text once the stream finishes"""
+        parts = []
+        for chunk in chunks:
+            try:
+                parts.append(chunk.text)
+            except ValueError:
+                pass
+            yield chunk
+        if parts:
+            self.cache.set(key, "".join(parts))
+
+    def start_chat(self, *args, **kwargs):
+        """Chats are stateful and never cached"""
+        return self.model.start_chat(*args, **kwargs)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(directory, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+    """Return the shared cache for `directory` (survives Streamlit reruns)"""
+    with _caches_lock:
+        cache = _caches.get(directory)
+        if cache is None:
+            cache = ResponseCache(directory, max_entries, ttl)
+            _caches[directory] = cache
+        return cache
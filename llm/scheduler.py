@@ -0,0 +1,374 @@
+"""Shared scheduler for Gemini calls: rate limits, priorities and backoff.
+
+Every model call waits for a slot from one ``Scheduler`` per process. Slots
+are handed out in priority order (interactive chat before background and
+batch work) subject to token buckets for requests and tokens per minute and
+a cap on calls in flight. Rate-limit errors (HTTP 429) pause all callers for
+a jittered, exponentially growing delay and halve the request rate, which
+then recovers gradually as calls succeed. Callers that cannot get a slot
+within ``queue_timeout`` get ``SchedulerBusy`` and fall back as they would on
+any other model error. A streamed call holds its slot until the stream is
+exhausted or closed.
+
+Buckets are per process; give each process its share of the project quota.
+"""
+
+import contextvars
+import heapq
+import inspect
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+INTERACTIVE = 0
+BACKGROUND = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background", BATCH: "batch"}
+
+DEFAULT_RPM = 15
+DEFAULT_TPM = 1000000
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_QUEUE_TIMEOUT = 120.0
+DEFAULT_OUTPUT_TOKENS = 512
+
+_priority = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+class SchedulerBusy(Exception):
+    """No model call slot became available within the queue timeout"""
+
+
+@contextmanager
+def call_priority(priority):
+    """Run the block's model calls at `priority` (e.g. BATCH for bulk grading)"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def with_priority(priority, fn):
+    """Wrap `fn` so it runs at `priority`, e.g. when submitted to a thread pool"""
+    def run(*args, **kwargs):
+        with call_priority(priority):
+            return fn(*args, **kwargs)
+    return run
+
+
+def status_code(error):
+    """HTTP status of an exception from the model client, if it carries one"""
+    code = getattr(error, "code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_rate_limited(error):
+    """Whether an exception from the model client is a 429 / quota error"""
+    return status_code(error) == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+
+
+def is_transient(error):
+    """Server-side errors worth retrying (besides rate limits)"""
+    return status_code(error) in (500, 503, 504) or type(error).__name__ in ("ServiceUnavailable", "DeadlineExceeded")
+
+
+def accepts_request_options(method):
+    """Whether a client method takes `request_options` (google-generativeai before 0.4 does not)"""
+    try:
+        return "request_options" in inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def estimate_tokens(prompt, generation_config=None):
+    """Rough token cost of a call: ~4 characters per prompt token plus the output budget"""
+    output = None
+    if isinstance(generation_config, dict):
+        output = generation_config.get("max_output_tokens")
+    elif generation_config is not None:
+        output = getattr(generation_config, "max_output_tokens", None)
+    return len(str(prompt)) // 4 + (output or DEFAULT_OUTPUT_TOKENS)
+
+
+class TokenBucket:
+    """Refills at `per_minute` units per minute up to `capacity` (default one minute's worth)"""
+
+    def __init__(self, per_minute, capacity=None):
+        self.limit = float(per_minute)
+        self.rate = float(per_minute)
+        self.capacity = float(capacity or per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate / 60.0)
+        self.updated = now
+
+    def delay(self, amount, now):
+        """Seconds until `amount` units are available"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        """Charge (positive) or refund (negative) units after the fact"""
+        self.level = min(self.capacity, self.level - amount)
+
+
+class Scheduler:
+    """Admits model calls by priority within rate and concurrency limits"""
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_retries=DEFAULT_MAX_RETRIES, queue_timeout=DEFAULT_QUEUE_TIMEOUT,
+                 base_delay=1.0, max_delay=60.0, burst=None):
+        self.requests = TokenBucket(rpm, burst)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.queue_timeout = queue_timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._cooldown_until = 0.0
+        self._depth = {priority: 0 for priority in PRIORITY_NAMES}
+        self._waited = {priority: [0, 0.0, 0.0] for priority in PRIORITY_NAMES}  # calls, total, max
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    def _acquire(self, priority, tokens):
+        """Block until this call may start; returns seconds spent waiting"""
+        start = time.monotonic()
+        deadline = start + self.queue_timeout if self.queue_timeout else None
+        with self._cond:
+            ticket = (priority, next(self._seq))
+            heapq.heappush(self._waiting, ticket)
+            self._depth[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._waiting[0] == ticket and self._in_flight < self.max_concurrency:
+                        wait = max(self._cooldown_until - now, self.requests.delay(1, now),
+                                   self.tokens.delay(tokens, now))
+                        if wait <= 0:
+                            heapq.heappop(self._waiting)
+                            self.requests.take(1, now)
+                            self.tokens.take(tokens, now)
+                            self._in_flight += 1
+                            self._cond.notify_all()  # the next caller in line may be admissible too
+                            return now - start
+                    if deadline is not None:
+                        if now >= deadline:
+                            self._waiting.remove(ticket)
+                            heapq.heapify(self._waiting)
+                            self.timeouts += 1
+                            self._cond.notify_all()
+                            raise SchedulerBusy(f"No model call slot within {self.queue_timeout:.0f}s")
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._depth[priority] -= 1
+
+    def _release(self, priority, waited, estimate, used, error=None):
+        with self._cond:
+            self._in_flight -= 1
+            stats = self._waited[priority]
+            stats[0] += 1
+            stats[1] += waited
+            stats[2] = max(stats[2], waited)
+            if used is not None:
+                self.tokens.adjust(used - estimate)
+            if error is None:
+                self.calls += 1
+                # Additive recovery towards the configured rate after throttling
+                bucket = self.requests
+                bucket.rate = min(bucket.limit, bucket.rate + bucket.limit / 20.0)
+            self._cond.notify_all()
+
+    def _back_off(self, attempt, throttled, retry=True):
+        """Pause every caller for a jittered exponential delay; returns the delay"""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        with self._cond:
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+            if retry:
+                self.retries += 1
+            if throttled:
+                self.throttled += 1
+                bucket = self.requests
+                bucket.rate = max(bucket.limit / 16.0, bucket.rate / 2.0)
+            self._cond.notify_all()
+        return delay
+
+    def _failed(self, attempt, error, retry=True):
+        """Record a failed call; returns True, after backing off, when it should be retried"""
+        throttled = is_rate_limited(error)
+        if (throttled or is_transient(error)) and retry and attempt < self.max_retries:
+            delay = self._back_off(attempt, throttled)
+            print(f"Model call {'rate limited' if throttled else 'failed'} ({str(error)}); retrying in {delay:.1f}s")
+            return True
+        if throttled and not retry:
+            self._back_off(attempt, throttled, retry=False)  # Other callers still slow down
+        with self._cond:
+            self.failures += 1
+        return False
+
+    def run(self, fn, tokens=DEFAULT_OUTPUT_TOKENS, priority=None):
+        """Call fn() when a slot is available, retrying rate-limit and transient errors"""
+        priority = _priority.get() if priority is None else priority
+        attempt = 0
+        while True:
+            waited = self._acquire(priority, tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                self._release(priority, waited, tokens, None, error=e)
+                if not self._failed(attempt, e):
+                    raise
+                attempt += 1
+                continue
+            self._release(priority, waited, tokens, _used_tokens(result))
+            return result
+
+    def stream(self, fn, tokens=DEFAULT_OUTPUT_TOKENS, priority=None):
+        """Iterate over the chunks of fn() (a streamed call), holding a slot until the stream ends.
+
+        Errors before the first chunk are retried as in ``run``; after it the
+        error is raised, since the caller has already seen part of the output.
+        """
+        priority = _priority.get() if priority is None else priority
+        return self._stream(fn, tokens, priority)
+
+    def _stream(self, fn, tokens, priority):
+        attempt = 0
+        while True:
+            waited = self._acquire(priority, tokens)
+            used = None
+            delivered = False
+            try:
+                for chunk in fn():
+                    used = _used_tokens(chunk) or used
+                    delivered = True
+                    yield chunk
+            except GeneratorExit:
+                self._release(priority, waited, tokens, used)  # Closed by the caller
+                raise
+            except Exception as e:
+                self._release(priority, waited, tokens, None, error=e)
+                if not self._failed(attempt, e, retry=not delivered):
+                    raise
+                attempt += 1
+                continue
+            self._release(priority, waited, tokens, used)
+            return
+
+    def stats(self):
+        """Queue depth, throughput and backoff counters for monitoring"""
+        with self._cond:
+            now = time.monotonic()
+            return {
+                "queue_depth": {PRIORITY_NAMES[p]: depth for p, depth in self._depth.items()},
+                "in_flight": self._in_flight,
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "timeouts": self.timeouts,
+                "failures": self.failures,
+                "current_rpm": round(self.requests.rate, 2),
+                "cooldown_seconds": round(max(0.0, self._cooldown_until - now), 2),
+                "wait_seconds": {
+                    PRIORITY_NAMES[p]: {"mean": round(total / calls, 3) if calls else 0.0, "max": round(peak, 3)}
+                    for p, (calls, total, peak) in self._waited.items()
+                },
+            }
+
+
+def _used_tokens(response):
+    """Actual token count reported by a response (or the last chunk of a stream), if any"""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    return total if isinstance(total, int) and total > 0 else None
+
+
+class ScheduledModel:
+    """Model client wrapper that routes every call through a Scheduler"""
+
+    def __init__(self, model, scheduler, timeout=None):
+        self.model = model
+        self.scheduler = scheduler
+        self.timeout = timeout
+
+    def _options(self, method, kwargs):
+        """`kwargs` with the request timeout, if `method` takes request_options"""
+        if self.timeout and "request_options" not in kwargs and accepts_request_options(method):
+            kwargs = dict(kwargs, request_options={"timeout": self.timeout})
+        return kwargs
+
+    def _submit(self, call, stream, tokens):
+        if stream:
+            return self.scheduler.stream(call, tokens)
+        return self.scheduler.run(call, tokens)
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        """Same as model.generate_content, admitted by the scheduler"""
+        method = self.model.generate_content
+        kwargs = self._options(method, kwargs)
+        return self._submit(
+            lambda: method(prompt, generation_config=generation_config, stream=stream, **kwargs),
+            stream,
+            estimate_tokens(prompt, generation_config)
+        )
+
+    def start_chat(self, *args, **kwargs):
+        return ScheduledChat(self.model.start_chat(*args, **kwargs), self)
+
+
+class ScheduledChat:
+    """Chat session whose messages go through the scheduler"""
+
+    def __init__(self, chat, scheduled_model):
+        self.chat = chat
+        self.scheduled_model = scheduled_model
+
+    def send_message(self, content, generation_config=None, **kwargs):
+        method = self.chat.send_message
+        kwargs = self.scheduled_model._options(method, kwargs)
+        return self.scheduled_model._submit(
+            lambda: method(content, generation_config=generation_config, **kwargs),
+            kwargs.get("stream", False),
+            estimate_tokens(content, generation_config)
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.chat, name)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(name="gemini", **settings):
+    """Return the process-wide scheduler called `name` (survives Streamlit reruns)"""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(name)
+        if scheduler is None:
+            scheduler = Scheduler(**settings)
+            _schedulers[name] = scheduler
+        return scheduler